@@ -1,15 +1,52 @@
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
 import asyncio
 import os
-import socket
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from sqlalchemy import inspect, text
 
 # Importamos DB y Routers
-from backend.database import mysql_engine, Base, mongo_client, redis_client
+from backend.database import mysql_engine, Base, redis_client
 from backend.routers import auth, inventory
 # IMPORTANTE: Importar el modelo para que SQLAlchemy cree la tabla
 from backend.models.inventory import ItemModel
+from backend.models.replication import ReplicationHeartbeat
+from backend.services.codec import FastJSONResponse, json_dumps
+from backend.services.pool_stats import adaptive_pools_enabled, get_pools_status, pool_autosize_loop
+from backend.services.db_router import get_replicas_status, replica_lag_monitor, replicas_enabled
+from backend.services.admission import ADMISSION_CONTROL, AdmissionMiddleware, get_admission_stats
+from backend.services.idempotency import IdempotencyMiddleware
+from backend.services.item_changes import stop_tail
+from backend.services.load_report import (
+    LoadReportMiddleware,
+    cluster_load_vector,
+    encoded_load_report,
+    event_loop_lag_sampler,
+)
+from backend.services.logs import LogContextMiddleware, get_logger, stop_logging
+from backend.services.profiling import ProfilingMiddleware, profiling_enabled
+from backend.services.singleflight import coalesce, get_singleflight_stats
+from backend.services.query_stats import QUERY_STATS_ENABLED, QueryStatsMiddleware, get_query_stats
+from backend.services.tracing import TracingMiddleware, tracing_enabled
+from backend.services.admin import require_admin
+from backend.services import memory_profiler
+from backend.services.status_stream import status_events, status_publisher_loop, stop_listener
+from backend.services.workers import (
+    HOSTNAME,
+    WORKER_ID,
+    WORKER_LEADER_RETRY_S,
+    get_worker_info,
+    mark_startup_done,
+    release_locks,
+    startup_done,
+    try_become_leader,
+    wait_for_startup,
+)
 from backend.services.mysql_redis_sync import (
     check_mysql_available,
     check_redis_available,
@@ -18,116 +55,313 @@ from backend.services.mysql_redis_sync import (
     rebuild_cache_from_mysql,
     get_sync_status,
     verify_cache_integrity,
+    drop_mysql_items_body,
+    flush_write_behind_batch,
+    is_write_behind,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_MAX_LAG_MS,
 ) 
 
 PORT = os.getenv("PORT", "8000") 
-HOSTNAME = socket.gethostname()
+# "full": arranque serie clásico (esquema + sync completa antes de aceptar tráfico)
+# "fast": sondas en paralelo y la puesta al día se difiere a segundo plano
+STARTUP_MODE = os.getenv("STARTUP_MODE", "full").lower()
+STARTUP_PROBE_TIMEOUT = float(os.getenv("STARTUP_PROBE_TIMEOUT", "2"))
+# Con varios workers, cuánto espera un worker (modo full) a que el líder termine el arranque
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "120"))
+
+log = get_logger("main")
+
+IMPORT_MS = round((time.perf_counter() - _IMPORT_T0) * 1000, 1)
+# Desglose de tiempos del último arranque (expuesto en /system/startup)
+startup_timings = {"mode": STARTUP_MODE, "imports_ms": IMPORT_MS}
 
 # --- HEARTBEAT (Latido) ---
+# Un latido, un contador y un informe de carga por worker, en un solo viaje a Redis:
+# instance:<hostname>:w<N> / requests:<hostname>:w<N> / load:<hostname>:w<N>
 async def send_heartbeat():
     while True:
         try:
-            # 1. Decir "Estoy Vivo" (Status)
-            await redis_client.setex(f"instance:{HOSTNAME}", 5, "Online")
-            # 2. Inicializar el contador en 0 si no existe (para que salga en la gráfica)
-            await redis_client.setnx(f"requests:{HOSTNAME}", 0)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                # 1. Decir "Estoy Vivo" (Status)
+                pipe.setex(f"instance:{WORKER_ID}", 5, "Online")
+                # 2. Inicializar el contador en 0 si no existe (para que salga en la gráfica)
+                pipe.setnx(f"requests:{WORKER_ID}", 0)
+                # 3. Carga actual (/system/load); caduca con el latido
+                pipe.setex(f"load:{WORKER_ID}", 5, encoded_load_report())
+                await pipe.execute()
         except Exception as e:
-            print(f"❌ Error Redis: {e}")
+            log.error("❌ Error Redis: %s", e, extra={"store": "redis"})
         await asyncio.sleep(3)
 
 # --- SINCRONIZACIÓN MYSQL ↔ REDIS ---
-async def mysql_redis_sync_loop():
+async def mysql_redis_sync_loop(catchup=None, stop: asyncio.Event = None):
     """
     Tarea periódica: si MySQL está disponible, sincroniza pendientes de Redis → MySQL
     y refresca la caché Redis desde MySQL.
     También verifica integridad de la caché.
+    `catchup` (arranque fast) es la puesta al día diferida: corre antes del primer
+    ciclo para que nunca haya dos vaciados de la misma cola a la vez.
+    `stop` detiene el loop entre ciclos, sin cortar una sincronización a medias.
     """
+    if catchup is not None:
+        await catchup()
     while True:
         try:
-            await asyncio.sleep(2)  # Cada 2 segundos
+            # Cada 2 segundos
+            if stop is None:
+                await asyncio.sleep(2)
+            else:
+                try:
+                    await asyncio.wait_for(stop.wait(), 2)
+                    break
+                except asyncio.TimeoutError:
+                    pass
             
             mysql_ok = await check_mysql_available()
             redis_ok = await check_redis_available()
             
             if not redis_ok:
-                print("⚠️ [SYNC] Redis no disponible, saltando sincronización")
+                log.warning("⚠️ [SYNC] Redis no disponible, saltando sincronización", extra={"store": "redis"})
                 continue
             
             if mysql_ok:
                 # MySQL está disponible - sincronizar pendientes y verificar integridad
                 result = await full_sync_on_mysql_recovery()
                 if any(v > 0 for k, v in result.items() if k != "integrity_verified"):
-                    print(f"✅ [SYNC] MySQL recuperado: {result}")
+                    log.info("✅ [SYNC] MySQL recuperado: %s", result)
                 
                 # Verificar integridad de la caché
                 is_valid, details = await verify_cache_integrity()
                 if not is_valid:
-                    print(f"⚠️ [SYNC] Caché inconsistente: {details}. Reconstruyendo...")
+                    log.warning("⚠️ [SYNC] Caché inconsistente: %s. Reconstruyendo...", details)
                     await rebuild_cache_from_mysql()
             else:
                 # MySQL no está disponible - reportar estado
-                print("⚠️ [SYNC] MySQL no disponible. Redis actúa como respaldo.")
+                log.warning("⚠️ [SYNC] MySQL no disponible. Redis actúa como respaldo.", extra={"store": "mysql"})
+                await drop_mysql_items_body()
                 
         except asyncio.CancelledError:
             break
         except Exception as e:
-            print(f"⚠️ [SYNC] Error en tarea de sincronización: {e}")
+            log.warning("⚠️ [SYNC] Error en tarea de sincronización: %s", e)
+
+
+# --- WRITE-BEHIND ---
+async def write_behind_flush_loop():
+    """
+    Vuelca a MySQL por lotes las escrituras aceptadas en Redis (ITEM_WRITE_MODE=write_behind).
+    Espera como mucho WRITE_BEHIND_MAX_LAG_MS entre lotes; si un lote sale lleno
+    repite enseguida para no acumular retraso bajo carga.
+    """
+    while True:
+        try:
+            result = await flush_write_behind_batch()
+            if max(result.values()) >= WRITE_BEHIND_BATCH_SIZE:
+                continue
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            # MySQL caído: los lotes se devolvieron a las colas, se reintenta más tarde
+            log.warning("⚠️ [WRITE-BEHIND] No se pudo volcar el lote: %s", e, extra={"store": "mysql"})
+        try:
+            await asyncio.sleep(WRITE_BEHIND_MAX_LAG_MS / 1000)
+        except asyncio.CancelledError:
+            break
 
 
 # --- CICLO DE VIDA ---
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    print(f"🚀 INICIANDO {HOSTNAME} en Puerto {PORT}")
+async def _timed(name, coro):
+    """Ejecuta una fase de arranque y registra su duración en startup_timings"""
+    t0 = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        startup_timings[f"{name}_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _add_item_version_column():
+    """create_all no altera tablas existentes: añade items.version (If-Match) si falta"""
+    if "version" in {c["name"] for c in inspect(mysql_engine).get_columns("items")}:
+        return
+    try:
+        with mysql_engine.begin() as conn:
+            conn.execute(text("ALTER TABLE items ADD COLUMN version INT NOT NULL DEFAULT 1"))
+        log.info("✅ MySQL: Columna items.version añadida.")
+    except Exception:
+        # Otra réplica pudo añadirla a la vez
+        if "version" not in {c["name"] for c in inspect(mysql_engine).get_columns("items")}:
+            raise
 
+
+def _create_tables():
     # Crear tablas en MySQL (Auth e Inventario)
     try:
         Base.metadata.create_all(bind=mysql_engine)
-        print("✅ MySQL: Tablas sincronizadas.")
+        _add_item_version_column()
+        log.info("✅ MySQL: Tablas sincronizadas.")
+        return True
+    except Exception as e:
+        log.error("❌ MySQL Error: %s", e)
+        return False
+
+
+async def initial_catchup_sync():
+    """Migra datos legacy y vacía el backlog pendiente hacia MySQL"""
+    migrated = await migrate_backup_items_to_pending()
+    if migrated:
+        log.info("✅ [SYNC] Migrados %s items de backup_items legacy", migrated)
+
+    result = await full_sync_on_mysql_recovery()
+    log.info("✅ [SYNC] Inicial: %s", result)
+
+
+async def deferred_catchup_sync():
+    """Puesta al día en segundo plano (modo fast): la réplica ya atiende tráfico"""
+    try:
+        if await check_mysql_available():
+            await _timed("deferred_sync", initial_catchup_sync())
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
-        print(f"❌ MySQL Error: {e}")
+        log.warning("⚠️ [SYNC] Error sincronización diferida: %s", e)
+
+
+async def _report_cache_without_mysql():
+    log.warning("⚠️ [SYNC] MySQL no disponible al iniciar. Reconstruyendo caché desde backup...")
+    # Intentar reconstruir desde caché existente
+    cache_exists = await redis_client.exists("items:cache")
+    if not cache_exists:
+        log.warning("⚠️ [SYNC] No hay caché anterior. El sistema operará en modo 'vacío' hasta que MySQL se recupere.")
+    else:
+        log.info("✅ [SYNC] Caché anterior restaurado. Redis servirá como fuente de verdad.")
+
+
+async def startup_full():
+    """Arranque serie: la réplica no acepta tráfico hasta terminar la sincronización"""
+    await _timed("schema", asyncio.to_thread(_create_tables))
 
     # Sincronización inicial MySQL ↔ Redis
     try:
-        mysql_ok = await check_mysql_available()
-        redis_ok = await check_redis_available()
+        mysql_ok = await _timed("mysql_probe", check_mysql_available())
+        redis_ok = await _timed("redis_probe", check_redis_available())
         
         if not redis_ok:
-            print("❌ Redis no está disponible. Sistema no puede iniciar sin Redis.")
+            log.error("❌ Redis no está disponible. Sistema no puede iniciar sin Redis.")
             raise Exception("Redis no disponible")
         
         if mysql_ok:
-            # Migrar datos legacy y sincronizar
-            migrated = await migrate_backup_items_to_pending()
-            if migrated:
-                print(f"✅ [SYNC] Migrados {migrated} items de backup_items legacy")
-            
-            result = await full_sync_on_mysql_recovery()
-            print(f"✅ [SYNC] Inicial: {result}")
+            await _timed("catchup_sync", initial_catchup_sync())
         else:
-            print("⚠️ [SYNC] MySQL no disponible al iniciar. Reconstruyendo caché desde backup...")
-            # Intentar reconstruir desde caché existente
-            cache_exists = await redis_client.get("items:cache")
-            if not cache_exists:
-                print("⚠️ [SYNC] No hay caché anterior. El sistema operará en modo 'vacío' hasta que MySQL se recupere.")
-            else:
-                print("✅ [SYNC] Caché anterior restaurado. Redis servirá como fuente de verdad.")
+            await _report_cache_without_mysql()
     except Exception as e:
-        print(f"⚠️ [SYNC] Error sincronización inicial: {e}")
+        log.warning("⚠️ [SYNC] Error sincronización inicial: %s", e)
+
+
+async def startup_fast():
+    """
+    Arranque paralelo: esquema y sondas MySQL/Redis a la vez, con un tope de
+    STARTUP_PROBE_TIMEOUT segundos. La puesta al día (migración legacy + sync
+    completa) queda para el loop de sincronización y la réplica queda sana de inmediato.
+    """
+    schema = asyncio.ensure_future(_timed("schema", asyncio.to_thread(_create_tables)))
+    mysql_probe = asyncio.ensure_future(_timed("mysql_probe", check_mysql_available()))
+    redis_probe = asyncio.ensure_future(_timed("redis_probe", check_redis_available()))
+
+    # Si MySQL tarda en responder no bloqueamos el arranque: el esquema termina
+    # en su hilo y el loop de sincronización se encarga del resto.
+    await asyncio.wait([schema, mysql_probe, redis_probe], timeout=STARTUP_PROBE_TIMEOUT)
+    redis_ok = redis_probe.done() and redis_probe.result()
+    mysql_ok = mysql_probe.done() and mysql_probe.result()
+
+    if not redis_ok:
+        log.error("❌ Redis no está disponible. Sistema no puede iniciar sin Redis.")
+    elif not mysql_ok:
+        await _report_cache_without_mysql()
+
+
+# --- WORKERS ---
+def _start_leader_tasks(catchup=None):
+    """Tareas únicas por contenedor: sólo las corre el worker líder"""
+    tasks = [asyncio.create_task(mysql_redis_sync_loop(catchup))]
+    if is_write_behind():
+        log.info("✍️ Modo write-behind: escrituras de items encoladas en Redis")
+        tasks.append(asyncio.create_task(write_behind_flush_loop()))
+    return tasks
+
+
+async def leader_election_loop(background):
+    """Workers no líderes: toman el relevo si el líder del contenedor muere"""
+    while not try_become_leader():
+        await asyncio.sleep(WORKER_LEADER_RETRY_S)
+    log.info("👑 %s es ahora el líder del contenedor", WORKER_ID)
+    background.extend(_start_leader_tasks())
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    leader = try_become_leader()
+    role = "líder" if leader else "worker"
+    log.info("🚀 INICIANDO %s (%s) en Puerto %s (arranque %s)", WORKER_ID, role, PORT, STARTUP_MODE)
+
+    t0 = time.perf_counter()
+    background = []
+    catchup = None
+    if leader and not startup_done():
+        if STARTUP_MODE == "fast":
+            await startup_fast()
+            # La puesta al día diferida es el primer paso del loop de sincronización
+            catchup = deferred_catchup_sync
+        else:
+            await startup_full()
+        mark_startup_done()
+    elif STARTUP_MODE != "fast":
+        # Esquema y puesta al día son del líder; el worker no atiende hasta que terminen
+        if not await _timed("wait_leader", wait_for_startup(STARTUP_WAIT_TIMEOUT)):
+            log.warning("⚠️ [WORKERS] El líder no terminó el arranque en %ss, se continúa", STARTUP_WAIT_TIMEOUT)
+    startup_timings["startup_total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    log.info("⏱️ Arranque: %s", startup_timings)
 
     # Iniciar Heartbeat y tarea de sincronización
     asyncio.create_task(send_heartbeat())
-    sync_task = asyncio.create_task(mysql_redis_sync_loop())
+    background.append(asyncio.create_task(event_loop_lag_sampler()))
+    if adaptive_pools_enabled():
+        background.append(asyncio.create_task(pool_autosize_loop()))
+    if leader:
+        background.extend(_start_leader_tasks(catchup))
+    else:
+        background.append(asyncio.create_task(leader_election_loop(background)))
+    if replicas_enabled():
+        log.info("📚 Lecturas MySQL enrutadas a réplicas")
+        background.append(asyncio.create_task(replica_lag_monitor()))
+    background.append(asyncio.create_task(status_publisher_loop(get_system_status, _health_snapshot)))
 
     yield
 
-    sync_task.cancel()
-    try:
-        await sync_task
-    except asyncio.CancelledError:
-        pass
-    print("🛑 APAGANDO SISTEMA")
+    tasks = list(background)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await stop_listener()
+    await stop_tail()
+    release_locks()
+    log.info("🛑 APAGANDO SISTEMA")
+    stop_logging()
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# Escrituras con Idempotency-Key: los reintentos reciben la respuesta guardada
+# (dentro de CORS, así la respuesta reproducida lleva las cabeceras del origen actual)
+app.add_middleware(IdempotencyMiddleware)
+
+# Peticiones en curso y latencia reciente para el informe de carga del latido
+# (por dentro de la admisión: los 503 rápidos no rebajan el p99)
+app.add_middleware(LoadReportMiddleware)
+
+# Control de admisión: límite de concurrencia y cola por clase de ruta, 503 rápidos al saturarse
+# (por fuera de la idempotencia: lo rechazado no llega a tocar Redis)
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
 
 # CORS
 app.add_middleware(
@@ -138,6 +372,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Ruta de la petición en cada log
+app.add_middleware(LogContextMiddleware)
+
+# Sentencias SQL por ruta (/system/queries)
+if QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+# Server-Timing por almacén y trazas OTLP muestreadas (TRACE_SAMPLE_RATE)
+if tracing_enabled():
+    app.add_middleware(TracingMiddleware)
+
+# Perfilado de CPU opt-in (X-Profile + X-Admin-Token, o PROFILE_SAMPLE_RATE del tráfico)
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 # Rutas
 app.include_router(auth.router)
 app.include_router(inventory.router)
@@ -163,6 +412,7 @@ async def health_check():
             "mysql": mysql_ok,
             "redis": redis_ok,
             "hostname": HOSTNAME,
+            "worker": WORKER_ID,
             "port": PORT
         }
     except Exception as e:
@@ -174,47 +424,174 @@ async def health_check():
 
 # --- ENDPOINT DE ESTADO DE SINCRONIZACIÓN ---
 @app.get("/sync/status", tags=["Sincronización"])
-async def sync_status():
-    """Devuelve el estado actual de la sincronización MySQL ↔ Redis"""
-    return await get_sync_status()
+async def sync_status(deep: bool = False):
+    """
+    Devuelve el estado actual de la sincronización MySQL ↔ Redis (contadores
+    mantenidos, un viaje a Redis). ?deep=true sondea MySQL y verifica la caché completa.
+    """
+    return await get_sync_status(deep)
+
+
+@app.get("/system/pools", tags=["Sistema"])
+async def pools_status():
+    """Estadísticas en vivo de los pools de conexiones (MySQL API/sync, Redis, Mongo)"""
+    return {"hostname": HOSTNAME, "worker": WORKER_ID, "pools": get_pools_status()}
+
+
+@app.get("/system/startup", tags=["Sistema"])
+async def startup_status():
+    """Desglose de tiempos del arranque de esta réplica"""
+    return {"hostname": HOSTNAME, **get_worker_info(), **startup_timings}
+
+
+@app.get("/system/queries", tags=["Sistema"])
+async def queries_status():
+    """Sentencias SQL y tiempo por ruta / fase del sync, sentencias lentas y posibles N+1 (este worker)"""
+    return {"hostname": HOSTNAME, "worker": WORKER_ID, **get_query_stats()}
+
+
+@app.get("/system/admission", tags=["Sistema"])
+async def admission_status():
+    """Control de admisión de este worker: ranuras, colas, tiempo de servicio y peticiones rechazadas"""
+    return get_admission_stats()
+
+
+@app.get("/system/singleflight", tags=["Sistema"])
+async def singleflight_status():
+    """Lecturas agrupadas en este worker: cargas reales, compartidas y servidas de microcaché"""
+    return get_singleflight_stats()
+
+
+@app.get("/system/load", tags=["Sistema"])
+async def load_status():
+    """
+    Vector de carga del clúster (en curso, p99, lag del event loop, threadpool y
+    pool MySQL por servidor) con el upstream de nginx y los pesos sugeridos
+    """
+    return await cluster_load_vector(redis_client)
+
+
+@app.get("/system/replicas", tags=["Sistema"])
+async def replicas_status():
+    """Retraso medido y salud de las réplicas de lectura MySQL"""
+    return {"hostname": HOSTNAME, "worker": WORKER_ID, **get_replicas_status()}
+
+
+# --- PERFILADO DE MEMORIA (admin, X-Admin-Token) ---
+@app.get("/system/memory", tags=["Diagnóstico"], dependencies=[Depends(require_admin)])
+async def memory_status():
+    """Estado de tracemalloc y snapshots guardadas en este worker"""
+    return {"worker": WORKER_ID, **memory_profiler.status()}
+
+
+@app.post("/system/memory/start", tags=["Diagnóstico"], dependencies=[Depends(require_admin)])
+async def memory_start(frames: int = None):
+    """Activa tracemalloc (frames = profundidad de pila guardada por asignación)"""
+    return {"worker": WORKER_ID, **memory_profiler.start(frames)}
+
+
+@app.post("/system/memory/snapshot", tags=["Diagnóstico"], dependencies=[Depends(require_admin)])
+async def memory_snapshot(label: str = "", limit: int = 20):
+    """Toma una snapshot: mayores sitios de asignación y total por módulo"""
+    try:
+        return {"worker": WORKER_ID, **memory_profiler.take_snapshot(label, limit)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@app.get("/system/memory/diff", tags=["Diagnóstico"], dependencies=[Depends(require_admin)])
+async def memory_diff(base: int = None, target: int = None, limit: int = 20):
+    """Diferencia entre dos snapshots (por defecto las dos últimas), por sitio y por módulo"""
+    try:
+        return {"worker": WORKER_ID, **memory_profiler.diff(base, target, limit)}
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+
+
+@app.post("/system/memory/stop", tags=["Diagnóstico"], dependencies=[Depends(require_admin)])
+async def memory_stop():
+    """Desactiva tracemalloc y descarta las snapshots"""
+    return {"worker": WORKER_ID, **memory_profiler.stop()}
 
 
 # --- ENDPOINT DASHBOARD (Consolidado) ---
 @app.get("/system/status", tags=["Sistema"])
+async def system_status():
+    """
+    Devuelve estado (Cajas Verdes) Y tráfico (Barras) por servidor, sumando sus
+    workers; el desglose por worker va en "workers".
+    """
+    # Los pollers simultáneos comparten una sola ronda KEYS + MGET y su JSON
+    body = await coalesce("system:status", _encoded_system_status)
+    return Response(content=body, media_type="application/json")
+
+
+async def _encoded_system_status() -> bytes:
+    return json_dumps(await get_system_status())
+
+
 async def get_system_status():
-    """Devuelve estado (Cajas Verdes) Y tráfico (Barras)"""
-    instances = []
-    # Buscamos claves de instancias
+    # Buscamos claves de instancias (una por worker vivo)
     keys = await redis_client.keys("instance:*")
-    
-    for key in keys:
-        hostname_id = key.split(":")[1]
-        status = await redis_client.get(key)
-        # Buscamos cuántas peticiones ha atendido este servidor
-        count = await redis_client.get(f"requests:{hostname_id}")
-        
-        instances.append({
+    if not keys:
+        return []
+    worker_ids = [key.split(":", 1)[1] for key in keys]
+    statuses = await redis_client.mget(keys)
+    # Cuántas peticiones ha atendido cada worker
+    counts = await redis_client.mget([f"requests:{worker_id}" for worker_id in worker_ids])
+
+    servers = {}
+    for worker_id, status, count in zip(worker_ids, statuses, counts):
+        hostname_id = worker_id.split(":")[0]
+        requests = int(count) if count else 0
+        server = servers.setdefault(hostname_id, {
             "port": hostname_id,    # ID del servidor
-            "status": status,       # Online/Offline
-            "requests": int(count) if count else 0 # Número para la gráfica
+            "status": "Offline",    # Online si algún worker lo está
+            "requests": 0,          # Número para la gráfica
+            "workers": [],
         })
-    
-    instances.sort(key=lambda x: x["port"])
+        if status == "Online":
+            server["status"] = "Online"
+        server["requests"] += requests
+        server["workers"].append({"worker": worker_id, "status": status, "requests": requests})
+
+    instances = sorted(servers.values(), key=lambda x: x["port"])
+    for server in instances:
+        server["workers"].sort(key=lambda w: w["worker"])
     return instances
 
+async def _health_snapshot():
+    return {"health": await health_check(), "sync": await get_sync_status()}
+
+
+# --- STREAM DE ESTADO (SSE) ---
+@app.get("/system/stream", tags=["Sistema"])
+async def system_stream():
+    """
+    Server-Sent Events con el estado del clúster: "status" (lo mismo que /system/status)
+    y "health" (/health + /sync/status). Sustituye al polling del dashboard.
+    """
+    return StreamingResponse(
+        status_events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: NGINX entrega cada evento sin esperar a llenar su buffer
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- ENDPOINT QUE GOLPEA K6 ---
 @app.get("/")
 async def read_root():
     # INCREMENTAR CONTADOR DE TRÁFICO
     # Cada vez que K6 entra aquí, sube +1 en Redis para este servidor
     try:
-        await redis_client.incr(f"requests:{HOSTNAME}")
+        await redis_client.incr(f"requests:{WORKER_ID}")
     except:
         pass
 
     return {
         "sistema": "SISLAB", 
         "servidor": HOSTNAME,
+        "worker": WORKER_ID,
         "mensaje": "Petición procesada correctamente"
     }
 
@@ -233,8 +610,8 @@ async def reset_counters():
     # (Si las borras totalmente, podrían desaparecer las barras hasta el próximo heartbeat)
     active_instances = await redis_client.keys("instance:*")
     for instance in active_instances:
-        hostname = instance.split(":")[1]
-        await redis_client.set(f"requests:{hostname}", 0)
+        worker_id = instance.split(":", 1)[1]
+        await redis_client.set(f"requests:{worker_id}", 0)
 
     return {"message": "🧹 Contadores reiniciados correctamente"}
 
@@ -245,9 +622,9 @@ async def reset_counters():
 async def catch_all_demo(full_path: str):
     try:
         # ¡IMPORTANTE! Sumar al contador
-        await redis_client.incr(f"requests:{HOSTNAME}")
+        await redis_client.incr(f"requests:{WORKER_ID}")
     except Exception as e:
-        print(f"Error contando: {e}")
+        log.warning("Error contando: %s", e, extra={"store": "redis"})
 
     return {
         "mensaje": "Ruta de demostración capturada", 
@@ -9,4 +9,5 @@ class ItemModel(Base):
     type = Column(String(50))             # Ej: Computadora
     status = Column(String(50))           # Ej: Operativa
     area = Column(String(100))            # Ej: Sala 1
-    acquisition_date = Column(String(20)) # Ej: 2024-01-01
\ No newline at end of file
+    acquisition_date = Column(String(20)) # Ej: 2024-01-01
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Control optimista (If-Match)
\ No newline at end of file
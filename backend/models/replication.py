@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Float, Integer
+from backend.database import Base
+
+class ReplicationHeartbeat(Base):
+    # Fila única que el primario actualiza; leída en cada réplica mide su retraso
+    __tablename__ = "replication_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    ts = Column(Float, nullable=False)    # Epoch (segundos) de la última escritura en el primario
@@ -1,31 +1,31 @@
+from functools import lru_cache
 from fastapi import APIRouter, HTTPException, Depends, status
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
 # Importaciones con ruta absoluta del proyecto
-from backend.database import SessionLocal 
+from backend.services.db_router import get_read_db, get_write_db
+from backend.services.logs import get_logger
 from backend.models.users import User
 from backend.schemas.users import UserCreate, UserLogin, UserOut
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib + bcrypt se importan en el primer login/registro, no al arrancar
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-router = APIRouter(prefix="/auth", tags=["Autenticación"])
+log = get_logger("auth")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 @router.post("/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+def register_user(user: UserCreate, db: Session = Depends(get_write_db)):
     db_user = db.query(User).filter(User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
@@ -41,12 +41,13 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 @router.post("/login")
-def login_user(user_credentials: UserLogin, db: Session = Depends(get_db)):
+def login_user(user_credentials: UserLogin, db: Session = Depends(get_read_db)):
     # Buscamos al usuario
     user = db.query(User).filter(User.username == user_credentials.username).first()
     
     if not user:
-        print(f"❌ Intento de login fallido: {user_credentials.username}")
+        # Auditoría: cada intento cuenta, el filtro de repetidos no lo agrupa
+        log.warning("❌ Intento de login fallido: %s", user_credentials.username, extra={"dedup": False})
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     if not verify_password(user_credentials.password, user.password):
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Body, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from backend.database import get_db, mongo_db
+from backend.database import SessionLocal, get_mongo_db
 from backend.models.inventory import ItemModel
 from backend.schemas.inventory import ItemCreate, Laboratory
 from backend.services.mysql_redis_sync import (
@@ -12,11 +14,34 @@ from backend.services.mysql_redis_sync import (
     add_pending_delete,
     update_item_in_redis_cache,
     delete_item_from_redis_cache,
+    resolve_item_id,
+    get_real_item_id,
+    update_pending_create,
+    delete_pending_create,
+    get_pending_depth,
+    fetch_all_items,
+    get_items_body,
+    get_items_snapshot,
+    drop_mysql_items_body,
+    update_item_row,
+    delete_item_row,
+    get_item_version,
+    is_write_behind,
+    ITEMS_READ_NAMESPACE,
+    WRITE_BEHIND_MAX_PENDING,
 )
+from backend.services import codec
+from backend.services.lab_cache import get_lab_cached, invalidate_lab
+from backend.services.item_changes import change_events
+from backend.services.db_router import LazyReadDB, get_lazy_read_db, get_write_db
+from backend.services.logs import get_logger
+from backend.services.singleflight import coalesce, forget
 from bson import ObjectId
-from typing import List, Dict
+from typing import List, Dict, Optional
 import uuid  # Para generar IDs unicos para los items de mongo
 
+log = get_logger("inventory")
+
 router = APIRouter(prefix="/laboratories", tags=["Gestión Híbrida"])
 
 # ==========================================
@@ -24,33 +49,121 @@ router = APIRouter(prefix="/laboratories", tags=["Gestión Híbrida"])
 # ==========================================
 
 
+async def _items_body_response(request: Request, source: str) -> Optional[Response]:
+    """
+    Sirve GET /items con el cuerpo ya codificado (y comprimido) que mantiene el
+    servicio de sincronización: sin decodificar ni recodificar JSON por petición.
+    """
+    accept_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    cached = await coalesce(
+        (ITEMS_READ_NAMESPACE, "body", source, accept_gzip), lambda: get_items_body(source, accept_gzip)
+    )
+    if cached is None:
+        return None
+    body, etag, gzipped = cached
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _encode_mysql_items(engine) -> bytes:
+    # Sesión propia: la carga agrupada puede seguir viva cuando termina la petición que la inició
+    db = SessionLocal(bind=engine)
+    try:
+        return codec.json_dumps({"source": "MySQL", "data": fetch_all_items(db)})
+    finally:
+        db.close()
+
+
 @router.get("/items")
-async def list_global_items(db: Session = Depends(get_db)):
+async def list_global_items(request: Request, read_db: LazyReadDB = Depends(get_lazy_read_db)):
+    if is_write_behind():
+        # Write-behind: la caché incluye las escrituras aún no volcadas (read-your-writes)
+        response = await _items_body_response(request, "REDIS_WRITE_BEHIND")
+        if response is not None:
+            return response
+        data = await get_items_from_redis_fallback()
+        if data:
+            return {"source": "REDIS_WRITE_BEHIND", "data": data}
+    else:
+        # La caché refleja MySQL (se escribe tras cada commit y en cada sync)
+        response = await _items_body_response(request, "MySQL")
+        if response is not None:
+            return response
     try:
-        items = db.query(ItemModel).all()
-        data = [
-            {
-                "id": i.id,
-                "code": i.code,
-                "type": i.type,
-                "status": i.status,
-                "area": i.area,
-                "acquisition_date": getattr(i, "acquisition_date", "") or "",
-            }
-            for i in items
-        ]
-        return {"source": "MySQL", "data": data}
+        # Peticiones simultáneas comparten una sola consulta y su JSON ya codificado
+        # (el destino de lectura y su consulta a Redis sólo se resuelven aquí)
+        # El destino va en la clave: quien acaba de escribir (primario) no se une a una lectura de réplica
+        engine = await read_db.engine()
+        body = await coalesce(
+            (ITEMS_READ_NAMESPACE, "mysql", engine.pool.logging_name),
+            lambda: asyncio.to_thread(_encode_mysql_items, engine),
+        )
+        return Response(content=body, media_type="application/json")
     except Exception as e:
-        print(f"⚠️ [MySQL CAÍDO] Leyendo desde Redis: {e}")
+        log.warning("⚠️ [MySQL CAÍDO] Leyendo desde Redis: %s", e, extra={"store": "mysql"})
+        await drop_mysql_items_body()
+        response = await _items_body_response(request, "REDIS_CACHE")
+        if response is not None:
+            return response
         data = await get_items_from_redis_fallback()
         if not data:
             return {"source": "REDIS_EMPTY", "data": [], "message": "No hay datos en respaldo"}
         return {"source": "REDIS_CACHE", "message": "Modo de Emergencia - Redis como caché", "data": data}
 
 
+# --- Escrituras encoladas en Redis (MySQL caído o modo write-behind) ---
+WRITE_BEHIND_MESSAGE = "Escritura encolada en Redis. Se aplicará en MySQL en segundo plano."
+
+
+async def _check_backpressure():
+    """En write-behind rechaza escrituras si la cola supera WRITE_BEHIND_MAX_PENDING"""
+    depth = await get_pending_depth()
+    if depth >= WRITE_BEHIND_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Cola de escrituras llena ({depth} pendientes). Reintente en unos segundos.",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def _queue_create(item_dict, source, status, message):
+    # El id temporal (pending_xxx) sirve para editar/borrar el item mientras
+    # está pendiente y se traduce al id real al sincronizar
+    item_with_id = await add_item_to_redis_pending_and_cache(item_dict)
+    return {"source": source, "status": status, "message": message, "data": item_with_id}
+
+
+async def _queue_update(item_id, item_data, source, status, message):
+    # Buscar en caché Redis y actualizar ahí
+    found = await update_item_in_redis_cache(
+        item_id,
+        {k: v for k, v in item_data.items() if k in ("code", "type", "status", "area", "acquisition_date")},
+    )
+    if not found:
+        raise HTTPException(status_code=404, detail="Item no encontrado")
+    await add_pending_update(item_id, item_data)
+    return {"source": source, "status": status, "message": message, "data": {**item_data, "id": item_id}}
+
+
+async def _queue_delete(item_id, source, status, message):
+    # Eliminar de caché Redis
+    found = await delete_item_from_redis_cache(item_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Item no encontrado")
+    await add_pending_delete(item_id)
+    return {"source": source, "status": status, "message": message, "id": item_id}
+
+
 @router.post("/items")
-async def create_global_item(item: ItemCreate, db: Session = Depends(get_db)):
+async def create_global_item(item: ItemCreate, db: Session = Depends(get_write_db)):
     item_dict = item.model_dump()
+    if is_write_behind():
+        await _check_backpressure()
+        return await _queue_create(item_dict, "REDIS_WRITE_BEHIND", "accepted", WRITE_BEHIND_MESSAGE)
     try:
         new_db_item = ItemModel(**item_dict)
         db.add(new_db_item)
@@ -64,127 +177,215 @@ async def create_global_item(item: ItemCreate, db: Session = Depends(get_db)):
             "status": new_db_item.status,
             "area": new_db_item.area,
             "acquisition_date": getattr(new_db_item, "acquisition_date", "") or "",
+            "version": new_db_item.version,
         }
-        await add_item_to_redis_cache(item_with_id)
+        await add_item_to_redis_cache(item_with_id, from_mysql=True)
         return {"source": "MySQL", "status": "success", "data": item_with_id}
     except Exception as e:
-        print(f"⚠️ [MySQL FALLÓ] Guardando en Redis: {e}")
-        await add_item_to_redis_pending_and_cache(item_dict)
-        return {
-            "source": "REDIS_BACKUP",
-            "status": "warning",
-            "message": "MySQL no disponible. Guardado en Redis. Se sincronizará cuando MySQL vuelva.",
-            "data": item_dict,
-        }
+        log.warning("⚠️ [MySQL FALLÓ] Guardando en Redis: %s", e, extra={"store": "mysql"})
+        return await _queue_create(
+            item_dict, "REDIS_BACKUP", "warning",
+            "MySQL no disponible. Guardado en Redis. Se sincronizará cuando MySQL vuelva.",
+        )
 
 
-@router.put("/items/{item_id}")
-async def update_global_item(item_id: int, item: ItemCreate, db: Session = Depends(get_db)):
-    item_data = item.model_dump()
+@router.get("/items/changes")
+async def stream_item_changes(request: Request, last_event_id: Optional[str] = None):
+    """
+    Server-Sent Events con los cambios del inventario global. El primer evento es
+    un "snapshot" con la lista completa; después llega un "change" por escritura.
+    Al reconectar, el navegador envía Last-Event-ID y sólo recibe lo que se perdió.
+    """
+    return StreamingResponse(
+        change_events(request.headers.get("last-event-id") or last_event_id, get_items_snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/items/id-map/{temp_id}")
+async def get_item_id_mapping(temp_id: str):
+    """Traduce un id temporal (creado sin MySQL) a su id real una vez sincronizado"""
+    real_id = await get_real_item_id(temp_id)
+    return {"temp_id": temp_id, "id": real_id, "synced": real_id is not None}
+
+
+async def _resolve_or_404(raw_id: str):
+    item_id = await resolve_item_id(raw_id)
+    if item_id is None:
+        raise HTTPException(status_code=404, detail="Item no encontrado")
+    return item_id
+
+
+def _if_match_version(request: Request) -> Optional[int]:
+    """Versión esperada según If-Match ("3", 3 o W/"3"); None sin cabecera o con "*"."""
+    value = (request.headers.get("if-match") or "").strip()
+    if not value or value == "*":
+        return None
     try:
-        db_item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail="Item no encontrado en MySQL")
+        return int(value.removeprefix("W/").strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match debe ser la versión del item")
 
-        db_item.code = item.code
-        db_item.type = item.type
-        db_item.status = item.status
-        db_item.area = item.area
-        if hasattr(db_item, "acquisition_date"):
-            db_item.acquisition_date = item.acquisition_date
 
+def _missing_or_conflict(db: Session, item_id: int, expected_version: Optional[int], detail: str):
+    """Ninguna fila coincidió: 404 si no existe; 412 si existe con otra versión (sólo con If-Match)"""
+    current = get_item_version(db, item_id) if expected_version is not None else None
+    if current is None:
+        return HTTPException(status_code=404, detail=detail)
+    return HTTPException(
+        status_code=412,
+        detail=f"El item cambió (versión actual {current}, esperada {expected_version})",
+        headers={"ETag": f'"{current}"'},
+    )
+
+
+@router.put("/items/{item_id}")
+async def update_global_item(
+    item_id: str, item: ItemCreate, request: Request, response: Response, db: Session = Depends(get_write_db)
+):
+    """
+    Un solo UPDATE ... WHERE id en MySQL; el número de filas afectadas decide el 404.
+    Con If-Match: <versión> la actualización es condicional (412 si el item cambió).
+    Las escrituras encoladas en Redis (pendientes, write-behind, MySQL caído) no comprueban la versión.
+    """
+    item_data = item.model_dump()
+    expected_version = _if_match_version(request)
+    item_id = await _resolve_or_404(item_id)
+    if isinstance(item_id, str):
+        # Item creado sin MySQL que aún no se sincronizó: se edita el pendiente
+        if not await update_pending_create(item_id, item_data):
+            raise HTTPException(status_code=404, detail="Item no encontrado")
+        return {
+            "source": "REDIS_BACKUP",
+            "status": "warning",
+            "message": "Item pendiente de sincronizar. Actualización guardada en Redis.",
+            "data": {**item_data, "id": item_id},
+        }
+    if is_write_behind():
+        await _check_backpressure()
+        return await _queue_update(item_id, item_data, "REDIS_WRITE_BEHIND", "accepted", WRITE_BEHIND_MESSAGE)
+    try:
+        version = update_item_row(db, item_id, item_data, expected_version)
+        if version is None:
+            raise _missing_or_conflict(db, item_id, expected_version, "Item no encontrado en MySQL")
         db.commit()
-        db.refresh(db_item)
         # Dual-write: actualizar Redis
         updated = {
-            "id": db_item.id,
-            "code": db_item.code,
-            "type": db_item.type,
-            "status": db_item.status,
-            "area": db_item.area,
-            "acquisition_date": getattr(db_item, "acquisition_date", "") or "",
+            "id": item_id,
+            "code": item.code,
+            "type": item.type,
+            "status": item.status,
+            "area": item.area,
+            "acquisition_date": item.acquisition_date or "",
+            "version": version,
         }
-        await update_item_in_redis_cache(item_id, updated)
+        await update_item_in_redis_cache(item_id, updated, from_mysql=True)
+        response.headers["ETag"] = f'"{version}"'
         return {"source": "MySQL", "status": "updated", "data": updated}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"⚠️ [MySQL FALLÓ] Aplicando update en Redis: {e}")
-        # Fallback: buscar en caché Redis y actualizar ahí
-        found = await update_item_in_redis_cache(
-            item_id,
-            {k: v for k, v in item_data.items() if k in ("code", "type", "status", "area", "acquisition_date")},
+        log.warning("⚠️ [MySQL FALLÓ] Aplicando update en Redis: %s", e, extra={"store": "mysql"})
+        return await _queue_update(
+            item_id, item_data, "REDIS_BACKUP", "warning",
+            "MySQL no disponible. Actualización en Redis. Se sincronizará cuando MySQL vuelva.",
         )
-        if not found:
+
+
+@router.delete("/items/{item_id}")
+async def delete_global_item(item_id: str, request: Request, db: Session = Depends(get_write_db)):
+    """Un solo DELETE ... WHERE id (y version con If-Match), como en update_global_item"""
+    expected_version = _if_match_version(request)
+    item_id = await _resolve_or_404(item_id)
+    if isinstance(item_id, str):
+        # Item creado sin MySQL que aún no se sincronizó: nunca llegará a MySQL
+        if not await delete_pending_create(item_id):
             raise HTTPException(status_code=404, detail="Item no encontrado")
-        await add_pending_update(item_id, item_data)
         return {
             "source": "REDIS_BACKUP",
-            "status": "warning",
-            "message": "MySQL no disponible. Actualización en Redis. Se sincronizará cuando MySQL vuelva.",
-            "data": {**item_data, "id": item_id},
+            "status": "deleted",
+            "message": "Item pendiente eliminado antes de sincronizarse.",
+            "id": item_id,
         }
-
-
-@router.delete("/items/{item_id}")
-async def delete_global_item(item_id: int, db: Session = Depends(get_db)):
+    if is_write_behind():
+        await _check_backpressure()
+        return await _queue_delete(item_id, "REDIS_WRITE_BEHIND", "accepted", WRITE_BEHIND_MESSAGE)
     try:
-        db_item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail="Item no encontrado")
-
-        db.delete(db_item)
+        if not delete_item_row(db, item_id, expected_version):
+            raise _missing_or_conflict(db, item_id, expected_version, "Item no encontrado")
         db.commit()
         # Dual-write: eliminar de Redis
-        await delete_item_from_redis_cache(item_id)
+        await delete_item_from_redis_cache(item_id, from_mysql=True)
         return {"source": "MySQL", "status": "deleted", "id": item_id}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"⚠️ [MySQL FALLÓ] Aplicando delete en Redis: {e}")
-        # Fallback: eliminar de caché Redis
-        found = await delete_item_from_redis_cache(item_id)
-        if not found:
-            raise HTTPException(status_code=404, detail="Item no encontrado")
-        await add_pending_delete(item_id)
-        return {
-            "source": "REDIS_BACKUP",
-            "status": "warning",
-            "message": "MySQL no disponible. Eliminado de Redis. Se sincronizará cuando MySQL vuelva.",
-            "id": item_id,
-        }
+        log.warning("⚠️ [MySQL FALLÓ] Aplicando delete en Redis: %s", e, extra={"store": "mysql"})
+        return await _queue_delete(
+            item_id, "REDIS_BACKUP", "warning",
+            "MySQL no disponible. Eliminado de Redis. Se sincronizará cuando MySQL vuelva.",
+        )
 
 # ==========================================
 # 🟢 PARTE 2: MONGODB (Gestión Detallada de Laboratorios)
 # ==========================================
 
-@router.get("/", response_description="Listar laboratorios")
-async def list_laboratories():
+def _labs():
+    """Colección de laboratorios (el cliente Mongo se crea en el primer uso)"""
+    return get_mongo_db()["laboratories"]
+
+
+# Lecturas agrupadas (singleflight) de la lista de laboratorios
+LABS_READ_NAMESPACE = "labs"
+
+
+async def _lab_changed(lab_id: str) -> None:
+    """Tras una escritura en Mongo: caché y carga agrupada del laboratorio, y lista agrupada"""
+    forget(LABS_READ_NAMESPACE)
+    await invalidate_lab(lab_id)
+
+
+async def _load_laboratories_body() -> bytes:
     laboratories = []
-    cursor = mongo_db["laboratories"].find()
+    cursor = _labs().find()
     async for document in cursor:
         document["id"] = str(document["_id"])
         del document["_id"]
         laboratories.append(document)
-    return laboratories
+    return codec.json_dumps(laboratories)
+
+
+@router.get("/", response_description="Listar laboratorios")
+async def list_laboratories():
+    # Peticiones simultáneas comparten un solo cursor de Mongo y su JSON ya codificado
+    body = await coalesce(LABS_READ_NAMESPACE, _load_laboratories_body)
+    return Response(content=body, media_type="application/json")
 
 @router.post("/", response_description="Crear laboratorio", status_code=201)
 async def create_laboratory(lab: Laboratory):
     lab_dict = lab.model_dump(by_alias=True, exclude=["id"])
     if "items" not in lab_dict: lab_dict["items"] = [] # Asegurar que exista array
-    new_lab = await mongo_db["laboratories"].insert_one(lab_dict)
-    created_lab = await mongo_db["laboratories"].find_one({"_id": new_lab.inserted_id})
+    new_lab = await _labs().insert_one(lab_dict)
+    forget(LABS_READ_NAMESPACE)
+    created_lab = await _labs().find_one({"_id": new_lab.inserted_id})
     created_lab["id"] = str(created_lab["_id"])
     del created_lab["_id"]
     return created_lab
 
+async def _load_laboratory(id: str):
+    lab = await _labs().find_one({"_id": ObjectId(id)})
+    if lab:
+        lab["id"] = str(lab["_id"])
+        del lab["_id"]
+    return lab
+
 @router.get("/{id}", response_description="Obtener un laboratorio")
 async def get_laboratory(id: str):
     if not ObjectId.is_valid(id): raise HTTPException(status_code=400, detail="ID inválido")
-    lab = await mongo_db["laboratories"].find_one({"_id": ObjectId(id)})
+    # Read-through: Redis primero, Mongo sólo si no hay copia vigente
+    lab = await get_lab_cached(id, lambda: _load_laboratory(id))
     if not lab: raise HTTPException(status_code=404, detail="Laboratorio no encontrado")
-    lab["id"] = str(lab["_id"])
-    del lab["_id"]
     return lab
 
 # 7. ELIMINAR LABORATORIO (MONGO)
@@ -193,11 +394,12 @@ async def delete_laboratory(id: str):
     if not ObjectId.is_valid(id):
         raise HTTPException(status_code=400, detail="ID inválido")
     
-    result = await mongo_db["laboratories"].delete_one({"_id": ObjectId(id)})
+    result = await _labs().delete_one({"_id": ObjectId(id)})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Laboratorio no encontrado")
     
+    await _lab_changed(id)
     return {"message": "Laboratorio eliminado correctamente"}
 
 # --- ENDPOINT QUE FALTABA 1: AGREGAR ITEM A UN LAB (MONGO) ---
@@ -208,12 +410,13 @@ async def add_item_to_lab(id: str, item: ItemCreate):
     new_item["id"] = str(uuid.uuid4()) # ID único simulado
     new_item["maintenance_history"] = [] # Array vacío para mantenimientos
 
-    result = await mongo_db["laboratories"].update_one(
+    result = await _labs().update_one(
         {"_id": ObjectId(id)},
         {"$push": {"items": new_item}}
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Laboratorio no encontrado")
+    await _lab_changed(id)
     return {"message": "Máquina agregada a MongoDB", "item": new_item}
 
 # --- ENDPOINT DE ACTUALIZAR (Ya lo tenías) ---
@@ -225,12 +428,13 @@ async def update_mongo_item(lab_id: str, item_id: str, item_data: ItemCreate):
         "items.$.status": item_data.status,
         "items.$.area": item_data.area
     }
-    result = await mongo_db["laboratories"].update_one(
+    result = await _labs().update_one(
         {"_id": ObjectId(lab_id), "items.id": item_id},
         {"$set": update_data}
     )
     if result.modified_count == 0:
          raise HTTPException(status_code=404, detail="Item no encontrado")
+    await _lab_changed(lab_id)
     return {"message": "Item actualizado"}
 
 # --- ENDPOINT QUE FALTABA 2: AGREGAR MANTENIMIENTO (MONGO) ---
@@ -239,12 +443,13 @@ async def add_maintenance(lab_id: str, item_id: str, maintenance: Dict = Body(..
     # maintenance viene como { "date": "...", "description": "..." }
     maintenance["id"] = str(uuid.uuid4())
     
-    result = await mongo_db["laboratories"].update_one(
+    result = await _labs().update_one(
         {"_id": ObjectId(lab_id), "items.id": item_id},
         {"$push": {"items.$.maintenance_history": maintenance}}
     )
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="No se pudo agregar mantenimiento")
+    await _lab_changed(lab_id)
     return {"message": "Mantenimiento registrado"}
 
 
@@ -257,7 +462,7 @@ async def delete_item_from_lab(lab_id: str, item_id: str):
         raise HTTPException(status_code=400, detail="ID de laboratorio inválido")
 
     # Usamos $pull para sacar el item del array basado en su 'id' interno
-    result = await mongo_db["laboratories"].update_one(
+    result = await _labs().update_one(
         {"_id": ObjectId(lab_id)},
         {"$pull": {"items": {"id": item_id}}}
     )
@@ -265,4 +470,5 @@ async def delete_item_from_lab(lab_id: str, item_id: str):
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Máquina no encontrada o Laboratorio no existe")
 
+    await _lab_changed(lab_id)
     return {"message": "Máquina eliminada correctamente"}
\ No newline at end of file
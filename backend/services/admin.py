@@ -0,0 +1,36 @@
+"""
+Acceso de administración a las herramientas de diagnóstico (perfilado de CPU y memoria).
+
+No hay roles en la tabla de usuarios: el acceso se concede con la cabecera
+X-Admin-Token igual a ADMIN_TOKEN. Sin ADMIN_TOKEN configurado las herramientas
+quedan deshabilitadas.
+"""
+
+import hmac
+import os
+
+from fastapi import HTTPException, Request
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_TOKEN_HEADER = "x-admin-token"
+
+
+def admin_enabled() -> bool:
+    return bool(ADMIN_TOKEN)
+
+
+def is_admin_token(token) -> bool:
+    """Compara en tiempo constante; acepta str o bytes (cabeceras ASGI crudas)"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    if isinstance(token, str):
+        token = token.encode()
+    return hmac.compare_digest(token, ADMIN_TOKEN.encode())
+
+
+async def require_admin(request: Request) -> None:
+    """Dependencia FastAPI para endpoints de diagnóstico"""
+    if not admin_enabled():
+        raise HTTPException(status_code=404, detail="Herramientas de diagnóstico deshabilitadas (ADMIN_TOKEN)")
+    if not is_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Se requiere X-Admin-Token válido")
@@ -0,0 +1,190 @@
+"""
+Control de admisión por clase de ruta: límite de concurrencia, cola acotada y
+rechazo rápido (503 + Retry-After) antes de que la latencia se dispare.
+
+- Clases: "read" (GET/HEAD) y "write" (POST/PUT/PATCH/DELETE). Salud, estado
+  y streams (/health, /system/*, /sync/*, SSE) quedan exentos: deben
+  responder justo cuando la réplica está saturada (healthcheck de Docker,
+  dashboard).
+- Cada clase admite ADMISSION_<CLASE>_CONCURRENCY peticiones a la vez; las
+  demás esperan en una cola FIFO de ADMISSION_<CLASE>_QUEUE plazas.
+- Plazo: una petición no espera más de ADMISSION_QUEUE_TIMEOUT_MS. Con la
+  media móvil del tiempo de servicio se estima la espera al llegar; si ya
+  supera el plazo se rechaza en el acto en vez de ocupar la cola para nada.
+- Los 503 llevan Retry-After; axios.js ya reintenta los 503 con backoff.
+- Rechazos por clase y motivo en /system/admission.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from backend.services.logs import get_logger
+
+log = get_logger("admission")
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", "2000"))
+ADMISSION_LIMITS = {
+    "read": (
+        int(os.getenv("ADMISSION_READ_CONCURRENCY", "64")),
+        int(os.getenv("ADMISSION_READ_QUEUE", "128")),
+    ),
+    "write": (
+        int(os.getenv("ADMISSION_WRITE_CONCURRENCY", "32")),
+        int(os.getenv("ADMISSION_WRITE_QUEUE", "64")),
+    ),
+}
+# Peso de la última muestra en la media móvil del tiempo de servicio
+_EWMA_ALPHA = 0.2
+
+EXEMPT_PATHS = {"/health", "/laboratories/items/changes"}
+EXEMPT_PREFIXES = ("/system/", "/sync/")
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class _RouteClass:
+    """Ranuras de ejecución y cola FIFO de una clase de rutas"""
+
+    def __init__(self, name: str, limit: int, queue_limit: int):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_ms = 0.0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+
+    def expected_wait_ms(self) -> float:
+        """Espera estimada para quien llegue ahora (cola delante / ranuras × tiempo medio)"""
+        return (len(self.waiters) + 1) * self.service_ms / max(self.limit, 1)
+
+    async def acquire(self) -> Optional[str]:
+        """None si obtiene ranura; si no, el motivo del rechazo"""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return None
+        if len(self.waiters) >= self.queue_limit:
+            return "queue_full"
+        if self.expected_wait_ms() > ADMISSION_QUEUE_TIMEOUT_MS:
+            return "deadline"
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), ADMISSION_QUEUE_TIMEOUT_MS / 1000)
+            return None
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # La ranura llegó justo al vencer el plazo: se devuelve
+                self.release()
+            else:
+                waiter.cancel()
+            return "timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def release(self) -> None:
+        # La ranura pasa directamente al primero de la cola que siga esperando
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.admitted += 1
+        if self.service_ms == 0.0:
+            self.service_ms = elapsed_ms
+        else:
+            self.service_ms += _EWMA_ALPHA * (elapsed_ms - self.service_ms)
+
+
+_classes: Dict[str, _RouteClass] = {
+    name: _RouteClass(name, limit, queue_limit) for name, (limit, queue_limit) in ADMISSION_LIMITS.items()
+}
+
+
+def route_class(scope) -> Optional[str]:
+    """Clase de la petición o None si está exenta"""
+    path = scope["path"]
+    if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+        return None
+    return "write" if scope["method"] in WRITE_METHODS else "read"
+
+
+async def _reject(send, route_cls: _RouteClass, reason: str) -> None:
+    retry_after = max(1, math.ceil(route_cls.expected_wait_ms() / 1000))
+    body = json.dumps({
+        "detail": "Réplica saturada, reintente en unos segundos",
+        "reason": reason,
+        "class": route_cls.name,
+    }, ensure_ascii=False).encode()
+    await send({"type": "http.response.start", "status": 503, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(retry_after).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI: admite, encola o rechaza cada petición según su clase"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        name = route_class(scope)
+        if name is None:
+            return await self.app(scope, receive, send)
+        route_cls = _classes[name]
+        reason = await route_cls.acquire()
+        if reason is not None:
+            route_cls.shed[reason] += 1
+            log.warning("⚠️ [ADMISSION] Petición rechazada (%s, %s)", name, reason,
+                        extra={"dedup_key": (name, reason)})
+            return await _reject(send, route_cls, reason)
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route_cls.observe((time.perf_counter() - t0) * 1000)
+            route_cls.release()
+
+
+def get_admission_stats() -> Dict[str, Any]:
+    return {
+        "enabled": ADMISSION_CONTROL,
+        "queue_timeout_ms": ADMISSION_QUEUE_TIMEOUT_MS,
+        "classes": {
+            name: {
+                "limit": c.limit,
+                "queue_limit": c.queue_limit,
+                "active": c.active,
+                "queued_now": len(c.waiters),
+                "service_ms": round(c.service_ms, 2),
+                "admitted": c.admitted,
+                "queued": c.queued,
+                "shed": dict(c.shed),
+                "shed_total": sum(c.shed.values()),
+            }
+            for name, c in _classes.items()
+        },
+    }
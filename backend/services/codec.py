@@ -0,0 +1,111 @@
+"""
+Codecs para los valores que el servicio de sincronización guarda en Redis
+y para las respuestas JSON de la API.
+
+Formato de los valores en Redis:
+- JSON "legacy" sin etiqueta: lo que escriben las réplicas antiguas (json.dumps)
+  y lo que escribimos por defecto, para que réplicas viejas y nuevas convivan
+  durante un despliegue.
+- Valor etiquetado: MAGIC + versión + formato + payload. MAGIC (0xC1) no puede
+  iniciar un JSON ni un texto UTF-8 válido, así que nunca se confunde con legacy.
+  Formatos: "j" JSON, "m" msgpack, "z" zstd (el payload comprimido es a su vez
+  un valor etiquetado).
+
+REDIS_CODEC=msgpack y REDIS_COMPRESS_MIN_BYTES>0 sólo deben activarse cuando
+todas las réplicas entienden valores etiquetados.
+"""
+
+import json
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+REDIS_CODEC = os.getenv("REDIS_CODEC", "json").lower()
+# Comprimir con zstd los valores de al menos N bytes (0 = nunca)
+REDIS_COMPRESS_MIN_BYTES = int(os.getenv("REDIS_COMPRESS_MIN_BYTES", "0"))
+REDIS_COMPRESS_LEVEL = int(os.getenv("REDIS_COMPRESS_LEVEL", "3"))
+
+MAGIC = b"\xc1"
+VERSION = b"\x01"
+FMT_JSON = b"j"
+FMT_MSGPACK = b"m"
+FMT_ZSTD = b"z"
+_HEADER_LEN = 3
+
+
+def json_dumps(obj: Any) -> bytes:
+    """JSON compacto en bytes (orjson si está instalado)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def json_loads(raw) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _tag(fmt: bytes, payload: bytes) -> bytes:
+    return MAGIC + VERSION + fmt + payload
+
+
+def dumps(obj: Any) -> bytes:
+    """Codifica un valor para Redis según REDIS_CODEC / REDIS_COMPRESS_MIN_BYTES."""
+    if REDIS_CODEC == "msgpack" and msgpack is not None:
+        value = _tag(FMT_MSGPACK, msgpack.packb(obj, use_bin_type=True))
+    else:
+        value = json_dumps(obj)
+
+    if REDIS_COMPRESS_MIN_BYTES and zstandard is not None and len(value) >= REDIS_COMPRESS_MIN_BYTES:
+        if not value.startswith(MAGIC):
+            value = _tag(FMT_JSON, value)
+        compressed = zstandard.ZstdCompressor(level=REDIS_COMPRESS_LEVEL).compress(value)
+        value = _tag(FMT_ZSTD, compressed)
+    return value
+
+
+def loads(raw) -> Any:
+    """Decodifica un valor de Redis: acepta JSON legacy (str o bytes) y valores etiquetados."""
+    if isinstance(raw, str):
+        return json_loads(raw)
+    if not raw.startswith(MAGIC):
+        return json_loads(raw)
+
+    version, fmt, payload = raw[1:2], raw[2:3], raw[_HEADER_LEN:]
+    if version != VERSION:
+        raise ValueError(f"Versión de codec desconocida: {version!r}")
+    if fmt == FMT_JSON:
+        return json_loads(payload)
+    if fmt == FMT_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Valor msgpack en Redis pero msgpack no está instalado")
+        return msgpack.unpackb(payload, raw=False)
+    if fmt == FMT_ZSTD:
+        if zstandard is None:
+            raise ValueError("Valor zstd en Redis pero zstandard no está instalado")
+        return loads(zstandard.ZstdDecompressor().decompress(payload))
+    raise ValueError(f"Formato de codec desconocido: {fmt!r}")
+
+
+class FastJSONResponse(JSONResponse):
+    """Respuesta JSON de la API codificada con json_dumps (orjson si está disponible)."""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
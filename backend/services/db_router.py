@@ -0,0 +1,209 @@
+"""
+Enrutado de lecturas MySQL entre el primario y las réplicas (MYSQL_REPLICA_URLS).
+
+- Las escrituras siempre van al primario (get_write_db).
+- Las lecturas (get_read_db) van a una réplica sana por turno rotatorio.
+- Retraso: el primario actualiza una fila en replication_heartbeat cada
+  MYSQL_REPLICA_CHECK_INTERVAL_S; leerla en cada réplica da su retraso. Una
+  réplica con más de MYSQL_REPLICA_MAX_LAG_S (o sin medición reciente) no recibe
+  lecturas.
+- Read-your-writes: tras una escritura, el cliente lee del primario durante
+  MYSQL_READ_YOUR_WRITES_S. La marca vive en Redis porque la siguiente petición
+  puede caer en otra réplica del backend. Con get_lazy_read_db el destino (y
+  esa consulta a Redis) sólo se resuelve si la ruta llega a leer de MySQL.
+Sin réplicas configuradas todo va al primario, como siempre.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from typing import Any, Dict, List
+
+from fastapi import Request
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from backend.database import SessionLocal, mysql_engine, redis_client, replica_engines
+from backend.models.replication import ReplicationHeartbeat
+from backend.services.logs import get_logger
+from backend.services.query_stats import query_scope
+
+log = get_logger("replicas")
+
+MYSQL_REPLICA_MAX_LAG_S = float(os.getenv("MYSQL_REPLICA_MAX_LAG_S", "2"))
+MYSQL_REPLICA_CHECK_INTERVAL_S = float(os.getenv("MYSQL_REPLICA_CHECK_INTERVAL_S", "1"))
+MYSQL_READ_YOUR_WRITES_S = float(os.getenv("MYSQL_READ_YOUR_WRITES_S", "5"))
+
+REDIS_RECENT_WRITE_PREFIX = "mysql:recent_write:"
+
+# Última medición por réplica: índice → {"lag_s", "checked_at", "error"}
+replica_status: Dict[int, Dict[str, Any]] = {}
+_round_robin = itertools.count()
+
+
+def replicas_enabled() -> bool:
+    return bool(replica_engines)
+
+
+def _client_key(request: Request) -> str:
+    # NGINX pasa la IP real del cliente en X-Real-IP
+    host = request.headers.get("x-real-ip") or (request.client.host if request.client else "")
+    return f"{REDIS_RECENT_WRITE_PREFIX}{host or 'anon'}"
+
+
+async def mark_client_write(request: Request) -> None:
+    """Fuerza las lecturas de este cliente al primario durante MYSQL_READ_YOUR_WRITES_S"""
+    try:
+        await redis_client.set(_client_key(request), 1, px=int(MYSQL_READ_YOUR_WRITES_S * 1000))
+    except Exception as e:
+        log.warning("⚠️ [REPLICAS] No se pudo marcar escritura reciente: %s", e)
+
+
+async def _client_wrote_recently(request: Request) -> bool:
+    try:
+        return bool(await redis_client.exists(_client_key(request)))
+    except Exception:
+        # Sin Redis no sabemos si escribió: el primario es lo seguro
+        return True
+
+
+def _healthy_replicas() -> List[int]:
+    stale_after = 3 * MYSQL_REPLICA_CHECK_INTERVAL_S + 1
+    now = time.time()
+    return [
+        n for n, status in sorted(replica_status.items())
+        if status["lag_s"] is not None
+        and status["lag_s"] <= MYSQL_REPLICA_MAX_LAG_S
+        and now - status["checked_at"] <= stale_after
+    ]
+
+
+async def choose_read_engine(request: Request = None):
+    """Engine para una lectura: una réplica sana o, si no hay, el primario"""
+    if not replica_engines:
+        return mysql_engine
+    healthy = _healthy_replicas()
+    if not healthy:
+        return mysql_engine
+    if request is not None and await _client_wrote_recently(request):
+        return mysql_engine
+    return replica_engines[healthy[next(_round_robin) % len(healthy)]]
+
+
+async def get_read_db(request: Request):
+    """Dependencia FastAPI: sesión para endpoints de sólo lectura"""
+    db = SessionLocal(bind=await choose_read_engine(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class LazyReadDB:
+    """Destino de lectura que se elige en el primer uso (rutas que casi siempre sirven de Redis)"""
+
+    def __init__(self, request: Request):
+        self.request = request
+        self._engine = None
+        self._sessions: List[Session] = []
+
+    async def engine(self):
+        if self._engine is None:
+            self._engine = await choose_read_engine(self.request)
+        return self._engine
+
+    async def session(self) -> Session:
+        """Sesión en el destino elegido; se cierra al terminar la petición"""
+        db = SessionLocal(bind=await self.engine())
+        self._sessions.append(db)
+        return db
+
+    def close(self) -> None:
+        for db in self._sessions:
+            db.close()
+
+
+async def get_lazy_read_db(request: Request):
+    """Dependencia FastAPI: como get_read_db, pero sin elegir destino hasta que se use"""
+    lazy = LazyReadDB(request)
+    try:
+        yield lazy
+    finally:
+        lazy.close()
+
+
+async def get_write_db(request: Request):
+    """Dependencia FastAPI: sesión en el primario que marca al cliente como escritor reciente"""
+    if replica_engines:
+        await mark_client_write(request)
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# --- Medición de retraso ---
+def _write_heartbeat_sync() -> None:
+    now = time.time()
+    with mysql_engine.begin() as conn:
+        updated = conn.execute(
+            update(ReplicationHeartbeat).where(ReplicationHeartbeat.id == 1).values(ts=now)
+        ).rowcount
+        if not updated:
+            conn.execute(insert(ReplicationHeartbeat).values(id=1, ts=now))
+
+
+def _read_replica_lag_sync(engine):
+    with engine.connect() as conn:
+        ts = conn.execute(select(ReplicationHeartbeat.ts).where(ReplicationHeartbeat.id == 1)).scalar()
+    return None if ts is None else max(0.0, time.time() - ts)
+
+
+async def check_replicas() -> None:
+    """Escribe el latido en el primario y mide el retraso de cada réplica"""
+    try:
+        await asyncio.to_thread(_write_heartbeat_sync)
+    except Exception as e:
+        # Con el primario caído el latido envejece y las réplicas acaban fuera por retraso
+        log.warning("⚠️ [REPLICAS] No se pudo escribir el latido en el primario: %s", e)
+
+    for n, engine in enumerate(replica_engines):
+        try:
+            lag, error = await asyncio.to_thread(_read_replica_lag_sync, engine), None
+        except Exception as e:
+            lag, error = None, str(e)
+        replica_status[n] = {"lag_s": lag, "checked_at": time.time(), "error": error}
+
+
+async def replica_lag_monitor():
+    """Tarea periódica de medición de retraso (sólo si hay réplicas configuradas)"""
+    while True:
+        try:
+            with query_scope("replicas:heartbeat"):
+                await check_replicas()
+            await asyncio.sleep(MYSQL_REPLICA_CHECK_INTERVAL_S)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            log.warning("⚠️ [REPLICAS] Error midiendo retraso: %s", e)
+            await asyncio.sleep(MYSQL_REPLICA_CHECK_INTERVAL_S)
+
+
+def get_replicas_status() -> Dict[str, Any]:
+    healthy = set(_healthy_replicas())
+    return {
+        "enabled": replicas_enabled(),
+        "max_lag_s": MYSQL_REPLICA_MAX_LAG_S,
+        "read_your_writes_s": MYSQL_READ_YOUR_WRITES_S,
+        "replicas": [
+            {
+                "url": engine.url.render_as_string(hide_password=True),
+                "healthy": n in healthy,
+                **{k: (round(v, 3) if isinstance(v, float) else v)
+                   for k, v in replica_status.get(n, {"lag_s": None, "checked_at": None, "error": None}).items()},
+            }
+            for n, engine in enumerate(replica_engines)
+        ],
+    }
@@ -0,0 +1,204 @@
+"""
+Claves de idempotencia para escrituras (cabecera Idempotency-Key).
+
+El cliente (frontend/src/api/axios.js) genera una clave por escritura y la
+repite en sus reintentos. La primera petición con esa clave se ejecuta y su
+respuesta se guarda en Redis; las repeticiones reciben la respuesta guardada
+(cabecera Idempotent-Replayed: true) sin tocar MySQL, Redis del inventario ni Mongo.
+Sólo aplica a las escrituras bajo /laboratories (items y laboratorios).
+
+- idem:lock:{llamante}:{clave} → huella de la petición mientras se ejecuta (SET NX, IDEMPOTENCY_LOCK_MS)
+- idem:resp:{llamante}:{clave} → hash con huella, estado, cabeceras y cuerpo (IDEMPOTENCY_TTL_S)
+El llamante es un prefijo del hash de Authorization (o, sin token, de la IP que
+pone nginx en X-Real-IP): una clave ajena nunca reproduce la respuesta de otro.
+Una repetición que llega mientras la original sigue en curso espera hasta
+IDEMPOTENCY_WAIT_MS a su respuesta; si no llega, 409 con Retry-After.
+La huella (método, ruta y cuerpo) evita reutilizar una clave para otra petición: 422.
+Las respuestas 5xx no se guardan (el reintento vuelve a ejecutarse). Sin Redis
+la petición se ejecuta sin idempotencia.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+from backend.database import redis_raw_client
+from backend.services.logs import get_logger
+
+log = get_logger("idempotency")
+
+IDEMPOTENCY_TTL_S = int(os.getenv("IDEMPOTENCY_TTL_S", "86400"))
+IDEMPOTENCY_LOCK_MS = int(os.getenv("IDEMPOTENCY_LOCK_MS", "30000"))
+IDEMPOTENCY_WAIT_MS = int(os.getenv("IDEMPOTENCY_WAIT_MS", "3000"))
+IDEMPOTENCY_MAX_BODY = int(os.getenv("IDEMPOTENCY_MAX_BODY", "262144"))
+_POLL_SECONDS = 0.05
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Sólo escrituras de items y laboratorios: /auth/* (login, registro) nunca se reproduce ni se guarda
+IDEMPOTENT_PREFIXES = ("/laboratories",)
+# Cabeceras propias de cada respuesta que no se repiten al reproducirla
+_SKIP_HEADERS = {b"content-length", b"date", b"server", b"server-timing", b"x-profile-file"}
+
+
+def _caller(scope) -> str:
+    """Prefijo que aísla las claves de cada llamante (token, o IP real sin token)"""
+    headers = dict(scope.get("headers") or [])
+    identity = headers.get(b"authorization")
+    if not identity:
+        client = scope.get("client")
+        identity = b"ip:" + (headers.get(b"x-real-ip") or (client[0] if client else "").encode())
+    return hashlib.sha256(identity).hexdigest()[:16]
+
+
+def _lock_key(key: str) -> str:
+    return f"idem:lock:{key}"
+
+
+def _resp_key(key: str) -> str:
+    return f"idem:resp:{key}"
+
+
+def _fingerprint(scope, body: bytes) -> bytes:
+    digest = hashlib.sha256()
+    for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b""), body):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest().encode()
+
+
+async def _send_json(send, status: int, detail: str, headers=()) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers,
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, stored) -> None:
+    headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(stored[b"headers"])]
+    body = stored[b"body"]
+    await send({"type": "http.response.start", "status": int(stored[b"status"]), "headers": [
+        *headers, (b"content-length", str(len(body)).encode()), (b"idempotent-replayed", b"true"),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+def _receive_with_body(body: bytes, receive):
+    """Entrega a la app el cuerpo ya leído; después, los mensajes reales (desconexión)"""
+    sent = False
+
+    async def receive_body():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return receive_body
+
+
+async def _wait_for_response(key: str):
+    """Espera a que termine la petición original con la misma clave (o a que suelte el lock)"""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_MS / 1000
+    while time.monotonic() < deadline:
+        await asyncio.sleep(_POLL_SECONDS)
+        async with redis_raw_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(_resp_key(key))
+            pipe.exists(_lock_key(key))
+            stored, locked = await pipe.execute()
+        if stored or not locked:
+            return stored, bool(locked)
+    return None, True
+
+
+class IdempotencyMiddleware:
+    """Middleware ASGI: sólo actúa en escrituras de /laboratories que traen Idempotency-Key"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] not in WRITE_METHODS
+                or not scope["path"].startswith(IDEMPOTENT_PREFIXES)):
+            return await self.app(scope, receive, send)
+        key = dict(scope.get("headers") or []).get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await self.app(scope, receive, send)
+        key = f"{_caller(scope)}:{key.decode(errors='replace')[:200]}"
+
+        # El cuerpo se lee entero para la huella y se vuelve a entregar a la app
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        fingerprint = _fingerprint(scope, body)
+
+        try:
+            async with redis_raw_client.pipeline(transaction=False) as pipe:
+                pipe.hgetall(_resp_key(key))
+                pipe.set(_lock_key(key), fingerprint, nx=True, px=IDEMPOTENCY_LOCK_MS)
+                stored, acquired = await pipe.execute()
+            if not stored and not acquired:
+                stored, still_running = await _wait_for_response(key)
+                if not stored and not still_running:
+                    # La original falló (5xx) y soltó el lock: esta se ejecuta
+                    acquired = await redis_raw_client.set(
+                        _lock_key(key), fingerprint, nx=True, px=IDEMPOTENCY_LOCK_MS
+                    )
+        except Exception as e:
+            log.warning("⚠️ [IDEMPOTENCY] Redis no disponible, se ejecuta sin clave: %s", e,
+                        extra={"store": "redis"})
+            return await self.app(scope, _receive_with_body(body, receive), send)
+
+        if stored:
+            if stored.get(b"fp") != fingerprint:
+                return await _send_json(send, 422, "Idempotency-Key reutilizada con otra petición")
+            return await _replay(send, stored)
+        if not acquired:
+            return await _send_json(
+                send, 409, "Hay una petición en curso con la misma Idempotency-Key", [(b"retry-after", b"1")]
+            )
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def send_and_capture(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [
+                    (k.decode("latin-1"), v.decode("latin-1"))
+                    for k, v in message.get("headers", []) if k.lower() not in _SKIP_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, _receive_with_body(body, receive), send_and_capture)
+        finally:
+            await _store(key, fingerprint, response)
+
+
+async def _store(key: str, fingerprint: bytes, response) -> None:
+    body = b"".join(response["body"])
+    try:
+        async with redis_raw_client.pipeline(transaction=True) as pipe:
+            if response["status"] < 500 and len(body) <= IDEMPOTENCY_MAX_BODY:
+                pipe.hset(_resp_key(key), mapping={
+                    "fp": fingerprint,
+                    "status": response["status"],
+                    "headers": json.dumps(response["headers"]),
+                    "body": body,
+                })
+                pipe.expire(_resp_key(key), IDEMPOTENCY_TTL_S)
+            pipe.delete(_lock_key(key))
+            await pipe.execute()
+    except Exception as e:
+        log.warning("⚠️ [IDEMPOTENCY] No se pudo guardar la respuesta de %s: %s", key, e, extra={"store": "redis"})
@@ -0,0 +1,216 @@
+"""
+Feed de cambios del inventario global sobre un Redis Stream acotado (items:changes).
+
+- Cada escritura de la caché de items añade su evento en la MISMA transacción
+  (ver _store_items_cache), así caché y feed nunca divergen. El vaciado de
+  pendientes añade "resolve" (id temporal → real) y "synced".
+- Eventos: {"op": "create"|"update"|"delete", "id", "item"?, "pending"},
+  {"op": "resolve", "temp_id", "id"}, {"op": "synced", "ids"} y {"op": "reset"}
+  (la caché se recargó de MySQL con cambios: los clientes reciben un snapshot).
+- SSE con reanudación: el id de cada evento es su id en el stream. Con
+  Last-Event-ID el cliente recibe sólo lo posterior; si ese punto ya se recortó
+  (MAXLEN) o no lo trae, recibe primero un snapshot completo.
+- Cada proceso tiene UN lector bloqueante (XREAD) que reparte los eventos en
+  vivo a sus clientes; la puesta al día de cada cliente usa XRANGE.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from backend.database import redis_raw_client
+from backend.services import codec
+from backend.services.logs import get_logger
+from backend.services.request_context import create_detached_task
+
+log = get_logger("changes")
+
+ITEM_CHANGES_STREAM = "items:changes"
+ITEM_CHANGES_MAXLEN = int(os.getenv("ITEM_CHANGES_MAXLEN", "10000"))
+ITEM_CHANGES_BLOCK_MS = int(os.getenv("ITEM_CHANGES_BLOCK_MS", "15000"))
+_PAGE = 500
+# Eventos en cola por cliente; si se llena, el cliente se pone al día con XRANGE
+_CLIENT_QUEUE = 1000
+_RESYNC = (None, None)
+
+# Cola de cada cliente conectado a este proceso → eventos en vivo (id, frame)
+_clients: Set[asyncio.Queue] = set()
+_tail_task = None
+_tail_ready: Optional[asyncio.Future] = None
+
+
+def add_changes(pipe, changes: List[Dict[str, Any]]) -> None:
+    """Encola en un pipeline los XADD de `changes` (stream recortado a ~ITEM_CHANGES_MAXLEN)."""
+    for change in changes:
+        pipe.xadd(ITEM_CHANGES_STREAM, {"e": codec.json_dumps(change)},
+                  maxlen=ITEM_CHANGES_MAXLEN, approximate=True)
+
+
+async def publish_changes(changes: List[Dict[str, Any]]) -> None:
+    """Añade eventos que no van ligados a una escritura de la caché."""
+    if not changes:
+        return
+    try:
+        async with redis_raw_client.pipeline(transaction=False) as pipe:
+            add_changes(pipe, changes)
+            await pipe.execute()
+    except Exception as e:
+        log.warning("⚠️ [CHANGES] No se pudo publicar el evento: %s", e)
+
+
+def _parse_id(stream_id) -> Tuple[int, int]:
+    if isinstance(stream_id, bytes):
+        stream_id = stream_id.decode()
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _format_id(stream_id) -> str:
+    return stream_id.decode() if isinstance(stream_id, bytes) else stream_id
+
+
+def _frame(stream_id: str, event: str, data: bytes) -> bytes:
+    return b"id: " + stream_id.encode() + b"\nevent: " + event.encode() + b"\ndata: " + data + b"\n\n"
+
+
+def _change_frame(stream_id: str, fields: Dict[bytes, bytes]) -> Tuple[bytes, bool]:
+    """(frame SSE, es_reset) para una entrada del stream."""
+    data = fields.get(b"e", b"{}")
+    return _frame(stream_id, "change", data), data.startswith(b'{"op":"reset"')
+
+
+# --- Lector compartido del proceso ---
+async def _last_id() -> str:
+    entries = await redis_raw_client.xrevrange(ITEM_CHANGES_STREAM, count=1)
+    return _format_id(entries[0][0]) if entries else "0-0"
+
+
+async def _tail():
+    global _tail_ready
+    try:
+        cursor = await _last_id()
+        _tail_ready.set_result(cursor)
+        while _clients:
+            result = await redis_raw_client.xread(
+                {ITEM_CHANGES_STREAM: cursor}, count=_PAGE, block=ITEM_CHANGES_BLOCK_MS
+            )
+            for _, entries in result or []:
+                for stream_id, fields in entries:
+                    cursor = _format_id(stream_id)
+                    for queue in list(_clients):
+                        if queue.full():
+                            # Cliente demasiado lento: se vacía su cola y relee desde su cursor
+                            while not queue.empty():
+                                queue.get_nowait()
+                            queue.put_nowait(_RESYNC)
+                        else:
+                            queue.put_nowait((cursor, fields))
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        log.warning("⚠️ [CHANGES] Lector del stream detenido: %s", e)
+    finally:
+        if not _tail_ready.done():
+            _tail_ready.set_result(None)
+
+
+async def _ensure_tail() -> None:
+    """Arranca el lector del proceso si no corre y espera a que fije su posición."""
+    global _tail_task, _tail_ready
+    if _tail_task is None or _tail_task.done():
+        _tail_ready = asyncio.get_running_loop().create_future()
+        _tail_task = create_detached_task(_tail())
+    await asyncio.shield(_tail_ready)
+
+
+async def stop_tail() -> None:
+    if _tail_task is not None:
+        _tail_task.cancel()
+        await asyncio.gather(_tail_task, return_exceptions=True)
+
+
+# --- Generador SSE por cliente ---
+async def _is_trimmed(last_id: str) -> bool:
+    """True si hay eventos posteriores a last_id que ya no están en el stream."""
+    first = await redis_raw_client.xrange(ITEM_CHANGES_STREAM, count=1)
+    if not first:
+        return False
+    return _parse_id(last_id) < _parse_id(first[0][0])
+
+
+async def change_events(
+    last_event_id: Optional[str],
+    snapshot: Callable[[], Awaitable[Tuple[bytes, Optional[str]]]],
+):
+    """
+    Generador SSE: snapshot (si hace falta) + eventos desde last_event_id.
+    `snapshot` devuelve (JSON de la lista de items, id del stream en ese instante),
+    leídos de forma atómica.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_CLIENT_QUEUE)
+    _clients.add(queue)
+    try:
+        await _ensure_tail()
+        yield b"retry: 3000\n\n"
+
+        cursor = None
+        if last_event_id:
+            try:
+                _parse_id(last_event_id)
+                if not await _is_trimmed(last_event_id):
+                    cursor = last_event_id
+            except ValueError:
+                cursor = None
+
+        needs_snapshot = cursor is None
+        while True:
+            if needs_snapshot:
+                items_json, position = await snapshot()
+                cursor = position or "0-0"
+                yield _frame(cursor, "snapshot", b'{"items":' + items_json + b"}")
+                needs_snapshot = False
+                # Lo anterior al snapshot que quede en la cola ya está incluido
+                while not queue.empty():
+                    queue.get_nowait()
+
+            # Puesta al día con XRANGE (exclusivo desde cursor)
+            if await _is_trimmed(cursor):
+                needs_snapshot = True
+                continue
+            caught_up = False
+            while not caught_up and not needs_snapshot:
+                entries = await redis_raw_client.xrange(ITEM_CHANGES_STREAM, min=f"({cursor}", count=_PAGE)
+                for stream_id, fields in entries:
+                    cursor = _format_id(stream_id)
+                    frame, is_reset = _change_frame(cursor, fields)
+                    if is_reset:
+                        needs_snapshot = True
+                        break
+                    yield frame
+                caught_up = len(entries) < _PAGE
+            if needs_snapshot:
+                continue
+
+            # En vivo: eventos del lector compartido
+            while not needs_snapshot:
+                try:
+                    stream_id, fields = await asyncio.wait_for(queue.get(), ITEM_CHANGES_BLOCK_MS / 1000)
+                except asyncio.TimeoutError:
+                    if _tail_task is None or _tail_task.done():
+                        # El lector se cayó (p. ej. Redis reiniciado): se relanza y se repasa con XRANGE
+                        await _ensure_tail()
+                        break
+                    yield b": keepalive\n\n"
+                    continue
+                if stream_id is None:
+                    break
+                if _parse_id(stream_id) <= _parse_id(cursor):
+                    continue
+                cursor = stream_id
+                frame, is_reset = _change_frame(cursor, fields)
+                if is_reset:
+                    needs_snapshot = True
+                    break
+                yield frame
+    finally:
+        _clients.discard(queue)
@@ -0,0 +1,141 @@
+"""
+Caché read-through en Redis para documentos de laboratorio (MongoDB).
+
+- lab:cache:{id}   → {"v": versión, "doc": laboratorio} con TTL
+- lab:version:{id} → contador que se incrementa en cada escritura del laboratorio
+Una entrada sólo es válida si su versión coincide con la actual, así que un lector
+lento que cargó el documento antes de una escritura nunca deja en caché datos viejos.
+
+Protección contra estampida: dentro del proceso las lecturas concurrentes del mismo
+laboratorio comparten una sola carga; entre réplicas, un lock corto en Redis
+(lab:lock:{id}) hace que sólo una vaya a Mongo mientras las demás esperan la caché.
+"""
+
+import asyncio
+import os
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.database import redis_raw_client
+from backend.services import codec
+from backend.services.logs import get_logger
+from backend.services.singleflight import coalesce, forget
+from backend.services.tracing import traced
+
+log = get_logger("lab_cache")
+
+LAB_CACHE_TTL = int(os.getenv("LAB_CACHE_TTL", "60"))
+LAB_CACHE_LOCK_MS = int(os.getenv("LAB_CACHE_LOCK_MS", "2000"))
+LAB_CACHE_WAIT_MS = int(os.getenv("LAB_CACHE_WAIT_MS", "500"))
+_POLL_SECONDS = 0.02
+# Cargas agrupadas (singleflight) de un laboratorio: (LAB_READ_NAMESPACE, id)
+LAB_READ_NAMESPACE = "lab"
+
+
+def _cache_key(lab_id: str) -> str:
+    return f"lab:cache:{lab_id}"
+
+
+def _version_key(lab_id: str) -> str:
+    return f"lab:version:{lab_id}"
+
+
+def _lock_key(lab_id: str) -> str:
+    return f"lab:lock:{lab_id}"
+
+
+async def _read_cache(lab_id: str):
+    """Devuelve (documento o None, versión actual)."""
+    async with redis_raw_client.pipeline(transaction=False) as pipe:
+        pipe.get(_cache_key(lab_id))
+        pipe.get(_version_key(lab_id))
+        raw, version = await pipe.execute()
+    version = int(version or 0)
+    if raw:
+        entry = codec.loads(raw)
+        if entry.get("v") == version:
+            return entry["doc"], version
+    return None, version
+
+
+async def _load_and_fill(lab_id: str, version: int, loader) -> Optional[Dict[str, Any]]:
+    token = uuid.uuid4().hex
+    try:
+        got_lock = await redis_raw_client.set(_lock_key(lab_id), token, nx=True, px=LAB_CACHE_LOCK_MS)
+    except Exception:
+        return await loader()
+
+    if not got_lock:
+        # Otra réplica está cargando: esperamos a que llene la caché
+        waited = 0.0
+        while waited * 1000 < LAB_CACHE_WAIT_MS:
+            await asyncio.sleep(_POLL_SECONDS)
+            waited += _POLL_SECONDS
+            doc, version = await _read_cache(lab_id)
+            if doc is not None:
+                return doc
+
+    try:
+        doc = await loader()
+        if doc is not None:
+            await _fill(lab_id, version, doc)
+        return doc
+    finally:
+        if got_lock:
+            await _release_lock(lab_id, token)
+
+
+async def _fill(lab_id: str, version: int, doc: Dict[str, Any]) -> None:
+    # Sólo escribimos si nadie invalidó el laboratorio mientras cargábamos
+    try:
+        current = int(await redis_raw_client.get(_version_key(lab_id)) or 0)
+        if current == version:
+            await redis_raw_client.set(
+                _cache_key(lab_id), codec.dumps({"v": version, "doc": doc}), ex=LAB_CACHE_TTL
+            )
+    except Exception as e:
+        log.warning("⚠️ [LAB CACHE] No se pudo guardar %s: %s", lab_id, e, extra={"store": "redis"})
+
+
+async def _release_lock(lab_id: str, token: str) -> None:
+    # Liberar sólo si el lock sigue siendo nuestro
+    try:
+        if await redis_raw_client.get(_lock_key(lab_id)) == token.encode():
+            await redis_raw_client.delete(_lock_key(lab_id))
+    except Exception:
+        pass
+
+
+@traced("lab_cache.get_lab_cached")
+async def get_lab_cached(
+    lab_id: str, loader: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve el laboratorio desde caché o, si no está, lo carga con `loader`
+    (consulta a Mongo) y lo guarda. Si Redis falla se va directo a Mongo.
+    """
+    try:
+        doc, version = await _read_cache(lab_id)
+    except Exception as e:
+        log.warning("⚠️ [LAB CACHE] Redis no disponible, leyendo de Mongo: %s", e, extra={"store": "redis"})
+        return await loader()
+    if doc is not None:
+        return doc
+
+    # Dentro del proceso las lecturas concurrentes comparten una sola carga (sin microcaché:
+    # la validez la decide la versión en Redis)
+    return await coalesce((LAB_READ_NAMESPACE, lab_id), lambda: _load_and_fill(lab_id, version, loader), cache_ms=0)
+
+
+@traced("lab_cache.invalidate_lab")
+async def invalidate_lab(lab_id: str) -> None:
+    """Invalida la caché de un laboratorio tras una escritura en Mongo."""
+    # Las lecturas que lleguen ya no se unen a una carga empezada antes de la escritura
+    forget(LAB_READ_NAMESPACE)
+    try:
+        async with redis_raw_client.pipeline(transaction=True) as pipe:
+            pipe.incr(_version_key(lab_id))
+            pipe.delete(_cache_key(lab_id))
+            await pipe.execute()
+    except Exception as e:
+        log.warning("⚠️ [LAB CACHE] No se pudo invalidar %s: %s", lab_id, e, extra={"store": "redis"})
@@ -0,0 +1,235 @@
+"""
+Informe de carga por worker para decidir el balanceo (nginx/nginx.conf).
+
+Cada worker mide su propia carga y la publica con el latido (send_heartbeat,
+un solo pipeline a Redis) en load:{WORKER_ID}, con la misma caducidad que
+instance:{WORKER_ID}. El informe es un JSON compacto:
+
+- inf   peticiones en curso (sin salud, /system/* ni streams)
+- p50 / p99   latencia (ms) de las peticiones terminadas en los últimos LOAD_WINDOW_S
+- rps   peticiones terminadas por segundo en esa ventana
+- lag   retraso máximo del event loop (ms) desde el último latido
+- tp    ocupación del threadpool de FastAPI (0..1) y tpq, tareas en cola del
+        executor de asyncio.to_thread
+- db / dbw   ocupación máxima de los pools MySQL (0..1) y peticiones esperando conexión
+- shed  peticiones rechazadas por el control de admisión (acumulado)
+
+/system/load junta los informes vivos por servidor y recomienda qué upstream
+usar y qué pesos poner (ver cluster_load_vector).
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from backend.services.admission import get_admission_stats, route_class
+from backend.services.codec import json_dumps, json_loads
+from backend.services.logs import get_logger
+from backend.services.pool_stats import POOL_STATS
+
+log = get_logger("load")
+
+LOAD_WINDOW_S = float(os.getenv("LOAD_WINDOW_S", "30"))
+LOAD_MAX_SAMPLES = int(os.getenv("LOAD_MAX_SAMPLES", "2048"))
+LOAD_LAG_INTERVAL_S = float(os.getenv("LOAD_LAG_INTERVAL_S", "0.5"))
+# Umbrales de la recomendación de upstream
+LOAD_P99_SPREAD = float(os.getenv("LOAD_P99_SPREAD", "2.0"))
+LOAD_IMBALANCE = float(os.getenv("LOAD_IMBALANCE", "1.5"))
+LOAD_BUSY_INFLIGHT = float(os.getenv("LOAD_BUSY_INFLIGHT", "4"))
+# Pesos nginx entre 1 y LOAD_MAX_WEIGHT
+LOAD_MAX_WEIGHT = int(os.getenv("LOAD_MAX_WEIGHT", "10"))
+
+UPSTREAMS = {
+    "least_conn": "backend_least",
+    "random_two": "backend_random_two",
+    "hash": "backend_uri",
+}
+
+_in_flight = 0
+# (instante de fin, latencia ms) de las últimas peticiones
+_samples: Deque[Tuple[float, float]] = deque(maxlen=LOAD_MAX_SAMPLES)
+_lag_max_ms = 0.0
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def event_loop_lag_sampler() -> None:
+    """Tarea de fondo: cuánto tarda en despertar un sleep respecto a lo pedido"""
+    global _lag_max_ms
+    while True:
+        t0 = time.perf_counter()
+        await asyncio.sleep(LOAD_LAG_INTERVAL_S)
+        lag_ms = (time.perf_counter() - t0 - LOAD_LAG_INTERVAL_S) * 1000
+        _lag_max_ms = max(_lag_max_ms, lag_ms)
+
+
+def _threadpool_load() -> Tuple[float, int]:
+    """Ocupación del limitador de anyio (rutas síncronas de FastAPI) y cola del executor por defecto"""
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    usage = limiter.borrowed_tokens / limiter.total_tokens if limiter.total_tokens else 0.0
+    executor = getattr(asyncio.get_running_loop(), "_default_executor", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    return usage, work_queue.qsize() if work_queue is not None else 0
+
+
+def _db_pool_load() -> Tuple[float, int]:
+    """Ocupación máxima y esperas totales de los pools MySQL (los que tienen pool_size)"""
+    usage, waiters = 0.0, 0
+    for stats in list(POOL_STATS.values()):
+        size = stats.config.get("pool_size")
+        if size is None:
+            continue
+        if stats.adaptive is not None:
+            capacity = stats.adaptive.capacity()
+        else:
+            capacity = size + max(stats.config.get("max_overflow") or 0, 0)
+        usage = max(usage, stats.checked_out / capacity if capacity else 0.0)
+        waiters += stats.waiters
+    return usage, waiters
+
+
+def load_report() -> Dict[str, Any]:
+    """Informe de este worker; reinicia el máximo de lag (ventana = intervalo entre latidos)"""
+    global _lag_max_ms
+    now = time.monotonic()
+    while _samples and _samples[0][0] < now - LOAD_WINDOW_S:
+        _samples.popleft()
+    latencies = sorted(ms for _, ms in _samples)
+    tp, tpq = _threadpool_load()
+    db, dbw = _db_pool_load()
+    lag, _lag_max_ms = _lag_max_ms, 0.0
+    classes = get_admission_stats()["classes"]
+    return {
+        "inf": _in_flight,
+        "p50": round(_percentile(latencies, 0.50), 1),
+        "p99": round(_percentile(latencies, 0.99), 1),
+        "rps": round(len(latencies) / LOAD_WINDOW_S, 2),
+        "lag": round(max(lag, 0.0), 1),
+        "tp": round(tp, 3),
+        "tpq": tpq,
+        "db": round(db, 3),
+        "dbw": dbw,
+        "shed": sum(c["shed_total"] for c in classes.values()),
+    }
+
+
+def encoded_load_report() -> bytes:
+    return json_dumps(load_report())
+
+
+class LoadReportMiddleware:
+    """Middleware ASGI: peticiones en curso y latencia de las terminadas"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http" or route_class(scope) is None:
+            return await self.app(scope, receive, send)
+        _in_flight += 1
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight -= 1
+            _samples.append((time.monotonic(), (time.perf_counter() - t0) * 1000))
+
+
+# --- Vector de carga del clúster ---
+def _decode_reports(worker_ids: List[str], raw_reports: List[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    reports = {}
+    for worker_id, raw in zip(worker_ids, raw_reports):
+        if not raw:
+            continue
+        try:
+            reports[worker_id] = json_loads(raw)
+        except ValueError:
+            log.warning("⚠️ [LOAD] Informe ilegible de %s", worker_id, extra={"store": "redis"})
+    return reports
+
+
+def _host_vector(workers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Suma lo aditivo (en curso, rps, esperas) y toma el peor worker en lo demás"""
+    return {
+        "workers": len(workers),
+        "inf": sum(w["inf"] for w in workers),
+        "rps": round(sum(w["rps"] for w in workers), 2),
+        "p99": max(w["p99"] for w in workers),
+        "lag": max(w["lag"] for w in workers),
+        "tp": max(w["tp"] for w in workers),
+        "db": max(w["db"] for w in workers),
+        "dbw": sum(w["dbw"] for w in workers),
+        "shed": sum(w["shed"] for w in workers),
+    }
+
+
+def _recommend(hosts: Dict[str, Dict[str, Any]]) -> Tuple[str, str]:
+    """
+    - p99 muy distinto entre servidores (uno lento o degradado) → least_conn:
+      el lento acumula conexiones abiertas y deja de recibir.
+    - Latencias parecidas pero peticiones en curso desiguales → random two
+      least_conn: corrige el reparto sin que todos los workers de nginx
+      elijan a la vez el mismo servidor "menos cargado".
+    - Carga baja y repartida → hash por URI: cada réplica calienta su parte
+      de la caché en proceso (singleflight, lab_cache) sin coste de cola.
+    """
+    if len(hosts) < 2:
+        return "least_conn", "un solo servidor informando"
+    p99s = [h["p99"] for h in hosts.values() if h["rps"] > 0]
+    inflight = [h["inf"] for h in hosts.values()]
+    mean_inf = sum(inflight) / len(inflight)
+    p99_spread = max(p99s) / max(min(p99s), 1.0) if len(p99s) >= 2 else 1.0
+    imbalance = max(inflight) / mean_inf if mean_inf else 1.0
+    if p99_spread >= LOAD_P99_SPREAD:
+        return "least_conn", f"p99 {p99_spread:.1f}× entre servidores"
+    if mean_inf >= LOAD_BUSY_INFLIGHT or imbalance >= LOAD_IMBALANCE:
+        return "random_two", f"{mean_inf:.1f} en curso de media, desequilibrio {imbalance:.1f}×"
+    return "hash", "carga baja y repartida: se prima la localidad de caché"
+
+
+def _weights(hosts: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Pesos nginx (server ... weight=N) inversamente proporcionales a p99 × (1 + saturación),
+    siendo la saturación la peor de threadpool y pool MySQL. Se escalan a 1..LOAD_MAX_WEIGHT.
+    """
+    cost = {
+        host: max(h["p99"], 1.0) * (1 + max(h["tp"], h["db"])) * (1 + h["lag"] / 100)
+        for host, h in hosts.items()
+    }
+    best = min(cost.values(), default=1.0)
+    return {host: max(1, round(LOAD_MAX_WEIGHT * best / c)) for host, c in cost.items()}
+
+
+async def cluster_load_vector(redis_client) -> Dict[str, Any]:
+    """Informes vivos (load:*) por worker y por servidor, con upstream y pesos sugeridos"""
+    keys = await redis_client.keys("load:*")
+    worker_ids = [key.split(":", 1)[1] for key in keys]
+    reports = _decode_reports(worker_ids, await redis_client.mget(keys) if keys else [])
+
+    by_host: Dict[str, List[Dict[str, Any]]] = {}
+    for worker_id, report in reports.items():
+        by_host.setdefault(worker_id.split(":")[0], []).append(report)
+    hosts = {host: _host_vector(workers) for host, workers in sorted(by_host.items())}
+    if not hosts:
+        return {"hosts": {}, "workers": {}, "recommendation": None}
+
+    strategy, reason = _recommend(hosts)
+    return {
+        "hosts": hosts,
+        "workers": dict(sorted(reports.items())),
+        "recommendation": {
+            "strategy": strategy,
+            "upstream": UPSTREAMS[strategy],
+            "reason": reason,
+            "weights": _weights(hosts),
+        },
+    }
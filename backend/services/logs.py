@@ -0,0 +1,194 @@
+"""
+Logging estructurado sin bloquear el event loop.
+
+- Los módulos piden su logger con get_logger("sync") y registran con niveles
+  y plantillas %: log.warning("⚠️ [SYNC] Error: %s", e, extra={"store": "mysql"}).
+- El handler sólo mete el registro en una cola acotada (put_nowait): la
+  escritura en stdout la hace un hilo QueueListener. Si la cola se llena el
+  registro se descarta y se cuenta, nunca se espera.
+- Cada registro lleva hostname, worker y, dentro de una petición, la ruta;
+  "store" y "duration_ms" se pasan en extra cuando aplican.
+- Los avisos repetidos (misma plantilla, o mismo extra "dedup_key"; WARNING o
+  superior) se emiten una vez por LOG_DEDUP_WINDOW_S; el siguiente indica
+  cuántos se suprimieron. Así una caída de MySQL no escribe la misma línea cada
+  2 s ni en cada petición. Los avisos de seguridad (logins fallidos) pasan
+  extra={"dedup": False} y se emiten siempre.
+- LOG_FORMAT=text (por defecto, legible con emojis) o json (una línea por registro).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from backend.services.workers import HOSTNAME, WORKER_ID
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_DEDUP_WINDOW_S = float(os.getenv("LOG_DEDUP_WINDOW_S", "30"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "sislab"
+# Campos opcionales que se muestran si el registro los trae
+EXTRA_FIELDS = ("route", "store", "duration_ms", "suppressed")
+
+_request_scope: ContextVar[Optional[dict]] = ContextVar("log_request_scope", default=None)
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+_dropped = 0
+
+
+class _ContextFilter(logging.Filter):
+    """Añade hostname/worker/ruta en el hilo que registra (el contextvar sólo existe ahí)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.hostname = HOSTNAME
+        record.worker = WORKER_ID
+        scope = _request_scope.get()
+        if scope is not None and not hasattr(record, "route"):
+            record.route = f"{scope['method']} {getattr(scope.get('route'), 'path', None) or scope['path']}"
+        return True
+
+
+class _DedupFilter(logging.Filter):
+    """Una vez por ventana cada aviso repetido; el siguiente lleva "suppressed"=N"""
+
+    def __init__(self, window_s: float):
+        super().__init__()
+        self.window_s = window_s
+        self._lock = threading.Lock()
+        # (logger, nivel, plantilla o dedup_key) → [inicio de ventana, suprimidos]
+        self._seen: Dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.window_s <= 0 or record.levelno < logging.WARNING or not getattr(record, "dedup", True):
+            return True
+        key = (record.name, record.levelno, getattr(record, "dedup_key", None) or str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.window_s:
+                seen[1] += 1
+                return False
+            if seen is not None and seen[1]:
+                record.suppressed = seen[1]
+            if len(self._seen) > 1000:
+                self._seen.clear()
+            self._seen[key] = [now, 0]
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Mensaje y traza resueltos aquí (los args pueden cambiar después); sin copiar el registro
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = [f"{field}={getattr(record, field)}" for field in EXTRA_FIELDS if hasattr(record, field)]
+        if extras:
+            head, sep, tail = line.partition("\n")
+            line = f"{head} | {' '.join(extras)}{sep}{tail}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "hostname": getattr(record, "hostname", HOSTNAME),
+            "worker": getattr(record, "worker", WORKER_ID),
+        }
+        for field in EXTRA_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging() -> None:
+    """Instala cola + hilo escritor en el logger raíz del proyecto (idempotente)"""
+    global _handler, _listener
+    with _setup_lock:
+        if _handler is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+        _handler = _NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        _handler.addFilter(_ContextFilter())
+        _handler.addFilter(_DedupFilter(LOG_DEDUP_WINDOW_S))
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(_handler.queue, stream)
+        _listener.start()
+        atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Vacía la cola y detiene el hilo escritor (apagado); lo que llegue después se descarta"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        listener, _listener = _listener, None
+    if _dropped:
+        listener.queue.put_nowait(logging.makeLogRecord({
+            "name": ROOT_LOGGER, "levelno": logging.WARNING, "levelname": "WARNING",
+            "msg": f"⚠️ [LOG] {_dropped} registros descartados por cola llena",
+        }))
+    listener.stop()
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class LogContextMiddleware:
+    """Middleware ASGI: deja la petición en contexto para que los logs lleven su ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_scope.reset(token)
@@ -0,0 +1,156 @@
+"""
+Perfilado de memoria bajo demanda con tracemalloc (endpoints /system/memory/*, sólo admin).
+
+Flujo típico para ver cuánto retiene cada módulo por ciclo de sincronización:
+start → snapshot → (esperar unos ciclos) → snapshot → diff.
+Las snapshots viven en la memoria del proceso (las últimas MEMORY_MAX_SNAPSHOTS):
+con varios workers, todas las llamadas deben ir al mismo (ver "worker" en la respuesta).
+"""
+
+import os
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from backend.services.logs import get_logger
+
+log = get_logger("memory")
+
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "10"))
+MEMORY_MAX_SNAPSHOTS = int(os.getenv("MEMORY_MAX_SNAPSHOTS", "5"))
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+# id → {"label", "taken_at", "snapshot"}
+_snapshots: Dict[int, Dict[str, Any]] = {}
+_next_id = 1
+
+
+def _module_of(filename: str) -> str:
+    """Ruta relativa para el código del proyecto; paquete de primer nivel para librerías"""
+    path = os.path.abspath(filename)
+    if path.startswith(_ROOT + os.sep) and "site-packages" not in path:
+        return os.path.relpath(path, _ROOT)
+    parts = path.split(os.sep)
+    for marker in ("site-packages", "dist-packages"):
+        if marker in parts:
+            rest = parts[parts.index(marker) + 1:]
+            return rest[0] if rest else path
+    return os.path.basename(path)
+
+
+def _kb(size: int) -> float:
+    return round(size / 1024, 1)
+
+
+def _by_module(stats) -> List[Dict[str, Any]]:
+    modules: Dict[str, Dict[str, Any]] = {}
+    for stat in stats:
+        module = modules.setdefault(
+            _module_of(stat.traceback[0].filename), {"size_kb": 0, "size_diff_kb": 0, "count": 0, "count_diff": 0}
+        )
+        module["size_kb"] += stat.size
+        module["count"] += stat.count
+        module["size_diff_kb"] += getattr(stat, "size_diff", 0)
+        module["count_diff"] += getattr(stat, "count_diff", 0)
+    return [
+        {"module": name, **{k: (_kb(v) if k.endswith("_kb") else v) for k, v in values.items()}}
+        for name, values in modules.items()
+    ]
+
+
+def _site(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    row = {
+        "site": f"{_module_of(frame.filename)}:{frame.lineno}",
+        "size_kb": _kb(stat.size),
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        row.update(size_diff_kb=_kb(stat.size_diff), count_diff=stat.count_diff)
+    return row
+
+
+def status() -> Dict[str, Any]:
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    return {
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_kb": _kb(current),
+        "peak_kb": _kb(peak),
+        "overhead_kb": _kb(tracemalloc.get_tracemalloc_memory()),
+        "snapshots": [
+            {"id": n, "label": s["label"], "taken_at": s["taken_at"]} for n, s in sorted(_snapshots.items())
+        ],
+    }
+
+
+def start(frames: Optional[int] = None) -> Dict[str, Any]:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames or MEMORY_TRACE_FRAMES)
+        log.info("🧠 [MEMORY] tracemalloc activado (%s frames)", tracemalloc.get_traceback_limit())
+    return status()
+
+
+def stop() -> Dict[str, Any]:
+    """Detiene tracemalloc y descarta las snapshots (liberan su memoria)"""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        log.info("🧠 [MEMORY] tracemalloc desactivado")
+    _snapshots.clear()
+    return status()
+
+
+def take_snapshot(label: str = "", limit: int = 20) -> Dict[str, Any]:
+    """Guarda una snapshot y devuelve los mayores sitios de asignación y el total por módulo"""
+    global _next_id
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc no está activo (POST /system/memory/start)")
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    snapshot_id = _next_id
+    _next_id += 1
+    _snapshots[snapshot_id] = {"label": label, "taken_at": time.time(), "snapshot": snapshot}
+    while len(_snapshots) > MEMORY_MAX_SNAPSHOTS:
+        del _snapshots[min(_snapshots)]
+
+    by_line = snapshot.statistics("lineno")
+    modules = sorted(_by_module(snapshot.statistics("filename")), key=lambda m: -m["size_kb"])
+    return {
+        "id": snapshot_id,
+        "label": label,
+        "total_kb": _kb(sum(stat.size for stat in by_line)),
+        "top_sites": [_site(stat) for stat in by_line[:limit]],
+        "modules": [{k: v for k, v in m.items() if "diff" not in k} for m in modules[:limit]],
+    }
+
+
+def diff(base: Optional[int] = None, target: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
+    """Diferencia entre dos snapshots (por defecto las dos últimas), por sitio y por módulo"""
+    ids = sorted(_snapshots)
+    if base is None or target is None:
+        if len(ids) < 2:
+            raise KeyError("Se necesitan al menos dos snapshots")
+        base, target = (base or ids[-2]), (target or ids[-1])
+    if base not in _snapshots or target not in _snapshots:
+        raise KeyError(f"Snapshot inexistente (disponibles: {ids})")
+    old, new = _snapshots[base], _snapshots[target]
+
+    by_line = new["snapshot"].compare_to(old["snapshot"], "lineno")
+    modules = sorted(
+        _by_module(new["snapshot"].compare_to(old["snapshot"], "filename")),
+        key=lambda m: -abs(m["size_diff_kb"]),
+    )
+    return {
+        "base": base,
+        "target": target,
+        "elapsed_s": round(new["taken_at"] - old["taken_at"], 1),
+        "size_diff_kb": _kb(sum(stat.size_diff for stat in by_line)),
+        "top_sites": [_site(stat) for stat in by_line[:limit]],
+        "modules": modules[:limit],
+    }
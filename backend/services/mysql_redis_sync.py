@@ -13,13 +13,25 @@ MEJORAS IMPLEMENTADAS:
 
 import json
 import asyncio
+import gzip
 import uuid
 import hashlib
-from typing import List, Dict, Any, Tuple
-from sqlalchemy import text
+import os
+import time
+from typing import List, Dict, Any, Tuple, Optional, Union
+from redis.exceptions import WatchError
+from sqlalchemy import bindparam, delete, func, select, text, update
 
-from backend.database import redis_client, mysql_engine, SessionLocal
+from backend.database import redis_client, redis_raw_client, sync_engine, SyncSessionLocal
 from backend.models.inventory import ItemModel
+from backend.services import codec
+from backend.services.item_changes import ITEM_CHANGES_STREAM, add_changes, publish_changes
+from backend.services.logs import get_logger
+from backend.services.query_stats import query_scope
+from backend.services.singleflight import forget
+from backend.services.tracing import traced
+
+log = get_logger("sync")
 
 # Claves Redis
 REDIS_ITEMS_CACHE = "items:cache"         # Lista JSON de todos los items (espejo de MySQL)
@@ -28,43 +40,110 @@ REDIS_PENDING_ITEMS = "items:pending"     # Items creados cuando MySQL estaba ca
 REDIS_PENDING_UPDATES = "items:pending_updates"  # Updates pendientes: [{id, data}]
 REDIS_PENDING_DELETES = "items:pending_deletes"  # IDs eliminados pendientes de aplicar a MySQL
 REDIS_SYNC_METADATA = "sync:metadata"     # Metadatos de sincronización
-
-
-def _item_to_dict(item: ItemModel) -> Dict[str, Any]:
-    """Convierte ItemModel a diccionario serializable."""
-    return {
-        "id": item.id,
-        "code": item.code,
-        "type": item.type,
-        "status": item.status,
-        "area": item.area,
-        "acquisition_date": getattr(item, "acquisition_date", "") or "",
-    }
+REDIS_PENDING_OVERRIDES = "items:pending_overrides"  # Ediciones sobre creates pendientes: {temp_id: {data|deleted}}
+REDIS_ID_MAP_PREFIX = "items:id_map:"     # temp_id → id real de MySQL (tras sincronizar)
+REDIS_ITEMS_BODY = "items:cache:body"     # Hash: respuesta de GET /items ya codificada, por origen (+gzip) y etag
+# Hash con el estado que sirve /sync/status, mantenido a medida que ocurren escrituras y syncs:
+# cache_items, verify_ok/verify_at/verify_items, last_sync_at/last_sync_ms,
+# mysql_available/mysql_checked_at y pending_since (desde cuándo hay backlog)
+REDIS_SYNC_STATE = "sync:state"
+# Espacio de nombres de las lecturas de items agrupadas (singleflight) en los routers
+ITEMS_READ_NAMESPACE = "items"
+
+TEMP_ID_PREFIX = "pending_"
+ITEM_ID_MAP_TTL = int(os.getenv("ITEM_ID_MAP_TTL", "86400"))
+# Operaciones pendientes aplicadas por transacción MySQL al vaciar las colas
+REPLAY_BATCH_SIZE = int(os.getenv("SYNC_REPLAY_BATCH_SIZE", "200"))
+# Reintentos de una modificación de la caché si otro escritor la cambió a la vez (WATCH)
+CACHE_PATCH_RETRIES = int(os.getenv("CACHE_PATCH_RETRIES", "50"))
+
+# Modo de escritura de items:
+# - write_through: MySQL primero, Redis sólo encola si MySQL falla (por defecto)
+# - write_behind: las escrituras se encolan en Redis y se confirman al instante;
+#   un proceso en segundo plano las vuelca a MySQL por lotes
+ITEM_WRITE_MODE = os.getenv("ITEM_WRITE_MODE", "write_through").lower()
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_MAX_LAG_MS = int(os.getenv("WRITE_BEHIND_MAX_LAG_MS", "500"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "20000"))
+# Un solo vaciado de las colas a la vez en el proceso: el flusher write-behind y la
+# sincronización periódica sacarían lotes en paralelo y dos updates del mismo item
+# podrían confirmarse en desorden
+_drain_lock = asyncio.Lock()
+
+# Cuerpos de GET /items pre-codificados: se comprimen con gzip desde N bytes (0 = nunca)
+ITEMS_BODY_GZIP_MIN_BYTES = int(os.getenv("ITEMS_BODY_GZIP_MIN_BYTES", "4096"))
+ITEMS_BODY_GZIP_LEVEL = int(os.getenv("ITEMS_BODY_GZIP_LEVEL", "6"))
+# Cabecera de la respuesta de GET /items según el origen de los datos
+ITEMS_BODY_HEADERS = {
+    "MySQL": {"source": "MySQL"},
+    "REDIS_CACHE": {"source": "REDIS_CACHE", "message": "Modo de Emergencia - Redis como caché"},
+    "REDIS_WRITE_BEHIND": {"source": "REDIS_WRITE_BEHIND"},
+}
+
+
+# Lectura masiva sin ORM: un SELECT Core constante (SQLAlchemy lo compila una vez
+# y lo reutiliza de su caché) cuyas filas se convierten directamente en dicts,
+# sin hidratar un ItemModel por fila (identity map + atributos instrumentados).
+_items_table = ItemModel.__table__
+SELECT_ALL_ITEMS = select(
+    _items_table.c.id,
+    _items_table.c.code,
+    _items_table.c.type,
+    _items_table.c.status,
+    _items_table.c.area,
+    _items_table.c.acquisition_date,
+    _items_table.c.version,
+)
+
+
+def rows_to_items(rows) -> List[Dict[str, Any]]:
+    """Convierte filas (id, code, type, status, area, acquisition_date, version) en dicts serializables."""
+    return [
+        {"id": i, "code": c, "type": t, "status": s, "area": a, "acquisition_date": d or "", "version": v}
+        for i, c, t, s, a, d, v in rows
+    ]
+
+
+def fetch_all_items(conn) -> List[Dict[str, Any]]:
+    """Todos los items vía Core. `conn` puede ser una Connection o una Session."""
+    return rows_to_items(conn.execute(SELECT_ALL_ITEMS))
 
 
 def _compute_hash(data: List[Dict[str, Any]]) -> str:
     """Calcula un hash SHA256 de los datos para verificar integridad."""
+    # Se mantiene json.dumps(sort_keys=True): el hash debe coincidir byte a byte
+    # con el que calculan las réplicas que aún no usan la capa de codecs.
     try:
         json_str = json.dumps(data, sort_keys=True)
         return hashlib.sha256(json_str.encode()).hexdigest()
     except Exception as e:
-        print(f"⚠️ Error calculando hash: {e}")
+        log.warning("⚠️ Error calculando hash: %s", e)
         return ""
 
 
 def _check_mysql_sync() -> bool:
     """Verificación síncrona de MySQL."""
     try:
-        with mysql_engine.connect() as conn:
+        with sync_engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         return True
     except Exception:
         return False
 
 
+async def _record_state(**fields) -> None:
+    try:
+        await redis_raw_client.hset(REDIS_SYNC_STATE, mapping=fields)
+    except Exception:
+        pass
+
+
+@traced("sync.check_mysql_available")
 async def check_mysql_available() -> bool:
-    """Verifica si MySQL está disponible."""
-    return await asyncio.to_thread(_check_mysql_sync)
+    """Verifica si MySQL está disponible (y deja el resultado en sync:state)."""
+    ok = await asyncio.to_thread(_check_mysql_sync)
+    await _record_state(mysql_available=int(ok), mysql_checked_at=time.time())
+    return ok
 
 
 async def check_redis_available() -> bool:
@@ -78,12 +157,123 @@ async def check_redis_available() -> bool:
 
 def _fetch_all_items_sync() -> List[Dict[str, Any]]:
     """Obtiene todos los items de MySQL (síncrono)."""
-    db = SessionLocal()
+    with sync_engine.connect() as conn:
+        return fetch_all_items(conn)
+
+
+def _build_items_bodies(data_json: bytes, data_hash: str, from_mysql: bool) -> Dict[str, bytes]:
+    """
+    Respuestas completas de GET /items para cada origen. La lista se codifica una
+    sola vez y se inserta en cada cabecera. La variante "MySQL" sólo existe si la
+    caché refleja MySQL (escrita tras un commit o releída de MySQL, sin pendientes).
+    """
+    bodies = {"etag": data_hash[:32].encode()}
+    for source, header in ITEMS_BODY_HEADERS.items():
+        if source == "MySQL" and not from_mysql:
+            continue
+        body = codec.json_dumps(header)[:-1] + b',"data":' + data_json + b"}"
+        bodies[source] = body
+        if ITEMS_BODY_GZIP_MIN_BYTES and len(body) >= ITEMS_BODY_GZIP_MIN_BYTES:
+            bodies[f"{source}.gz"] = gzip.compress(body, compresslevel=ITEMS_BODY_GZIP_LEVEL, mtime=0)
+    return bodies
+
+
+async def _store_items_cache(
+    data: List[Dict[str, Any]], from_mysql: bool = False, changes: Optional[List[Dict[str, Any]]] = None
+) -> None:
+    """
+    Guarda la lista completa de items, su hash, los cuerpos de respuesta y los
+    eventos del feed de cambios en una sola transacción de Redis.
+    """
+    async with redis_raw_client.pipeline(transaction=True) as pipe:
+        _queue_items_cache(pipe, data, from_mysql, changes)
+        await pipe.execute()
+    forget(ITEMS_READ_NAMESPACE)
+
+
+def _queue_items_cache(pipe, data: List[Dict[str, Any]], from_mysql: bool, changes) -> None:
+    """Comandos que guardan la caché completa (para un pipeline ya en MULTI)."""
+    data_hash = _compute_hash(data)
+    from_mysql = from_mysql and not any(is_temp_id(d.get("id")) for d in data)
+    bodies = _build_items_bodies(codec.json_dumps(data), data_hash, from_mysql)
+    pipe.set(REDIS_ITEMS_CACHE, codec.dumps(data))
+    pipe.set(REDIS_ITEMS_HASH, data_hash)
+    pipe.delete(REDIS_ITEMS_BODY)
+    pipe.hset(REDIS_ITEMS_BODY, mapping=bodies)
+    pipe.hset(REDIS_SYNC_STATE, "cache_items", len(data))
+    add_changes(pipe, changes or [])
+
+
+async def _patch_items_cache(mutate, from_mysql: bool = False):
+    """
+    Lee, modifica y guarda la caché de items de forma atómica (WATCH + MULTI):
+    con varios workers, el flusher write-behind y la puesta al día escribiendo a
+    la vez, un get + set suelto perdería las escrituras de los demás.
+    `mutate(data)` modifica la lista en sitio y devuelve (resultado, cambios del
+    feed); sin cambios no se escribe nada. Si otro escritor tocó la caché entre
+    la lectura y el EXEC, se repite con la versión nueva.
+    """
+    for _ in range(CACHE_PATCH_RETRIES):
+        async with redis_raw_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(REDIS_ITEMS_CACHE)
+                raw = await pipe.get(REDIS_ITEMS_CACHE)
+                data = codec.loads(raw) if raw else []
+                result, changes = mutate(data)
+                if not changes:
+                    return result
+                pipe.multi()
+                _queue_items_cache(pipe, data, from_mysql, changes)
+                await pipe.execute()
+            except WatchError:
+                continue
+        forget(ITEMS_READ_NAMESPACE)
+        return result
+    raise RuntimeError(f"Caché de items en conflicto tras {CACHE_PATCH_RETRIES} intentos")
+
+
+async def get_items_snapshot() -> Tuple[bytes, Optional[str]]:
+    """Lista de items en JSON y la posición del feed de cambios en ese mismo instante."""
+    async with redis_raw_client.pipeline(transaction=True) as pipe:
+        pipe.get(REDIS_ITEMS_CACHE)
+        pipe.xrevrange(ITEM_CHANGES_STREAM, count=1)
+        raw, last = await pipe.execute()
+    if not raw:
+        items_json = b"[]"
+    elif raw.startswith(codec.MAGIC):
+        items_json = codec.json_dumps(codec.loads(raw))
+    else:
+        items_json = raw
+    return items_json, (last[0][0].decode() if last else None)
+
+
+@traced("sync.get_items_body")
+async def get_items_body(source: str, accept_gzip: bool) -> Optional[Tuple[bytes, str, bool]]:
+    """
+    Respuesta pre-codificada de GET /items para `source`: (cuerpo, etag, gzip).
+    None si no existe (p. ej. la caché no refleja MySQL) o si Redis falla.
+    """
+    fields = ["etag", source] + ([f"{source}.gz"] if accept_gzip else [])
     try:
-        items = db.query(ItemModel).all()
-        return [_item_to_dict(i) for i in items]
-    finally:
-        db.close()
+        values = await redis_raw_client.hmget(REDIS_ITEMS_BODY, fields)
+    except Exception:
+        return None
+    etag, body = values[0], values[1]
+    compressed = values[2] if accept_gzip else None
+    if etag is None or body is None:
+        return None
+    if compressed is not None:
+        return compressed, f'"{etag.decode()}-{source}-gz"', True
+    return body, f'"{etag.decode()}-{source}"', False
+
+
+async def drop_mysql_items_body() -> None:
+    """MySQL no responde: la caché deja de servirse como respuesta de MySQL."""
+    forget(ITEMS_READ_NAMESPACE)
+    try:
+        await redis_raw_client.hdel(REDIS_ITEMS_BODY, "MySQL", "MySQL.gz")
+    except Exception:
+        pass
 
 
 async def sync_mysql_to_redis() -> int:
@@ -93,13 +283,13 @@ async def sync_mysql_to_redis() -> int:
     """
     try:
         data = await asyncio.to_thread(_fetch_all_items_sync)
-        await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-        # Guardar hash para verificación futura
-        data_hash = _compute_hash(data)
-        await redis_client.set(REDIS_ITEMS_HASH, data_hash)
+        # Si MySQL trae cambios que la caché no tenía, los clientes del feed se resincronizan
+        previous_hash = await redis_client.get(REDIS_ITEMS_HASH)
+        changed = previous_hash != _compute_hash(data)
+        await _store_items_cache(data, from_mysql=True, changes=[{"op": "reset"}] if changed else None)
         return len(data)
     except Exception as e:
-        print(f"⚠️ [SYNC] Error MySQL→Redis: {e}")
+        log.warning("⚠️ [SYNC] Error MySQL→Redis: %s", e)
         return 0
 
 
@@ -109,13 +299,13 @@ async def verify_cache_integrity() -> Tuple[bool, Dict[str, Any]]:
     Devuelve (is_valid, metadata)
     """
     try:
-        raw_cache = await redis_client.get(REDIS_ITEMS_CACHE)
+        raw_cache = await redis_raw_client.get(REDIS_ITEMS_CACHE)
         stored_hash = await redis_client.get(REDIS_ITEMS_HASH)
         
         if not raw_cache or not stored_hash:
             return False, {"reason": "Missing cache or hash"}
         
-        data = json.loads(raw_cache)
+        data = codec.loads(raw_cache)
         computed_hash = _compute_hash(data)
         
         is_valid = computed_hash == stored_hash
@@ -124,9 +314,10 @@ async def verify_cache_integrity() -> Tuple[bool, Dict[str, Any]]:
             "items_count": len(data),
             "hash_match": is_valid
         }
+        await _record_state(verify_ok=int(is_valid), verify_at=time.time(), verify_items=len(data))
         return is_valid, metadata
     except Exception as e:
-        print(f"⚠️ Error verificando integridad: {e}")
+        log.warning("⚠️ Error verificando integridad: %s", e)
         return False, {"error": str(e)}
 
 
@@ -136,466 +327,508 @@ async def rebuild_cache_from_mysql() -> Dict[str, Any]:
     Esto se usa cuando Redis está vacío o corrupto.
     """
     try:
-        print("🔄 [REBUILD] Reconstruyendo caché desde MySQL...")
+        log.info("🔄 [REBUILD] Reconstruyendo caché desde MySQL...")
         count = await sync_mysql_to_redis()
         metadata = {
             "action": "rebuild_from_mysql",
             "items_synced": count,
             "timestamp": await redis_client.time()
         }
-        await redis_client.set(REDIS_SYNC_METADATA, json.dumps(metadata))
-        print(f"✅ [REBUILD] Caché reconstruida: {count} items")
+        await redis_raw_client.set(REDIS_SYNC_METADATA, codec.dumps(metadata))
+        log.info("✅ [REBUILD] Caché reconstruida: %s items", count)
         return metadata
     except Exception as e:
-        print(f"❌ [REBUILD] Error: {e}")
+        log.error("❌ [REBUILD] Error: %s", e)
         return {"error": str(e)}
 
 
-def _insert_pending_item_sync(item_data: Dict[str, Any]) -> None:
-    """Inserta un item pendiente en MySQL (síncrono)."""
-    item_data = {k: v for k, v in item_data.items() if k != "id"}
-    db = SessionLocal()
-    try:
-        new_item = ItemModel(**item_data)
-        db.add(new_item)
-        db.commit()
-    finally:
-        db.close()
+def is_temp_id(item_id: Any) -> bool:
+    """True si es un id temporal de un item creado sin MySQL (pending_<hex>)."""
+    return isinstance(item_id, str) and item_id.startswith(TEMP_ID_PREFIX)
 
 
-async def sync_redis_pending_to_mysql() -> int:
-    """
-    Vacía los items pendientes de Redis (creados cuando MySQL estaba caído)
-    y los inserta en MySQL. Devuelve cuántos se insertaron.
-    """
-    count = 0
-    try:
-        while True:
-            raw = await redis_client.rpop(REDIS_PENDING_ITEMS)
-            if not raw:
-                break
-            item_data = json.loads(raw)
-            await asyncio.to_thread(_insert_pending_item_sync, item_data)
-            count += 1
-        return count
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error Redis→MySQL (pending): {e}")
-        return count
+_ITEM_COLUMNS = {c.name for c in ItemModel.__table__.columns} - {"id", "version"}
 
 
-def _update_item_sync(item_id: int, item_data: Dict[str, Any]) -> bool:
-    """Actualiza un item en MySQL (síncrono)."""
-    db = SessionLocal()
-    try:
-        item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-        if not item:
-            return False
-        for k, v in item_data.items():
-            if hasattr(item, k) and k != "id":
-                setattr(item, k, v)
-        db.commit()
-        return True
-    finally:
-        db.close()
+def _item_values(item_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Sólo las columnas editables de ItemModel (sin id, versión ni claves desconocidas)."""
+    return {k: v for k, v in item_data.items() if k in _ITEM_COLUMNS}
 
 
-async def sync_pending_updates_to_mysql() -> int:
-    """Aplica las actualizaciones pendientes a MySQL."""
-    count = 0
-    try:
-        while True:
-            raw = await redis_client.rpop(REDIS_PENDING_UPDATES)
-            if not raw:
-                break
-            op = json.loads(raw)
-            item_id = op.get("id")
-            data = op.get("data", {})
-            if item_id is not None and isinstance(item_id, int):
-                ok = await asyncio.to_thread(_update_item_sync, item_id, data)
-                if ok:
-                    count += 1
-        return count
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error aplicando updates: {e}")
-        return count
+# --- Escrituras de una fila en un solo viaje (sin SELECT previo ni refresh) ---
+def update_item_row(
+    db, item_id: int, item_data: Dict[str, Any], expected_version: Optional[int] = None
+) -> Optional[int]:
+    """
+    UPDATE ... WHERE id (y version, si se pide control optimista) que sube la
+    versión. Devuelve la nueva versión, o None si ninguna fila coincidió. No hace commit.
+    """
+    stmt = update(_items_table).where(_items_table.c.id == item_id)
+    if expected_version is not None:
+        stmt = stmt.where(_items_table.c.version == expected_version)
+    values = _item_values(item_data)
+    bumped = _items_table.c.version + 1
+    if db.get_bind().dialect.name == "mysql":
+        # MySQL no tiene UPDATE ... RETURNING: LAST_INSERT_ID(expr) deja la nueva
+        # versión en el paquete OK de la propia sentencia (cursor.lastrowid)
+        result = db.execute(stmt.values(**values, version=func.last_insert_id(bumped)))
+        return result.lastrowid if result.rowcount else None
+    return db.execute(stmt.values(**values, version=bumped).returning(_items_table.c.version)).scalar()
 
 
-def _delete_item_sync(item_id: int) -> bool:
-    """Elimina un item en MySQL (síncrono)."""
-    db = SessionLocal()
-    try:
-        item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-        if not item:
-            return False
-        db.delete(item)
-        db.commit()
-        return True
-    finally:
-        db.close()
+def delete_item_row(db, item_id: int, expected_version: Optional[int] = None) -> bool:
+    """DELETE ... WHERE id (y version). True si borró la fila. No hace commit."""
+    stmt = delete(_items_table).where(_items_table.c.id == item_id)
+    if expected_version is not None:
+        stmt = stmt.where(_items_table.c.version == expected_version)
+    return db.execute(stmt).rowcount > 0
 
 
-async def sync_pending_deletes_to_mysql() -> int:
-    """Aplica las eliminaciones pendientes a MySQL."""
-    count = 0
-    try:
-        while True:
-            raw = await redis_client.rpop(REDIS_PENDING_DELETES)
-            if not raw:
-                break
-            try:
-                item_id = int(json.loads(raw))
-            except (ValueError, json.JSONDecodeError):
-                continue
-            if await asyncio.to_thread(_delete_item_sync, item_id):
-                count += 1
-        return count
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error aplicando deletes: {e}")
-        return count
+def get_item_version(db, item_id: int) -> Optional[int]:
+    """Versión actual (None si no existe): sólo para distinguir 404 de 412 cuando falla un If-Match."""
+    return db.execute(select(_items_table.c.version).where(_items_table.c.id == item_id)).scalar()
 
 
-async def add_pending_update(item_id: int, data: Dict[str, Any]) -> None:
-    """Encola una actualización pendiente (cuando MySQL está caído)."""
-    await redis_client.lpush(REDIS_PENDING_UPDATES, json.dumps({"id": item_id, "data": data}))
+def get_item_versions(conn, item_ids) -> Dict[int, int]:
+    """Versión actual de varios items en una consulta (los que no existen no aparecen)."""
+    stmt = select(_items_table.c.id, _items_table.c.version).where(_items_table.c.id.in_(list(item_ids)))
+    return dict(conn.execute(stmt).all())
 
 
-async def add_pending_delete(item_id: int) -> None:
-    """Encola una eliminación pendiente (cuando MySQL está caído)."""
-    await redis_client.lpush(REDIS_PENDING_DELETES, json.dumps(item_id))
+def _fetch_versions_sync(item_ids) -> Dict[int, int]:
+    with sync_engine.connect() as conn:
+        return get_item_versions(conn, item_ids)
 
 
-async def full_sync_on_mysql_recovery() -> Dict[str, int]:
-    """
-    Ejecuta sincronización completa cuando MySQL vuelve a estar disponible:
-    1. Aplica deletes pendientes
-    2. Aplica updates pendientes
-    3. Inserta creates pendientes
-    4. Refresca Redis desde MySQL
-    5. Verifica integridad
-    """
-    result = {
-        "deletes_synced": 0,
-        "updates_synced": 0,
-        "creates_synced": 0,
-        "cache_refreshed": 0,
-        "integrity_verified": False,
-    }
-    result["deletes_synced"] = await sync_pending_deletes_to_mysql()
-    result["updates_synced"] = await sync_pending_updates_to_mysql()
-    result["creates_synced"] = await sync_redis_pending_to_mysql()
-    result["cache_refreshed"] = await sync_mysql_to_redis()
-    
-    # Verificar integridad
-    is_valid, metadata = await verify_cache_integrity()
-    result["integrity_verified"] = is_valid
-    
-    return result
+async def _pop_batch(key: str, count: int) -> List[bytes]:
+    """Saca hasta `count` operaciones de una cola (las más antiguas primero)."""
+    return await redis_raw_client.rpop(key, count) or []
 
 
-async def get_items_from_redis() -> List[Dict[str, Any]]:
-    """Obtiene todos los items desde la caché de Redis."""
+async def _restore_batch(key: str, raws: List[bytes]) -> None:
+    """Devuelve a la cola un lote que no se pudo aplicar, conservando el orden."""
+    if raws:
+        await redis_raw_client.rpush(key, *reversed(raws))
+
+
+async def _replay_batch(key: str, apply_batch, size: int) -> Tuple[int, int]:
+    """Saca un lote y lo aplica; si falla vuelve a la cola. Devuelve (sacadas, aplicadas)."""
+    raws = await _pop_batch(key, size)
+    if not raws:
+        return 0, 0
     try:
-        raw = await redis_client.get(REDIS_ITEMS_CACHE)
-        if not raw:
-            return []
-        return json.loads(raw)
+        return len(raws), await apply_batch(raws)
     except Exception:
-        return []
+        await _restore_batch(key, raws)
+        raise
 
 
-async def get_items_from_redis_fallback() -> List[Dict[str, Any]]:
+async def _drain_queue(key: str, apply_batch, max_ops: Optional[int]) -> int:
     """
-    Obtiene items para modo fallback (MySQL caído): caché + pendientes.
-    Los pendientes son los creados mientras MySQL estaba caído.
+    Vacía una cola de pendientes en lotes de SYNC_REPLAY_BATCH_SIZE, cada lote en
+    una sola transacción MySQL. Si un lote falla vuelve a la cola y se relanza el error.
+    `max_ops` acota cuántas operaciones se sacan (None = hasta vaciarla).
+    Devuelve cuántas se aplicaron.
+    Cada lote corre en su propia tarea: una cancelación (apagado, relevo del líder)
+    entre el RPOP y el commit no lo pierde; se espera a que termine y después se
+    propaga la cancelación.
     """
-    cache_items = await get_items_from_redis()
-    pending_raw = await redis_client.lrange(REDIS_PENDING_ITEMS, 0, -1)
-    pending_items = []
-    for raw in reversed(pending_raw):  # Orden FIFO
+    applied = 0
+    popped = 0
+    while max_ops is None or popped < max_ops:
+        size = REPLAY_BATCH_SIZE if max_ops is None else min(REPLAY_BATCH_SIZE, max_ops - popped)
+        batch = asyncio.ensure_future(_replay_batch(key, apply_batch, size))
         try:
-            pending_items.append(json.loads(raw))
-        except json.JSONDecodeError:
-            pass
-    return cache_items + pending_items
+            count, done = await asyncio.shield(batch)
+        except asyncio.CancelledError:
+            await asyncio.wait({batch})
+            if not batch.cancelled():
+                batch.exception()  # Si falló ya volvió a la cola: sólo se marca como recogida
+            raise
+        if not count:
+            break
+        popped += count
+        applied += done
+        if count < size:
+            break
+    return applied
+
+
+def _insert_items_sync(items: List[Dict[str, Any]]) -> List[int]:
+    """Inserta un lote de items en MySQL en una transacción. Devuelve sus ids reales."""
+    db = SyncSessionLocal()
+    try:
+        new_items = [ItemModel(**_item_values(i)) for i in items]
+        db.add_all(new_items)
+        db.flush()
+        new_ids = [i.id for i in new_items]
+        db.commit()
+        return new_ids
+    finally:
+        db.close()
 
 
-async def add_item_to_redis_cache(item: Dict[str, Any]) -> None:
-    """Agrega un item al caché de Redis (cuando se escribe en MySQL)."""
-    try:
-        data = await get_items_from_redis()
-        # Evitar duplicados por id
-        data = [d for d in data if d.get("id") != item.get("id")]
-        data.append(item)
-        await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-        # Actualizar hash
-        data_hash = _compute_hash(data)
-        await redis_client.set(REDIS_ITEMS_HASH, data_hash)
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error actualizando caché Redis: {e}")
+def _insert_pending_item_sync(item_data: Dict[str, Any]) -> int:
+    """Inserta un item pendiente en MySQL (síncrono). Devuelve el id real."""
+    return _insert_items_sync([item_data])[0]
 
 
-async def add_item_to_redis_pending(item: Dict[str, Any]) -> None:
-    """Agrega un item a la cola pendiente (cuando MySQL está caído)."""
-    await redis_client.lpush(REDIS_PENDING_ITEMS, json.dumps(item))
+async def _pop_pending_overrides(temp_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Saca (y borra) las ediciones hechas sobre creates pendientes."""
+    if not temp_ids:
+        return {}
+    async with redis_raw_client.pipeline(transaction=True) as pipe:
+        pipe.hmget(REDIS_PENDING_OVERRIDES, temp_ids)
+        pipe.hdel(REDIS_PENDING_OVERRIDES, *temp_ids)
+        raws, _ = await pipe.execute()
+    return {t: codec.loads(raw) for t, raw in zip(temp_ids, raws) if raw}
+
+
+async def _restore_pending_overrides(overrides: Dict[str, Dict[str, Any]]) -> None:
+    if overrides:
+        await redis_raw_client.hset(
+            REDIS_PENDING_OVERRIDES, mapping={t: codec.dumps(o) for t, o in overrides.items()}
+        )
 
 
-async def add_item_to_redis_pending_and_cache(item: Dict[str, Any]) -> None:
+async def _apply_late_overrides(id_map: Dict[str, int]) -> None:
     """
-    Agrega un item a pending (para sync futura) y al caché (para lecturas).
-    Usa un id temporal para el caché ya que MySQL no lo generó.
+    Una edición pudo llegar entre la inserción en MySQL y el registro del mapeo
+    temp→real: si quedó un override, se aplica ahora sobre el id real.
     """
-    temp_id = f"pending_{uuid.uuid4().hex[:8]}"
-    item_with_id = {**item, "id": temp_id}
-    await redis_client.lpush(REDIS_PENDING_ITEMS, json.dumps(item))
-    await add_item_to_redis_cache(item_with_id)
+    overrides = await _pop_pending_overrides(list(id_map))
+    remaining = dict(overrides)
+    try:
+        for temp_id, override in overrides.items():
+            real_id = id_map[temp_id]
+            if override.get("deleted"):
+                await asyncio.to_thread(_delete_item_sync, real_id)
+            elif override.get("data"):
+                await asyncio.to_thread(_update_item_sync, real_id, override["data"])
+            del remaining[temp_id]
+    except Exception:
+        # Las no aplicadas vuelven al hash para el reintento
+        await _restore_pending_overrides(remaining)
+        raise
 
 
-async def update_item_in_redis_cache(item_id: int, item: Dict[str, Any]) -> bool:
-    """Actualiza un item en el caché de Redis. Devuelve True si se encontró y actualizó."""
-    try:
-        data = await get_items_from_redis()
-        found = False
-        for i, d in enumerate(data):
-            if d.get("id") == item_id:
-                data[i] = {**d, **item, "id": item_id}
-                found = True
-                break
-        if found:
-            await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-            # Actualizar hash
-            data_hash = _compute_hash(data)
-            await redis_client.set(REDIS_ITEMS_HASH, data_hash)
-        return found
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error actualizando item en Redis: {e}")
-        return False
+async def _reconcile_created(id_map: Dict[str, int]) -> None:
+    """Pasos de Redis tras insertar un lote: mapeo temp→real y ediciones tardías. Idempotente."""
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for temp_id, real_id in id_map.items():
+            pipe.set(f"{REDIS_ID_MAP_PREFIX}{temp_id}", real_id, ex=ITEM_ID_MAP_TTL)
+        await pipe.execute()
+    await _apply_late_overrides(id_map)
 
 
-async def delete_item_from_redis_cache(item_id: int) -> bool:
-    """Elimina un item del caché de Redis. Devuelve True si se encontró."""
-    try:
-        data = await get_items_from_redis()
-        original_len = len(data)
-        data = [d for d in data if d.get("id") != item_id]
-        if len(data) < original_len:
-            await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-            # Actualizar hash
-            data_hash = _compute_hash(data)
-            await redis_client.set(REDIS_ITEMS_HASH, data_hash)
-            return True
-        return False
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error eliminando item de Redis: {e}")
-        return False
+async def _patch_cache_ids(id_map: Dict[str, int], versions: Optional[Dict[int, int]] = None) -> int:
+    """
+    Sustituye en la caché los ids temporales por los reales (sin releer MySQL) y,
+    si se conocen, pone la versión de cada fila (If-Match sobre el item recién creado).
+    """
+    versions = versions or {}
 
+    def resolve(data):
+        changes = []
+        for d in data:
+            real_id = id_map.get(d.get("id"))
+            if real_id is not None:
+                changes.append({"op": "resolve", "temp_id": d["id"], "id": real_id})
+                d["id"] = real_id
+                if real_id in versions:
+                    d["version"] = versions[real_id]
+        return len(changes), changes
 
-# Compatibilidad con la clave legacy backup_items
-async def migrate_backup_items_to_pending() -> int:
-    """Migra datos de backup_items (legacy) a items:pending para sincronizar."""
-    count = 0
-    try:
-        backup_raw = await redis_client.lrange("backup_items", 0, -1)
-        for raw in backup_raw:
-            await redis_client.lpush(REDIS_PENDING_ITEMS, raw)
-            count += 1
-        if count > 0:
-            await redis_client.delete("backup_items")
-        return count
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error migrando backup_items: {e}")
-        return 0
+    return await _patch_items_cache(resolve)
 
 
-async def get_sync_status() -> Dict[str, Any]:
-    """Devuelve el estado actual de la sincronización."""
+async def _patch_cache_versions(versions: Dict[int, int]) -> None:
+    """
+    Tras aplicar updates pendientes: la caché (que ya tenía los datos nuevos) pasa
+    a llevar la versión de MySQL. Sin esto, hasta el siguiente refresco un If-Match
+    con la versión recién devuelta daría un 412 falso. Ya hubo commit: no se relanza.
+    """
+    def bump(data):
+        changes = []
+        for d in data:
+            version = versions.get(d.get("id"))
+            if version is not None and d.get("version") != version:
+                d["version"] = version
+                changes.append({"op": "update", "id": d["id"], "item": d, "pending": False})
+        return len(changes), changes
+
+    if not versions:
+        return
     try:
-        mysql_available = await check_mysql_available()
-        redis_available = await check_redis_available()
-        cache_items_count = len(await get_items_from_redis())
-        pending_items_count = await redis_client.llen(REDIS_PENDING_ITEMS)
-        pending_updates_count = await redis_client.llen(REDIS_PENDING_UPDATES)
-        pending_deletes_count = await redis_client.llen(REDIS_PENDING_DELETES)
-        is_consistent, consistency_details = await verify_cache_integrity()
-        
-        return {
-            "mysql_available": mysql_available,
-            "redis_available": redis_available,
-            "cache_items": cache_items_count,
-            "pending_creates": pending_items_count,
-            "pending_updates": pending_updates_count,
-            "pending_deletes": pending_deletes_count,
-            "is_consistent": is_consistent,
-            "consistency_details": consistency_details,
-            "status": "synced" if is_consistent else "out_of_sync"
-        }
+        await _patch_items_cache(bump)
     except Exception as e:
-        print(f"⚠️ Error obteniendo estado de sincronización: {e}")
-        return {"error": str(e)}
+        log.warning("⚠️ [SYNC] No se pudo poner la versión de los items sincronizados en la caché: %s", e)
 
 
+class _CreateReplay:
+    """Aplica lotes de creates pendientes y acumula la reconciliación de ids."""
 
-def _item_to_dict(item: ItemModel) -> Dict[str, Any]:
-    """Convierte ItemModel a diccionario serializable."""
-    return {
-        "id": item.id,
-        "code": item.code,
-        "type": item.type,
-        "status": item.status,
-        "area": item.area,
-        "acquisition_date": getattr(item, "acquisition_date", "") or "",
-    }
+    def __init__(self):
+        self.id_map: Dict[str, int] = {}
+        # Lotes ya insertados cuya reconciliación en Redis falló (se reintenta al final)
+        self.unreconciled: Dict[str, int] = {}
+        self.untracked = 0
 
+    async def __call__(self, raws: List[bytes]) -> int:
+        items = []
+        for raw in raws:
+            try:
+                items.append(codec.loads(raw))
+            except ValueError:
+                continue
+        temp_ids = [i["id"] for i in items if is_temp_id(i.get("id"))]
+        overrides = await _pop_pending_overrides(temp_ids)
 
-def _check_mysql_sync() -> bool:
-    """Verificación síncrona de MySQL."""
-    try:
-        with mysql_engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return True
-    except Exception:
-        return False
-
+        to_insert = []
+        for item in items:
+            override = overrides.get(item.get("id"), {})
+            if override.get("deleted"):
+                continue  # Se eliminó antes de llegar a MySQL
+            to_insert.append({**item, **override.get("data", {})})
 
-async def check_mysql_available() -> bool:
-    """Verifica si MySQL está disponible."""
-    return await asyncio.to_thread(_check_mysql_sync)
+        try:
+            new_ids = await asyncio.to_thread(_insert_items_sync, to_insert) if to_insert else []
+        except Exception:
+            await _restore_pending_overrides(overrides)
+            raise
+
+        batch_map = {}
+        for item, real_id in zip(to_insert, new_ids):
+            if is_temp_id(item.get("id")):
+                batch_map[item["id"]] = real_id
+            else:
+                self.untracked += 1
+        if batch_map:
+            # Con el commit hecho el lote está consumido: si lo que sigue falla no
+            # se relanza (_drain_queue lo devolvería a la cola y se insertaría dos veces)
+            self.id_map.update(batch_map)
+            try:
+                await _reconcile_created(batch_map)
+            except Exception as e:
+                self.unreconciled.update(batch_map)
+                log.warning("⚠️ [SYNC] Lote insertado, mapeo de ids pendiente de reintento: %s", e)
+        return len(new_ids)
 
 
-def _fetch_all_items_sync() -> List[Dict[str, Any]]:
-    """Obtiene todos los items de MySQL (síncrono)."""
-    db = SessionLocal()
+async def _replay_pending_creates(max_ops: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Inserta en MySQL los creates pendientes y reconcilia sus ids temporales.
+    Devuelve (insertados, insertados sin id temporal). Los segundos (p.ej. los
+    migrados de backup_items) no están en la caché y requieren refrescarla.
+    """
+    replay = _CreateReplay()
+    count = 0
     try:
-        items = db.query(ItemModel).all()
-        return [_item_to_dict(i) for i in items]
+        count = await _drain_queue(REDIS_PENDING_ITEMS, replay, max_ops)
+    except Exception as e:
+        log.warning("⚠️ [SYNC] Error Redis→MySQL (pending): %s", e)
     finally:
-        db.close()
+        if replay.unreconciled:
+            try:
+                await _reconcile_created(replay.unreconciled)
+            except Exception as e:
+                log.error("❌ [SYNC] Sin mapeo temp→real para %s items ya insertados: %s",
+                          len(replay.unreconciled), e)
+        if replay.id_map:
+            try:
+                versions = await asyncio.to_thread(_fetch_versions_sync, replay.id_map.values())
+            except Exception:
+                versions = {}
+            await _patch_cache_ids(replay.id_map, versions)
+    return count, replay.untracked
 
 
-async def sync_mysql_to_redis() -> int:
+async def sync_redis_pending_to_mysql() -> int:
     """
-    Sincroniza todos los items de MySQL hacia Redis (refresca la caché).
-    Devuelve el número de items sincronizados.
+    Vacía los items pendientes de Redis (creados cuando MySQL estaba caído)
+    y los inserta en MySQL. Devuelve cuántos se insertaron.
     """
-    try:
-        data = await asyncio.to_thread(_fetch_all_items_sync)
-        await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-        return len(data)
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error MySQL→Redis: {e}")
-        return 0
+    async with _drain_lock:
+        count, _ = await _replay_pending_creates()
+    return count
 
 
-def _insert_pending_item_sync(item_data: Dict[str, Any]) -> None:
-    """Inserta un item pendiente en MySQL (síncrono)."""
-    item_data = {k: v for k, v in item_data.items() if k != "id"}
-    db = SessionLocal()
+def _update_item_sync(item_id: int, item_data: Dict[str, Any]) -> bool:
+    """Actualiza un item en MySQL (síncrono, un solo UPDATE)."""
+    db = SyncSessionLocal()
     try:
-        new_item = ItemModel(**item_data)
-        db.add(new_item)
+        updated = update_item_row(db, item_id, item_data) is not None
         db.commit()
+        return updated
     finally:
         db.close()
 
 
-async def sync_redis_pending_to_mysql() -> int:
+def _update_items_sync(ops: List[Tuple[int, Dict[str, Any]]]) -> Tuple[int, Dict[int, int]]:
     """
-    Vacía los items pendientes de Redis (creados cuando MySQL estaba caído)
-    y los inserta en MySQL. Devuelve cuántos se insertaron.
+    Aplica un lote de updates en una transacción. Los de un mismo item se funden
+    (gana el último valor de cada campo, la versión sube una vez) y se agrupan
+    por columnas editadas: un executemany por grupo en vez de un UPDATE por
+    operación. Devuelve cuántas filas cambiaron y la versión resultante de cada item.
     """
-    count = 0
-    try:
-        while True:
-            raw = await redis_client.rpop(REDIS_PENDING_ITEMS)
-            if not raw:
-                break
-            item_data = json.loads(raw)
-            await asyncio.to_thread(_insert_pending_item_sync, item_data)
-            count += 1
-        return count
-    except Exception as e:
-        print(f"⚠️ [SYNC] Error Redis→MySQL (pending): {e}")
-        return count
-
-
-def _update_item_sync(item_id: int, item_data: Dict[str, Any]) -> bool:
-    """Actualiza un item en MySQL (síncrono)."""
-    db = SessionLocal()
+    merged: Dict[int, Dict[str, Any]] = {}
+    for item_id, item_data in ops:
+        values = _item_values(item_data)
+        if values:
+            merged.setdefault(item_id, {}).update(values)
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for item_id, values in merged.items():
+        # Los bindparam no pueden llamarse como las columnas del SET
+        params = {"b_id": item_id, **{f"b_{column}": value for column, value in values.items()}}
+        groups.setdefault(tuple(sorted(values)), []).append(params)
+
+    db = SyncSessionLocal()
     try:
-        item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-        if not item:
-            return False
-        for k, v in item_data.items():
-            if hasattr(item, k) and k != "id":
-                setattr(item, k, v)
+        updated = 0
+        for columns, params in groups.items():
+            stmt = (
+                update(_items_table)
+                .where(_items_table.c.id == bindparam("b_id"))
+                .values({**{c: bindparam(f"b_{c}") for c in columns}, "version": _items_table.c.version + 1})
+            )
+            result = db.execute(stmt, params)
+            updated += result.rowcount if db.get_bind().dialect.supports_sane_multi_rowcount else len(params)
+        # executemany no devuelve filas: las versiones se leen en la misma transacción
+        versions = get_item_versions(db, merged) if merged else {}
         db.commit()
-        return True
+        return updated, versions
     finally:
         db.close()
 
 
-async def sync_pending_updates_to_mysql() -> int:
+async def _apply_update_batch(raws: List[bytes]) -> int:
+    ops = []
+    for raw in raws:
+        try:
+            op = codec.loads(raw)
+        except ValueError:
+            continue
+        item_id = op.get("id")
+        if item_id is not None and isinstance(item_id, int):
+            ops.append((item_id, op.get("data", {})))
+    if not ops:
+        return 0
+    applied, versions = await asyncio.to_thread(_update_items_sync, ops)
+    await _patch_cache_versions(versions)
+    await publish_changes([{"op": "synced", "ids": sorted({item_id for item_id, _ in ops})}])
+    return applied
+
+
+async def sync_pending_updates_to_mysql(max_ops: Optional[int] = None) -> int:
     """Aplica las actualizaciones pendientes a MySQL."""
-    count = 0
     try:
-        while True:
-            raw = await redis_client.rpop(REDIS_PENDING_UPDATES)
-            if not raw:
-                break
-            op = json.loads(raw)
-            item_id = op.get("id")
-            data = op.get("data", {})
-            if item_id is not None and isinstance(item_id, int):
-                ok = await asyncio.to_thread(_update_item_sync, item_id, data)
-                if ok:
-                    count += 1
-        return count
+        return await _drain_queue(REDIS_PENDING_UPDATES, _apply_update_batch, max_ops)
     except Exception as e:
-        print(f"⚠️ [SYNC] Error aplicando updates: {e}")
-        return count
+        log.warning("⚠️ [SYNC] Error aplicando updates: %s", e)
+        return 0
 
 
 def _delete_item_sync(item_id: int) -> bool:
-    """Elimina un item en MySQL (síncrono)."""
-    db = SessionLocal()
+    """Elimina un item en MySQL (síncrono, un solo DELETE)."""
+    db = SyncSessionLocal()
     try:
-        item = db.query(ItemModel).filter(ItemModel.id == item_id).first()
-        if not item:
-            return False
-        db.delete(item)
+        deleted = delete_item_row(db, item_id)
         db.commit()
-        return True
+        return deleted
+    finally:
+        db.close()
+
+
+def _delete_items_sync(item_ids: List[int]) -> int:
+    """Elimina un lote de items con un único DELETE ... WHERE id IN (...)."""
+    db = SyncSessionLocal()
+    try:
+        deleted = db.query(ItemModel).filter(ItemModel.id.in_(item_ids)).delete(synchronize_session=False)
+        db.commit()
+        return deleted
     finally:
         db.close()
 
 
-async def sync_pending_deletes_to_mysql() -> int:
+async def _apply_delete_batch(raws: List[bytes]) -> int:
+    item_ids = []
+    for raw in raws:
+        try:
+            item_ids.append(int(codec.loads(raw)))
+        except (TypeError, ValueError):
+            continue
+    if not item_ids:
+        return 0
+    applied = await asyncio.to_thread(_delete_items_sync, item_ids)
+    await publish_changes([{"op": "synced", "ids": sorted(set(item_ids))}])
+    return applied
+
+
+async def sync_pending_deletes_to_mysql(max_ops: Optional[int] = None) -> int:
     """Aplica las eliminaciones pendientes a MySQL."""
-    count = 0
     try:
-        while True:
-            raw = await redis_client.rpop(REDIS_PENDING_DELETES)
-            if not raw:
-                break
-            try:
-                item_id = int(json.loads(raw))
-            except (ValueError, json.JSONDecodeError):
-                continue
-            if await asyncio.to_thread(_delete_item_sync, item_id):
-                count += 1
-        return count
+        return await _drain_queue(REDIS_PENDING_DELETES, _apply_delete_batch, max_ops)
     except Exception as e:
-        print(f"⚠️ [SYNC] Error aplicando deletes: {e}")
-        return count
+        log.warning("⚠️ [SYNC] Error aplicando deletes: %s", e)
+        return 0
 
 
+async def _enqueue(key: str, *raws: bytes) -> None:
+    """LPUSH a una cola pendiente; marca en sync:state desde cuándo hay backlog."""
+    async with redis_raw_client.pipeline(transaction=False) as pipe:
+        pipe.lpush(key, *raws)
+        pipe.hsetnx(REDIS_SYNC_STATE, "pending_since", time.time())
+        await pipe.execute()
+
+
+async def _clear_pending_since() -> None:
+    """Con las tres colas vacías el próximo pendiente vuelve a marcar pending_since."""
+    if not await get_pending_depth():
+        await redis_raw_client.hdel(REDIS_SYNC_STATE, "pending_since")
+
+
+@traced("sync.add_pending_update")
 async def add_pending_update(item_id: int, data: Dict[str, Any]) -> None:
     """Encola una actualización pendiente (cuando MySQL está caído)."""
-    await redis_client.lpush(REDIS_PENDING_UPDATES, json.dumps({"id": item_id, "data": data}))
+    await _enqueue(REDIS_PENDING_UPDATES, codec.dumps({"id": item_id, "data": data}))
 
 
+@traced("sync.add_pending_delete")
 async def add_pending_delete(item_id: int) -> None:
     """Encola una eliminación pendiente (cuando MySQL está caído)."""
-    await redis_client.lpush(REDIS_PENDING_DELETES, json.dumps(item_id))
+    await _enqueue(REDIS_PENDING_DELETES, codec.dumps(item_id))
+
+
+def is_write_behind() -> bool:
+    return ITEM_WRITE_MODE == "write_behind"
+
+
+@traced("sync.get_pending_depth")
+async def get_pending_depth() -> int:
+    """Total de operaciones pendientes en las tres colas (un solo viaje a Redis)."""
+    async with redis_raw_client.pipeline(transaction=False) as pipe:
+        pipe.llen(REDIS_PENDING_ITEMS)
+        pipe.llen(REDIS_PENDING_UPDATES)
+        pipe.llen(REDIS_PENDING_DELETES)
+        return sum(await pipe.execute())
+
+
+async def flush_write_behind_batch() -> Dict[str, int]:
+    """
+    Vuelca a MySQL como mucho WRITE_BEHIND_BATCH_SIZE operaciones de cada cola
+    (deletes → updates → creates, igual que en la recuperación).
+    """
+    result = {"deletes_synced": 0, "updates_synced": 0, "creates_synced": 0}
+    async with _drain_lock:
+        with query_scope("write_behind:deletes"):
+            result["deletes_synced"] = await sync_pending_deletes_to_mysql(WRITE_BEHIND_BATCH_SIZE)
+        with query_scope("write_behind:updates"):
+            result["updates_synced"] = await sync_pending_updates_to_mysql(WRITE_BEHIND_BATCH_SIZE)
+        with query_scope("write_behind:creates", check_repeats=False):
+            result["creates_synced"], _ = await _replay_pending_creates(WRITE_BEHIND_BATCH_SIZE)
+    if any(result.values()):
+        await _clear_pending_since()
+    return result
 
 
 async def full_sync_on_mysql_recovery() -> Dict[str, int]:
@@ -603,29 +836,53 @@ async def full_sync_on_mysql_recovery() -> Dict[str, int]:
     Ejecuta sincronización completa cuando MySQL vuelve a estar disponible:
     1. Aplica deletes pendientes
     2. Aplica updates pendientes
-    3. Inserta creates pendientes
-    4. Refresca Redis desde MySQL
+    3. Inserta creates pendientes (los ids temporales se corrigen en la caché)
+    4. Refresca Redis desde MySQL, salvo que el backlog ya haya quedado
+       reconciliado en la caché: ésta reflejaba las operaciones desde el fallback
+    5. Verifica integridad
     """
+    started = time.perf_counter()
     result = {
         "deletes_synced": 0,
         "updates_synced": 0,
         "creates_synced": 0,
         "cache_refreshed": 0,
+        "integrity_verified": False,
     }
-    result["deletes_synced"] = await sync_pending_deletes_to_mysql()
-    result["updates_synced"] = await sync_pending_updates_to_mysql()
-    result["creates_synced"] = await sync_redis_pending_to_mysql()
-    result["cache_refreshed"] = await sync_mysql_to_redis()
+    # El refresco también va bajo el lock: con un lote del flusher sacado de la cola
+    # pero sin confirmar, la cola parece vacía y MySQL aún no tiene esas escrituras
+    async with _drain_lock:
+        with query_scope("sync:deletes"):
+            result["deletes_synced"] = await sync_pending_deletes_to_mysql()
+        with query_scope("sync:updates"):
+            result["updates_synced"] = await sync_pending_updates_to_mysql()
+        # Un INSERT por item es inevitable: MySQL no tiene RETURNING y el ORM necesita
+        # el id de cada fila para el mapeo temp→real
+        with query_scope("sync:creates", check_repeats=False):
+            result["creates_synced"], untracked = await _replay_pending_creates()
+        replayed = result["deletes_synced"] + result["updates_synced"] + result["creates_synced"]
+        # Con operaciones aún en cola (write-behind o escrituras durante el vaciado) la
+        # caché va por delante de MySQL: refrescarla borraría esas escrituras
+        if untracked or (not replayed and not await get_pending_depth()):
+            with query_scope("sync:refresh"):
+                result["cache_refreshed"] = await sync_mysql_to_redis()
+    
+    # Verificar integridad
+    is_valid, metadata = await verify_cache_integrity()
+    result["integrity_verified"] = is_valid
+
+    await _clear_pending_since()
+    await _record_state(last_sync_at=time.time(), last_sync_ms=round((time.perf_counter() - started) * 1000, 1))
     return result
 
 
 async def get_items_from_redis() -> List[Dict[str, Any]]:
     """Obtiene todos los items desde la caché de Redis."""
     try:
-        raw = await redis_client.get(REDIS_ITEMS_CACHE)
+        raw = await redis_raw_client.get(REDIS_ITEMS_CACHE)
         if not raw:
             return []
-        return json.loads(raw)
+        return codec.loads(raw)
     except Exception:
         return []
 
@@ -636,74 +893,159 @@ async def get_items_from_redis_fallback() -> List[Dict[str, Any]]:
     Los pendientes son los creados mientras MySQL estaba caído.
     """
     cache_items = await get_items_from_redis()
-    pending_raw = await redis_client.lrange(REDIS_PENDING_ITEMS, 0, -1)
+    cached_ids = {d.get("id") for d in cache_items}
+    pending_raw = await redis_raw_client.lrange(REDIS_PENDING_ITEMS, 0, -1)
     pending_items = []
     for raw in reversed(pending_raw):  # Orden FIFO
         try:
-            pending_items.append(json.loads(raw))
-        except json.JSONDecodeError:
-            pass
+            item = codec.loads(raw)
+        except ValueError:
+            continue
+        # Los creates con id temporal ya están en la caché
+        if item.get("id") is None or item.get("id") not in cached_ids:
+            pending_items.append(item)
     return cache_items + pending_items
 
 
-async def add_item_to_redis_cache(item: Dict[str, Any]) -> None:
-    """Agrega un item al caché de Redis (cuando se escribe en MySQL)."""
-    try:
-        data = await get_items_from_redis()
+@traced("sync.add_item_to_redis_cache")
+async def add_item_to_redis_cache(item: Dict[str, Any], from_mysql: bool = False) -> None:
+    """Agrega un item al caché de Redis (from_mysql: ya confirmado en MySQL)."""
+    def add(data):
         # Evitar duplicados por id
-        data = [d for d in data if d.get("id") != item.get("id")]
+        data[:] = [d for d in data if d.get("id") != item.get("id")]
         data.append(item)
-        await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
+        return None, [{"op": "create", "id": item.get("id"), "item": item, "pending": not from_mysql}]
+
+    try:
+        await _patch_items_cache(add, from_mysql)
     except Exception as e:
-        print(f"⚠️ [SYNC] Error actualizando caché Redis: {e}")
+        log.warning("⚠️ [SYNC] Error actualizando caché Redis: %s", e)
 
 
 async def add_item_to_redis_pending(item: Dict[str, Any]) -> None:
     """Agrega un item a la cola pendiente (cuando MySQL está caído)."""
-    await redis_client.lpush(REDIS_PENDING_ITEMS, json.dumps(item))
+    await _enqueue(REDIS_PENDING_ITEMS, codec.dumps(item))
 
 
-async def add_item_to_redis_pending_and_cache(item: Dict[str, Any]) -> None:
+@traced("sync.add_item_to_redis_pending_and_cache")
+async def add_item_to_redis_pending_and_cache(item: Dict[str, Any]) -> Dict[str, Any]:
     """
     Agrega un item a pending (para sync futura) y al caché (para lecturas).
-    Usa un id temporal para el caché ya que MySQL no lo generó.
+    Usa un id temporal ya que MySQL no lo generó; viaja con el pendiente para
+    poder corregirlo en la caché al sincronizar. Devuelve el item con su id.
     """
-    temp_id = f"pending_{uuid.uuid4().hex[:8]}"
+    temp_id = f"{TEMP_ID_PREFIX}{uuid.uuid4().hex[:8]}"
     item_with_id = {**item, "id": temp_id}
-    await redis_client.lpush(REDIS_PENDING_ITEMS, json.dumps(item))
+    await _enqueue(REDIS_PENDING_ITEMS, codec.dumps(item_with_id))
     await add_item_to_redis_cache(item_with_id)
+    return item_with_id
+
+
+@traced("sync.resolve_item_id")
+async def resolve_item_id(raw_id: str) -> Optional[Union[int, str]]:
+    """
+    Interpreta el id de la ruta: entero de MySQL, o id temporal. Un id temporal
+    ya sincronizado se traduce a su id real; si sigue pendiente se devuelve tal cual.
+    None si el id no es válido.
+    """
+    if raw_id.isdigit():
+        return int(raw_id)
+    if not is_temp_id(raw_id):
+        return None
+    real_id = await redis_client.get(f"{REDIS_ID_MAP_PREFIX}{raw_id}")
+    return int(real_id) if real_id else raw_id
+
 
+async def get_real_item_id(temp_id: str) -> Optional[int]:
+    """Id real de MySQL asignado a un id temporal, o None si aún no se sincronizó."""
+    real_id = await redis_client.get(f"{REDIS_ID_MAP_PREFIX}{temp_id}")
+    return int(real_id) if real_id else None
 
-async def update_item_in_redis_cache(item_id: int, item: Dict[str, Any]) -> bool:
+
+async def _hand_over_late_override(temp_id: str) -> None:
+    """
+    Si el create ya se insertó (hay mapeo temp→real), la reconciliación pudo leer
+    los overrides antes de que llegara este: se saca y se encola como una
+    operación normal sobre el id real. El HGET+HDEL es atómico, así que si la
+    reconciliación lo vio primero aquí no queda nada que repetir.
+    """
+    real_id = await get_real_item_id(temp_id)
+    if real_id is None:
+        return
+    override = (await _pop_pending_overrides([temp_id])).get(temp_id)
+    if override is None:
+        return
+    if override.get("deleted"):
+        await add_pending_delete(real_id)
+    elif override.get("data"):
+        await add_pending_update(real_id, override["data"])
+
+
+@traced("sync.update_pending_create")
+async def update_pending_create(temp_id: str, data: Dict[str, Any]) -> bool:
+    """Edita un item creado sin MySQL que aún no se sincronizó."""
+    if not await update_item_in_redis_cache(temp_id, data):
+        # La caché ya lleva el id real: el create se sincronizó mientras tanto
+        real_id = await get_real_item_id(temp_id)
+        if real_id is None or not await update_item_in_redis_cache(real_id, data):
+            return False
+        await add_pending_update(real_id, data)
+        return True
+    raw = await redis_raw_client.hget(REDIS_PENDING_OVERRIDES, temp_id)
+    override = codec.loads(raw) if raw else {}
+    override["data"] = {**override.get("data", {}), **data}
+    await redis_raw_client.hset(REDIS_PENDING_OVERRIDES, temp_id, codec.dumps(override))
+    await _hand_over_late_override(temp_id)
+    return True
+
+
+@traced("sync.delete_pending_create")
+async def delete_pending_create(temp_id: str) -> bool:
+    """Elimina un item creado sin MySQL que aún no se sincronizó."""
+    if not await delete_item_from_redis_cache(temp_id):
+        real_id = await get_real_item_id(temp_id)
+        if real_id is None or not await delete_item_from_redis_cache(real_id):
+            return False
+        await add_pending_delete(real_id)
+        return True
+    await redis_raw_client.hset(REDIS_PENDING_OVERRIDES, temp_id, codec.dumps({"deleted": True}))
+    await _hand_over_late_override(temp_id)
+    return True
+
+
+@traced("sync.update_item_in_redis_cache")
+async def update_item_in_redis_cache(
+    item_id: Union[int, str], item: Dict[str, Any], from_mysql: bool = False
+) -> bool:
     """Actualiza un item en el caché de Redis. Devuelve True si se encontró y actualizó."""
-    try:
-        data = await get_items_from_redis()
-        found = False
+    def patch(data):
         for i, d in enumerate(data):
             if d.get("id") == item_id:
                 data[i] = {**d, **item, "id": item_id}
-                found = True
-                break
-        if found:
-            await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-        return found
+                return True, [{"op": "update", "id": item_id, "item": data[i], "pending": not from_mysql}]
+        return False, None
+
+    try:
+        return await _patch_items_cache(patch, from_mysql)
     except Exception as e:
-        print(f"⚠️ [SYNC] Error actualizando item en Redis: {e}")
+        log.warning("⚠️ [SYNC] Error actualizando item en Redis: %s", e)
         return False
 
 
-async def delete_item_from_redis_cache(item_id: int) -> bool:
+@traced("sync.delete_item_from_redis_cache")
+async def delete_item_from_redis_cache(item_id: Union[int, str], from_mysql: bool = False) -> bool:
     """Elimina un item del caché de Redis. Devuelve True si se encontró."""
-    try:
-        data = await get_items_from_redis()
+    def remove(data):
         original_len = len(data)
-        data = [d for d in data if d.get("id") != item_id]
+        data[:] = [d for d in data if d.get("id") != item_id]
         if len(data) < original_len:
-            await redis_client.set(REDIS_ITEMS_CACHE, json.dumps(data))
-            return True
-        return False
+            return True, [{"op": "delete", "id": item_id, "pending": not from_mysql}]
+        return False, None
+
+    try:
+        return await _patch_items_cache(remove, from_mysql)
     except Exception as e:
-        print(f"⚠️ [SYNC] Error eliminando item de Redis: {e}")
+        log.warning("⚠️ [SYNC] Error eliminando item de Redis: %s", e)
         return False
 
 
@@ -712,13 +1054,90 @@ async def migrate_backup_items_to_pending() -> int:
     """Migra datos de backup_items (legacy) a items:pending para sincronizar."""
     count = 0
     try:
-        backup_raw = await redis_client.lrange("backup_items", 0, -1)
-        for raw in backup_raw:
-            await redis_client.lpush(REDIS_PENDING_ITEMS, raw)
-            count += 1
+        backup_raw = await redis_raw_client.lrange("backup_items", 0, -1)
+        if backup_raw:
+            await _enqueue(REDIS_PENDING_ITEMS, *backup_raw)
+            count = len(backup_raw)
         if count > 0:
             await redis_client.delete("backup_items")
         return count
     except Exception as e:
-        print(f"⚠️ [SYNC] Error migrando backup_items: {e}")
+        log.warning("⚠️ [SYNC] Error migrando backup_items: %s", e)
         return 0
+
+
+# Sin sondeo de MySQL más reciente que esto, /sync/status lo comprueba en el momento
+SYNC_STATUS_PROBE_MAX_AGE_S = float(os.getenv("SYNC_STATUS_PROBE_MAX_AGE_S", "10"))
+
+
+def _state_float(state: Dict[bytes, bytes], field: str) -> Optional[float]:
+    value = state.get(field.encode())
+    return float(value) if value is not None else None
+
+
+@traced("sync.get_sync_status")
+async def get_sync_status(deep: bool = False) -> Dict[str, Any]:
+    """
+    Devuelve el estado actual de la sincronización.
+    Por defecto lee en un solo viaje a Redis el estado mantenido en sync:state
+    (sin decodificar la caché). Con deep=True sondea MySQL y verifica el hash
+    de la caché completa en el momento.
+    """
+    try:
+        async with redis_raw_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(REDIS_SYNC_STATE)
+            pipe.llen(REDIS_PENDING_ITEMS)
+            pipe.llen(REDIS_PENDING_UPDATES)
+            pipe.llen(REDIS_PENDING_DELETES)
+            state, pending_items_count, pending_updates_count, pending_deletes_count = await pipe.execute()
+        redis_available = True
+        now = time.time()
+
+        mysql_checked_at = _state_float(state, "mysql_checked_at")
+        if deep or mysql_checked_at is None or now - mysql_checked_at > SYNC_STATUS_PROBE_MAX_AGE_S:
+            mysql_available = await check_mysql_available()
+            mysql_checked_at = now
+        else:
+            mysql_available = bool(_state_float(state, "mysql_available"))
+
+        if deep:
+            is_consistent, consistency_details = await verify_cache_integrity()
+            cache_items_count = consistency_details.get("items_count", len(await get_items_from_redis()))
+            verified_at = now
+        else:
+            verify_ok = _state_float(state, "verify_ok")
+            verified_at = _state_float(state, "verify_at")
+            cache_items_count = int(_state_float(state, "cache_items") or 0)
+            is_consistent = bool(verify_ok)
+            consistency_details = (
+                {"reason": "Sin verificación todavía"} if verify_ok is None else {
+                    "is_valid": is_consistent,
+                    "items_count": int(_state_float(state, "verify_items") or 0),
+                    "hash_match": is_consistent,
+                }
+            )
+
+        pending_total = pending_items_count + pending_updates_count + pending_deletes_count
+        pending_since = _state_float(state, "pending_since")
+        last_sync_at = _state_float(state, "last_sync_at")
+        return {
+            "mysql_available": mysql_available,
+            "redis_available": redis_available,
+            "cache_items": cache_items_count,
+            "pending_creates": pending_items_count,
+            "pending_updates": pending_updates_count,
+            "pending_deletes": pending_deletes_count,
+            "is_consistent": is_consistent,
+            "consistency_details": consistency_details,
+            "status": "synced" if is_consistent else "out_of_sync",
+            "verified_at": verified_at,
+            "mysql_checked_at": mysql_checked_at,
+            "last_sync_at": last_sync_at,
+            "last_sync_ms": _state_float(state, "last_sync_ms"),
+            # Cota superior: el backlog existe desde pending_since (colas vacías por última vez)
+            "oldest_pending_age_s": round(now - pending_since, 1) if pending_total and pending_since else None,
+            "deep": deep,
+        }
+    except Exception as e:
+        log.warning("⚠️ Error obteniendo estado de sincronización: %s", e)
+        return {"error": str(e)}
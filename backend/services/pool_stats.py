@@ -0,0 +1,344 @@
+"""
+Instrumentación de pools de conexiones (MySQL, Redis y MongoDB).
+
+Cada pool registra en un PoolStats:
+- conexiones en uso (checked-out) y peticiones esperando una conexión (waiters)
+- histograma del tiempo de espera para obtener una conexión
+- rotación de conexiones (creadas / cerradas) y timeouts
+Las estadísticas se exponen en /system/pools.
+
+Los pools MySQL de la API ajustan además su max_overflow con esas mismas
+medidas (AdaptiveOverflow): crecen hasta un techo cuando hay esperas y
+vuelven al valor configurado cuando sobra capacidad.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+import redis.asyncio as redis
+
+from backend.services.logs import get_logger
+
+log = get_logger("pools")
+
+# Límites superiores (ms) de las cubetas del histograma de espera
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolStats:
+    """Contadores de un pool. Thread-safe: el pool de MySQL se usa desde hilos."""
+
+    def __init__(self, name: str, **config: Any):
+        self.name = name
+        self.config = config
+        self._lock = threading.Lock()
+        self.checked_out = 0
+        self.waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.closed = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_hist = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        # Máximo de conexiones en uso desde la última lectura de take_window()
+        self.peak_checked_out = 0
+        self.adaptive: Optional["AdaptiveOverflow"] = None
+
+    def wait_started(self) -> None:
+        with self._lock:
+            self.waiters += 1
+
+    def wait_finished(self, seconds: float, ok: bool) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            self.waiters -= 1
+            if not ok:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.wait_total_ms += ms
+            self.wait_max_ms = max(self.wait_max_ms, ms)
+            self.wait_hist[bisect_left(WAIT_BUCKETS_MS, ms)] += 1
+
+    def checked_in(self) -> None:
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_created(self) -> None:
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self) -> None:
+        with self._lock:
+            self.closed += 1
+
+    def take_window(self) -> Tuple[int, float, int, int, int]:
+        """(checkouts, ms de espera, timeouts, waiters, pico en uso); reinicia el pico"""
+        with self._lock:
+            peak, self.peak_checked_out = self.peak_checked_out, self.checked_out
+            return self.checkouts, self.wait_total_ms, self.timeouts, self.waiters, peak
+
+    def snapshot(self) -> Dict[str, Any]:
+        adaptive = self.adaptive.snapshot() if self.adaptive is not None else None
+        with self._lock:
+            labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "config": self.config,
+                "checked_out": self.checked_out,
+                "waiters": self.waiters,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connections_created": self.created,
+                "connections_closed": self.closed,
+                "wait_avg_ms": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "wait_histogram": dict(zip(labels, self.wait_hist)),
+                **({"adaptive": adaptive} if adaptive else {}),
+            }
+
+
+# Registro global: nombre del pool → estadísticas
+POOL_STATS: Dict[str, PoolStats] = {}
+
+
+def register_pool(name: str, **config: Any) -> PoolStats:
+    POOL_STATS[name] = PoolStats(name, **config)
+    return POOL_STATS[name]
+
+
+def get_pools_status() -> Dict[str, Dict[str, Any]]:
+    return {name: stats.snapshot() for name, stats in POOL_STATS.items()}
+
+
+# --- MySQL (SQLAlchemy) ---
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout. Las estadísticas se buscan por
+    pool_logging_name, que SQLAlchemy conserva al recrear el pool (dispose()).
+    """
+
+    def _do_get(self):
+        stats = POOL_STATS.get(self._orig_logging_name)
+        if stats is None:
+            return super()._do_get()
+        stats.wait_started()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            conn = super()._do_get()
+            ok = True
+            return conn
+        finally:
+            stats.wait_finished(time.perf_counter() - t0, ok)
+
+
+def instrument_engine(engine, stats: PoolStats) -> None:
+    """Registra los eventos de checkin y rotación de conexiones del engine."""
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, record):
+        stats.checked_in()
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_conn, record):
+        stats.connection_created()
+
+    @event.listens_for(engine, "close")
+    def _close(dbapi_conn, record):
+        stats.connection_closed()
+
+    @event.listens_for(engine, "close_detached")
+    def _close_detached(dbapi_conn):
+        stats.connection_closed()
+
+
+# --- Tamaño adaptativo (MySQL) ---
+POOL_ADAPTIVE = os.getenv("POOL_ADAPTIVE", "1") == "1"
+POOL_ADAPT_INTERVAL_S = float(os.getenv("POOL_ADAPT_INTERVAL_S", "5"))
+# Espera media por checkout (en el intervalo) que cuenta como presión
+POOL_ADAPT_WAIT_MS = float(os.getenv("POOL_ADAPT_WAIT_MS", "10"))
+POOL_ADAPT_STEP = int(os.getenv("POOL_ADAPT_STEP", "2"))
+# Intervalos seguidos con holgura antes de devolver capacidad
+POOL_ADAPT_IDLE_TICKS = int(os.getenv("POOL_ADAPT_IDLE_TICKS", "6"))
+
+_ADAPTIVE_POOLS: List["AdaptiveOverflow"] = []
+
+
+class AdaptiveOverflow:
+    """
+    Ajusta el max_overflow de un QueuePool entre el configurado (suelo) y
+    max_total - pool_size (techo) con los contadores de su PoolStats:
+    - presión (waiters, timeouts o espera media > POOL_ADAPT_WAIT_MS en el
+      intervalo) → +POOL_ADAPT_STEP conexiones de overflow;
+    - POOL_ADAPT_IDLE_TICKS intervalos sin presión y con el pico en uso por
+      debajo de la capacidad menos un paso → -POOL_ADAPT_STEP.
+    Las conexiones de overflow ya se cierran al devolverse: bajar el límite
+    sólo impide abrir nuevas.
+    """
+
+    def __init__(self, engine, stats: PoolStats, max_total: int):
+        self.engine = engine
+        self.stats = stats
+        self.floor = engine.pool._max_overflow
+        self.ceiling = max(self.floor, max_total - engine.pool.size())
+        self.grown = 0
+        self.shrunk = 0
+        self._idle_ticks = 0
+        self._last = (0, 0.0, 0)
+
+    def tick(self) -> None:
+        # engine.pool cambia tras dispose(); recreate() conserva el max_overflow ajustado
+        pool = self.engine.pool
+        checkouts, wait_ms, timeouts, waiters, peak = self.stats.take_window()
+        d_checkouts = checkouts - self._last[0]
+        d_wait_ms = wait_ms - self._last[1]
+        d_timeouts = timeouts - self._last[2]
+        self._last = (checkouts, wait_ms, timeouts)
+
+        current = pool._max_overflow
+        pressure = waiters > 0 or d_timeouts > 0 or (
+            d_checkouts > 0 and d_wait_ms / d_checkouts > POOL_ADAPT_WAIT_MS
+        )
+        if pressure:
+            self._idle_ticks = 0
+            if current < self.ceiling:
+                pool._max_overflow = min(self.ceiling, current + POOL_ADAPT_STEP)
+                self.grown += 1
+                log.info("📈 [POOL] %s: max_overflow %s → %s (waiters=%s, timeouts=+%s)",
+                         self.stats.name, current, pool._max_overflow, waiters, d_timeouts,
+                         extra={"store": "mysql"})
+            return
+        if current > self.floor and peak <= pool.size() + current - POOL_ADAPT_STEP:
+            self._idle_ticks += 1
+            if self._idle_ticks >= POOL_ADAPT_IDLE_TICKS:
+                self._idle_ticks = 0
+                pool._max_overflow = max(self.floor, current - POOL_ADAPT_STEP)
+                self.shrunk += 1
+                log.info("📉 [POOL] %s: max_overflow %s → %s (pico en uso %s)",
+                         self.stats.name, current, pool._max_overflow, peak, extra={"store": "mysql"})
+        else:
+            self._idle_ticks = 0
+
+    def capacity(self) -> int:
+        return self.engine.pool.size() + self.engine.pool._max_overflow
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "max_overflow": self.engine.pool._max_overflow,
+            "floor": self.floor,
+            "ceiling": self.ceiling,
+            "grown": self.grown,
+            "shrunk": self.shrunk,
+        }
+
+
+def make_adaptive(engine, stats: PoolStats, max_total: int) -> None:
+    """Registra el pool para pool_autosize_loop (pool_size 0 = sin límite: nada que ajustar)"""
+    if not POOL_ADAPTIVE or engine.pool._max_overflow < 0:
+        return
+    stats.adaptive = AdaptiveOverflow(engine, stats, max_total)
+    _ADAPTIVE_POOLS.append(stats.adaptive)
+
+
+async def pool_autosize_loop() -> None:
+    """Tarea de fondo (cada worker tiene sus pools): un ajuste por pool cada POOL_ADAPT_INTERVAL_S"""
+    while True:
+        await asyncio.sleep(POOL_ADAPT_INTERVAL_S)
+        for adaptive in _ADAPTIVE_POOLS:
+            try:
+                adaptive.tick()
+            except Exception as e:
+                log.warning("⚠️ [POOL] No se pudo ajustar %s: %s", adaptive.stats.name, e)
+
+
+def adaptive_pools_enabled() -> bool:
+    return bool(_ADAPTIVE_POOLS)
+
+
+# --- Redis ---
+class InstrumentedBlockingConnectionPool(redis.BlockingConnectionPool):
+    """
+    Pool de Redis con tope de conexiones: al agotarse, las peticiones esperan
+    hasta `timeout` en lugar de fallar, y esa espera queda medida.
+    """
+
+    def __init__(self, *args, pool_stats: PoolStats = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_stats = pool_stats
+
+    async def get_connection(self, *args, **kwargs):
+        if self.pool_stats is None:
+            return await super().get_connection(*args, **kwargs)
+        self.pool_stats.wait_started()
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            conn = await super().get_connection(*args, **kwargs)
+            ok = True
+            return conn
+        finally:
+            self.pool_stats.wait_finished(time.perf_counter() - t0, ok)
+
+    async def release(self, connection):
+        if self.pool_stats is not None:
+            self.pool_stats.checked_in()
+        await super().release(connection)
+
+    def make_connection(self):
+        if self.pool_stats is not None:
+            self.pool_stats.connection_created()
+        return super().make_connection()
+
+
+# --- MongoDB (pymongo monitoring) ---
+def make_mongo_pool_listener(stats: PoolStats):
+    """
+    Listener CMAP de pymongo que alimenta un PoolStats. pymongo se importa aquí
+    para no adelantar su carga al arranque (el cliente Mongo es perezoso).
+    """
+    from pymongo import monitoring
+
+    class MongoPoolListener(monitoring.ConnectionPoolListener):
+        def connection_check_out_started(self, event):
+            stats.wait_started()
+
+        def connection_checked_out(self, event):
+            stats.wait_finished(getattr(event, "duration", 0.0) or 0.0, True)
+
+        def connection_check_out_failed(self, event):
+            stats.wait_finished(getattr(event, "duration", 0.0) or 0.0, False)
+
+        def connection_checked_in(self, event):
+            stats.checked_in()
+
+        def connection_created(self, event):
+            stats.connection_created()
+
+        def connection_closed(self, event):
+            stats.connection_closed()
+
+        def connection_ready(self, event):
+            pass
+
+        def pool_created(self, event):
+            pass
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+
+    return MongoPoolListener()
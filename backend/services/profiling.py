@@ -0,0 +1,184 @@
+"""
+Perfilado de CPU por petición (opt-in) con un muestreador de pila.
+
+- Se activa por petición con la cabecera "X-Profile: 1" + X-Admin-Token válido,
+  o para una fracción PROFILE_SAMPLE_RATE (0..1) del tráfico.
+- Mientras dura la petición, un hilo toma cada PROFILE_INTERVAL_MS la pila de la
+  tarea asyncio que la atiende: si está en CPU, la pila real del hilo del event
+  loop; si está suspendida, su cadena de awaits terminada en "(await)" (tiempo
+  esperando a MySQL, Redis o al threadpool).
+- Salida en PROFILE_DIR: <nombre>.folded (formato "pila;plegada N" de
+  flamegraph.pl / speedscope) y <nombre>.json con ruta, estado, duración y worker.
+  Con la cabecera, la respuesta indica el nombre en X-Profile-File.
+Sin ADMIN_TOKEN ni PROFILE_SAMPLE_RATE el middleware no se instala: coste cero.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+from backend.services.admin import ADMIN_TOKEN_HEADER, admin_enabled, is_admin_token
+from backend.services.logs import get_logger
+from backend.services.request_context import is_stream
+from backend.services.workers import WORKER_ID
+
+log = get_logger("profile")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/sislab-profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Peticiones perfiladas a la vez por proceso (cada una usa un hilo muestreador)
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "4"))
+
+PROFILE_HEADER = b"x-profile"
+_ADMIN_HEADER = ADMIN_TOKEN_HEADER.encode()
+
+_active = 0
+
+
+def profiling_enabled() -> bool:
+    return admin_enabled() or PROFILE_SAMPLE_RATE > 0
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> List:
+    """Frames de la cadena coroutine → cr_await → ... (de la raíz a la hoja)"""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, task: asyncio.Task, thread_id: int):
+        super().__init__(name="request-profiler", daemon=True)
+        self.task = task
+        self.thread_id = thread_id
+        self.counts: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(PROFILE_INTERVAL_MS / 1000):
+            try:
+                stack = self._sample()
+            except Exception:
+                continue
+            if stack:
+                self.counts[stack] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def _sample(self) -> Optional[str]:
+        chain = _await_chain(self.task.get_coro())
+        if not chain:
+            return None
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(frame)
+            frame = frame.f_back
+        stack.reverse()
+        # ¿La tarea está en CPU? Su frame raíz está en la pila del hilo del event loop
+        root = chain[0]
+        for n, frame in enumerate(stack):
+            if frame is root:
+                return ";".join(_frame_name(f) for f in stack[n:])
+        return ";".join(_frame_name(f) for f in chain) + ";(await)"
+
+
+def _trigger(scope) -> Optional[str]:
+    headers = dict(scope.get("headers") or [])
+    if PROFILE_HEADER in headers and is_admin_token(headers.get(_ADMIN_HEADER)):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _profile_name(scope, route: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+    worker = WORKER_ID.replace(":", "_")
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{worker}-{scope['method']}-{slug}"
+
+
+def _write_profile(name: str, counts: Counter, meta: dict) -> None:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{name}.folded"), "w") as fh:
+        for stack, count in counts.most_common():
+            fh.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, f"{name}.json"), "w") as fh:
+        json.dump(meta, fh, indent=2)
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI puro: la petición corre en la misma tarea que se muestrea"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http" or _active >= PROFILE_MAX_CONCURRENT or is_stream(scope):
+            return await self.app(scope, receive, send)
+        trigger = _trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        info = {"status": None, "name": None}
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", scope["path"])
+                info.update(status=message["status"], route=route, name=_profile_name(scope, route))
+                if trigger == "header":
+                    message = {**message, "headers": [
+                        *message.get("headers", []), (b"x-profile-file", info["name"].encode())
+                    ]}
+            await send(message)
+
+        sampler = _Sampler(asyncio.current_task(), threading.get_ident())
+        _active += 1
+        t0 = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            sampler.stop()
+            _active -= 1
+            duration_ms = round((time.perf_counter() - t0) * 1000, 2)
+            route = info.get("route") or scope["path"]
+            meta = {
+                "route": route,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode(errors="replace"),
+                "status": info["status"],
+                "duration_ms": duration_ms,
+                "samples": sum(sampler.counts.values()),
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "trigger": trigger,
+                "worker": WORKER_ID,
+                "started_at": time.time() - duration_ms / 1000,
+            }
+            name = info["name"] or _profile_name(scope, route)
+            try:
+                await asyncio.to_thread(_write_profile, name, sampler.counts, meta)
+            except Exception as e:
+                log.warning("⚠️ [PROFILE] No se pudo guardar el perfil %s: %s", name, e)
@@ -0,0 +1,192 @@
+"""
+Instrumentación de consultas SQL (eventos before/after_cursor_execute de cada engine MySQL).
+
+- Cada sentencia se atribuye al ámbito actual (contextvar): la ruta de la
+  petición HTTP ("GET /laboratories/items") o la fase del servicio de
+  sincronización (query_scope("sync:deletes")). asyncio.to_thread y el
+  threadpool de FastAPI copian el contexto, así las sesiones síncronas
+  también cuentan para su petición.
+- Sentencias de más de SLOW_QUERY_MS se registran con los parámetros ocultos.
+- Posible N+1: un ámbito que repite la misma sentencia (normalizada) al menos
+  N_PLUS_ONE_THRESHOLD veces se marca y se avisa, salvo que se abra con
+  check_repeats=False porque la repetición es inevitable.
+- Totales por ámbito (peticiones, sentencias, tiempo, N+1) en /system/queries.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+
+from backend.services.logs import get_logger
+from backend.services.request_context import is_stream
+
+log = get_logger("sql")
+
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS", "1") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+
+class QueryScope:
+    """Sentencias de una petición o fase del sync."""
+
+    __slots__ = ("name", "count", "total_ms", "statements", "check_repeats")
+
+    def __init__(self, name: str, check_repeats: bool = True):
+        self.name = name
+        self.check_repeats = check_repeats
+        self.count = 0
+        self.total_ms = 0.0
+        self.statements: Counter = Counter()
+
+
+_current: ContextVar[Optional[QueryScope]] = ContextVar("query_scope", default=None)
+
+_lock = threading.Lock()
+# ámbito → totales acumulados
+_totals: Dict[str, Dict[str, Any]] = {}
+
+# "IN (?, ?, ?)" / "VALUES (%s, %s), (%s, %s)" → una sola forma
+_PARAM_LIST = re.compile(r"(%s|\?|%\(\w+\)s)(\s*,\s*(%s|\?|%\(\w+\)s))+")
+_VALUES_ROWS = re.compile(r"(\([^()]*\))(\s*,\s*\([^()]*\))+")
+_SPACES = re.compile(r"\s+")
+
+
+def _normalize(statement: str) -> str:
+    statement = _SPACES.sub(" ", statement).strip()
+    statement = _PARAM_LIST.sub("?…", statement)
+    return _VALUES_ROWS.sub(r"\1…", statement)
+
+
+def _redact(parameters, executemany: bool) -> str:
+    """Sólo forma y tipos de los parámetros, nunca los valores"""
+    if executemany:
+        return f"<{len(parameters)} filas>"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        return "(" + ", ".join(type(v).__name__ for v in parameters) + ")"
+    return "<?>"
+
+
+def _record(name: str, count: int, total_ms: float, repeated: int) -> None:
+    with _lock:
+        totals = _totals.setdefault(name, {
+            "scopes": 0, "queries": 0, "query_ms": 0.0, "max_queries": 0, "max_query_ms": 0.0, "n_plus_one": 0,
+        })
+        totals["scopes"] += 1
+        totals["queries"] += count
+        totals["query_ms"] += total_ms
+        totals["max_queries"] = max(totals["max_queries"], count)
+        totals["max_query_ms"] = max(totals["max_query_ms"], total_ms)
+        if repeated:
+            totals["n_plus_one"] += 1
+
+
+def open_scope(name: str, check_repeats: bool = True):
+    """Abre un ámbito; devuelve el token para close_scope"""
+    return _current.set(QueryScope(name, check_repeats))
+
+
+def close_scope(token, name: Optional[str] = None) -> Optional[QueryScope]:
+    """Cierra el ámbito (name permite renombrarlo, p. ej. con la ruta ya resuelta) y acumula sus totales"""
+    scope = _current.get()
+    _current.reset(token)
+    if scope is None:
+        return None
+    if name:
+        scope.name = name
+    repeated = 0
+    if scope.statements and scope.check_repeats:
+        statement, repeated = scope.statements.most_common(1)[0]
+        if repeated >= N_PLUS_ONE_THRESHOLD:
+            log.warning("⚠️ [SQL] Posible N+1 en %s: %s× %s", scope.name, repeated, statement[:200],
+                        extra={"store": "mysql", "dedup_key": (scope.name, statement)})
+        else:
+            repeated = 0
+    _record(scope.name, scope.count, scope.total_ms, repeated)
+    return scope
+
+
+@contextmanager
+def query_scope(name: str, check_repeats: bool = True):
+    """Atribuye a `name` las sentencias ejecutadas dentro del bloque (fases del sync)"""
+    if not QUERY_STATS_ENABLED:
+        yield
+        return
+    token = open_scope(name, check_repeats)
+    try:
+        yield
+    finally:
+        close_scope(token)
+
+
+def instrument_queries(engine) -> None:
+    """Registra los eventos de ejecución de sentencias del engine."""
+    if not QUERY_STATS_ENABLED:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        scope = _current.get()
+        if scope is not None:
+            scope.count += 1
+            scope.total_ms += elapsed_ms
+            scope.statements[_normalize(statement)] += 1
+        if elapsed_ms >= SLOW_QUERY_MS:
+            where = scope.name if scope is not None else "-"
+            statement = _SPACES.sub(" ", statement).strip()
+            log.warning(
+                "🐢 [SQL] %.1f ms en %s: %s params=%s", elapsed_ms, where, statement[:500],
+                _redact(parameters, executemany),
+                extra={"store": "mysql", "duration_ms": round(elapsed_ms, 1), "dedup_key": _normalize(statement)},
+            )
+
+
+class QueryStatsMiddleware:
+    """Middleware ASGI: un ámbito por petición HTTP, nombrado con su ruta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or is_stream(scope):
+            return await self.app(scope, receive, send)
+        token = open_scope(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", None) or "(sin ruta)"
+            close_scope(token, f"{scope['method']} {route}")
+
+
+def get_query_stats() -> Dict[str, Any]:
+    with _lock:
+        scopes = {
+            name: {
+                **totals,
+                "query_ms": round(totals["query_ms"], 1),
+                "max_query_ms": round(totals["max_query_ms"], 1),
+                "avg_queries": round(totals["queries"] / totals["scopes"], 2),
+                "avg_query_ms": round(totals["query_ms"] / totals["scopes"], 2),
+            }
+            for name, totals in _totals.items()
+        }
+    return {
+        "enabled": QUERY_STATS_ENABLED,
+        "slow_query_ms": SLOW_QUERY_MS,
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "scopes": dict(sorted(scopes.items(), key=lambda kv: -kv[1]["query_ms"])),
+    }
@@ -0,0 +1,26 @@
+"""
+Límites del contexto de una petición.
+
+- Las rutas de streaming (SSE) mantienen la conexión abierta minutos u horas:
+  los middlewares que miden "una petición" (perfilado, sentencias SQL,
+  trazas) las dejan pasar sin abrir su ámbito.
+- Las tareas que sobreviven a la petición que las lanza (lectores de Redis
+  de los streams, cargas compartidas de singleflight) se crean con un
+  contexto vacío: si no, heredarían la ruta, el ámbito SQL y la traza de esa
+  primera petición y seguirían anotando en ellos.
+"""
+
+import asyncio
+import contextvars
+
+# Server-Sent Events: estado del clúster y feed de cambios del inventario
+STREAM_PATHS = {"/system/stream", "/laboratories/items/changes"}
+
+
+def is_stream(scope) -> bool:
+    return scope["path"] in STREAM_PATHS
+
+
+def create_detached_task(coro) -> asyncio.Task:
+    """create_task sin los contextvars de la petición actual (la tarea copia el contexto al crearse)"""
+    return contextvars.Context().run(asyncio.ensure_future, coro)
@@ -0,0 +1,100 @@
+"""
+Agrupación de lecturas concurrentes idénticas (singleflight) dentro del proceso.
+
+coalesce(clave, fn): si ya hay una llamada en curso con esa clave, se espera su
+resultado en vez de repetir la consulta a MySQL, Mongo o Redis. Con una ventana
+de microcaché (SINGLEFLIGHT_CACHE_MS o cache_ms por llamada) el resultado se
+reutiliza además durante unos milisegundos: la carga sobre los almacenes queda
+acotada por el número de claves distintas, no por el de clientes concurrentes.
+
+Las claves son cadenas o tuplas cuyo primer elemento es el espacio de nombres
+que usa forget(). La llamada corre en su propia tarea: si el cliente que la
+inició se desconecta, los demás siguen esperando el mismo resultado. Conviene
+que `fn` devuelva el cuerpo ya codificado (bytes) para que tampoco se repita
+la serialización. La tarea no hereda el contexto de quien la inicia (traza,
+ámbito SQL): sus consultas no se atribuyen a ninguna petición concreta.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from backend.services.request_context import create_detached_task
+
+SINGLEFLIGHT_CACHE_MS = int(os.getenv("SINGLEFLIGHT_CACHE_MS", "0"))
+# Con más entradas se purgan las caducadas
+_CACHE_PRUNE_AT = 256
+
+_inflight: Dict[Hashable, asyncio.Task] = {}
+# clave → (caduca en, resultado)
+_recent: Dict[Hashable, Tuple[float, Any]] = {}
+_stats = {"calls": 0, "loads": 0, "shared": 0, "cached": 0}
+
+
+async def _load(key: Hashable, fn: Callable[[], Awaitable[Any]], cache_ms: int) -> Any:
+    value = await fn()
+    # Si hubo un forget() durante la carga el resultado puede ser anterior a la escritura
+    if cache_ms > 0 and _inflight.get(key) is asyncio.current_task():
+        if len(_recent) >= _CACHE_PRUNE_AT:
+            now = time.monotonic()
+            for stale in [k for k, (expires, _) in _recent.items() if expires <= now]:
+                del _recent[stale]
+        _recent[key] = (time.monotonic() + cache_ms / 1000, value)
+    return value
+
+
+def _done(key: Hashable, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # Evita el aviso "exception was never retrieved" si todos los que esperaban se fueron
+    if not task.cancelled():
+        task.exception()
+
+
+async def coalesce(key: Hashable, fn: Callable[[], Awaitable[Any]], cache_ms: int = None) -> Any:
+    """Resultado de `fn()` compartido entre las llamadas concurrentes con la misma clave"""
+    cache_ms = SINGLEFLIGHT_CACHE_MS if cache_ms is None else cache_ms
+    _stats["calls"] += 1
+    if cache_ms > 0:
+        hit = _recent.get(key)
+        if hit is not None and hit[0] > time.monotonic():
+            _stats["cached"] += 1
+            return hit[1]
+
+    task = _inflight.get(key)
+    if task is None:
+        _stats["loads"] += 1
+        task = create_detached_task(_load(key, fn, cache_ms))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _done(key, t))
+    else:
+        _stats["shared"] += 1
+    return await asyncio.shield(task)
+
+
+def _in_namespace(key: Hashable, namespace: str) -> bool:
+    return key == namespace or (isinstance(key, tuple) and key[0] == namespace)
+
+
+def forget(namespace: str) -> None:
+    """
+    Tras una escritura: descarta de la microcaché la clave `namespace` y las
+    tuplas (namespace, ...), y las lecturas que lleguen después ya no se unen a
+    cargas empezadas antes (read-your-writes). Sólo afecta a este proceso: en los
+    demás workers el resultado viejo dura como mucho la ventana de microcaché.
+    """
+    for key in [k for k in _recent if _in_namespace(k, namespace)]:
+        del _recent[key]
+    for key in [k for k in _inflight if _in_namespace(k, namespace)]:
+        del _inflight[key]
+
+
+def get_singleflight_stats() -> Dict[str, Any]:
+    calls = _stats["calls"]
+    return {
+        **_stats,
+        "cache_ms": SINGLEFLIGHT_CACHE_MS,
+        "inflight": len(_inflight),
+        "saved_ratio": round((_stats["shared"] + _stats["cached"]) / calls, 3) if calls else 0.0,
+    }
@@ -0,0 +1,164 @@
+"""
+Stream SSE del estado del clúster (reemplaza el polling del dashboard).
+
+- Publicador: en cada intervalo sólo UNA réplica del clúster (la que tiene el lock
+  system:status:publisher) calcula el snapshot y lo publica ya formateado como
+  evento SSE en el canal system:status:events. Si nadie está suscrito no calcula nada.
+- Difusión: cada proceso mantiene UNA suscripción Redis mientras tenga clientes
+  y reparte los eventos a sus conexiones SSE en memoria, así el número de
+  pestañas abiertas no multiplica la carga sobre el backend ni sobre Redis.
+- system:status:last guarda el último evento de cada tipo para que un cliente
+  nuevo pinte la pantalla sin esperar al siguiente intervalo.
+
+Eventos: "status" (instancias y tráfico, cada STATUS_STREAM_INTERVAL_MS) y
+"health" (salud + estado de sincronización, cada STATUS_STREAM_HEALTH_EVERY_S).
+"""
+
+import asyncio
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from backend.database import redis_raw_client
+from backend.services import codec
+from backend.services.logs import get_logger
+from backend.services.request_context import create_detached_task
+
+log = get_logger("stream")
+
+STATUS_STREAM_INTERVAL_MS = int(os.getenv("STATUS_STREAM_INTERVAL_MS", "800"))
+STATUS_STREAM_HEALTH_EVERY_S = float(os.getenv("STATUS_STREAM_HEALTH_EVERY_S", "5"))
+STATUS_STREAM_KEEPALIVE_S = float(os.getenv("STATUS_STREAM_KEEPALIVE_S", "15"))
+# Eventos en cola por cliente lento antes de descartar los más viejos
+STATUS_STREAM_CLIENT_QUEUE = 8
+
+REDIS_STATUS_CHANNEL = "system:status:events"
+REDIS_STATUS_LAST = "system:status:last"
+REDIS_STATUS_PUBLISHER = "system:status:publisher"
+
+_PUBLISHER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Colas de los clientes SSE conectados a este proceso
+_clients: Set[asyncio.Queue] = set()
+_listener_task = None
+
+
+def _frame(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + codec.json_dumps(data) + b"\n\n"
+
+
+# --- Publicador (una réplica por intervalo) ---
+async def _hold_publisher_lock() -> bool:
+    ttl_ms = STATUS_STREAM_INTERVAL_MS * 3
+    if await redis_raw_client.set(REDIS_STATUS_PUBLISHER, _PUBLISHER_ID, nx=True, px=ttl_ms):
+        return True
+    if await redis_raw_client.get(REDIS_STATUS_PUBLISHER) != _PUBLISHER_ID.encode():
+        return False
+    await redis_raw_client.pexpire(REDIS_STATUS_PUBLISHER, ttl_ms)
+    return True
+
+
+async def _has_listeners() -> bool:
+    counts = await redis_raw_client.pubsub_numsub(REDIS_STATUS_CHANNEL)
+    return any(n for _, n in counts)
+
+
+async def status_publisher_loop(
+    build_status: Callable[[], Awaitable[Any]],
+    build_health: Callable[[], Awaitable[Any]],
+):
+    """Calcula y publica los snapshots si esta réplica es la publicadora del clúster"""
+    next_health = 0.0
+    while True:
+        try:
+            if await _hold_publisher_lock() and await _has_listeners():
+                frames = {"status": _frame("status", await build_status())}
+                if time.monotonic() >= next_health:
+                    frames["health"] = _frame("health", await build_health())
+                    next_health = time.monotonic() + STATUS_STREAM_HEALTH_EVERY_S
+                async with redis_raw_client.pipeline(transaction=False) as pipe:
+                    for frame in frames.values():
+                        pipe.publish(REDIS_STATUS_CHANNEL, frame)
+                    pipe.hset(REDIS_STATUS_LAST, mapping=frames)
+                    await pipe.execute()
+            else:
+                # Sin oyentes el próximo suscriptor debe recibir health de inmediato
+                next_health = 0.0
+            await asyncio.sleep(STATUS_STREAM_INTERVAL_MS / 1000)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            log.warning("⚠️ [STREAM] Error publicando estado: %s", e)
+            try:
+                await asyncio.sleep(STATUS_STREAM_INTERVAL_MS / 1000)
+            except asyncio.CancelledError:
+                break
+
+
+# --- Difusión dentro del proceso ---
+def _dispatch(frame: bytes) -> None:
+    for queue in list(_clients):
+        if queue.full():
+            # Cliente lento: los snapshots se reemplazan, basta con el más reciente
+            queue.get_nowait()
+        queue.put_nowait(frame)
+
+
+async def _listen():
+    """Una suscripción Redis por proceso, activa mientras haya clientes SSE"""
+    pubsub = redis_raw_client.pubsub()
+    try:
+        await pubsub.subscribe(REDIS_STATUS_CHANNEL)
+        while _clients:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message and message["type"] == "message":
+                _dispatch(message["data"])
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        log.warning("⚠️ [STREAM] Suscripción Redis perdida: %s", e)
+    finally:
+        try:
+            await pubsub.unsubscribe(REDIS_STATUS_CHANNEL)
+            await pubsub.aclose()
+        except Exception:
+            pass
+
+
+def _ensure_listener() -> None:
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = create_detached_task(_listen())
+
+
+async def stop_listener() -> None:
+    if _listener_task is not None:
+        _listener_task.cancel()
+        await asyncio.gather(_listener_task, return_exceptions=True)
+
+
+async def status_events():
+    """Generador SSE para un cliente: último estado conocido y luego cada evento publicado"""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STATUS_STREAM_CLIENT_QUEUE)
+    _clients.add(queue)
+    _ensure_listener()
+    try:
+        yield b"retry: 3000\n\n"
+        try:
+            last: Dict[bytes, bytes] = await redis_raw_client.hgetall(REDIS_STATUS_LAST)
+        except Exception:
+            last = {}
+        for frame in last.values():
+            yield frame
+        while True:
+            try:
+                frame = await asyncio.wait_for(queue.get(), STATUS_STREAM_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                frame = b": keepalive\n\n"
+            # La suscripción pudo caerse (Redis reiniciado): se recrea
+            _ensure_listener()
+            yield frame
+    finally:
+        _clients.discard(queue)
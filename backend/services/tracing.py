@@ -0,0 +1,291 @@
+"""
+Server-Timing y trazas ligeras por petición (MySQL / Redis / Mongo).
+
+- Cada petición lleva un RequestTrace en un contextvar: ruta → servicio de
+  sincronización → cliente del almacén. asyncio.to_thread, el threadpool de
+  FastAPI y motor copian el contexto, así cuentan también las sesiones
+  síncronas de SQLAlchemy y las operaciones de Mongo.
+- Siempre (SERVER_TIMING=1): tiempo y número de operaciones por almacén en la
+  cabecera Server-Timing, p. ej. `mysql;dur=3.1;desc="2 ops", redis;dur=0.9;desc="4 ops", app;dur=6.2`.
+- Con muestreo (TRACE_SAMPLE_RATE, o traceparent con flag sampled): spans por
+  operación y por función del servicio (@traced) que se añaden a TRACE_FILE en
+  formato OTLP/JSON (una ExportTraceServiceRequest por línea, como el exporter
+  "file" del OpenTelemetry Collector).
+Sin petición trazada cada gancho cuesta una lectura de contextvar.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from backend.services.logs import get_logger
+from backend.services.request_context import is_stream
+from backend.services.workers import HOSTNAME, WORKER_ID
+
+log = get_logger("trace")
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "/tmp/sislab-traces.jsonl")
+# Tope de spans por petición (un vaciado grande no debe crecer sin límite)
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "500"))
+
+STORES = ("mysql", "redis", "mongo")
+
+
+class RequestTrace:
+    __slots__ = ("trace_id", "sampled", "closed", "totals", "spans")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.closed = False
+        # almacén → [ms, operaciones]
+        self.totals: Dict[str, List[float]] = {store: [0.0, 0] for store in STORES}
+        self.spans: List[Dict[str, Any]] = []
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+_parent_span: ContextVar[Optional[str]] = ContextVar("trace_parent_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    return SERVER_TIMING or TRACE_SAMPLE_RATE > 0
+
+
+def _new_id(n_bytes: int) -> str:
+    return os.urandom(n_bytes).hex()
+
+
+def _attributes(attrs: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for key, value in attrs.items():
+        if isinstance(value, bool):
+            out.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            out.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            out.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            out.append({"key": key, "value": {"stringValue": str(value)}})
+    return out
+
+
+def _add_span(trace: RequestTrace, name: str, start_ns: int, end_ns: int, span_id: str = None,
+              parent_id: str = None, kind: int = 3, attrs: Dict[str, Any] = None, force: bool = False) -> None:
+    if len(trace.spans) >= TRACE_MAX_SPANS and not force:
+        return
+    span = {
+        "traceId": trace.trace_id,
+        "spanId": span_id or _new_id(8),
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _attributes(attrs or {}),
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    trace.spans.append(span)
+
+
+def record(store: str, operation: str, start_ns: int, end_ns: int) -> None:
+    """Anota una operación de un almacén en la traza de la petición actual (si la hay)"""
+    trace = _trace.get()
+    if trace is None or trace.closed:
+        return
+    totals = trace.totals[store]
+    totals[0] += (end_ns - start_ns) / 1e6
+    totals[1] += 1
+    if trace.sampled:
+        # kind 3 = CLIENT
+        _add_span(trace, f"{store} {operation}", start_ns, end_ns, parent_id=_parent_span.get(),
+                  attrs={"db.system": store, "db.operation": operation})
+
+
+def traced(name: str):
+    """Decorador para funciones async del servicio: un span (INTERNAL) si la petición está muestreada"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            trace = _trace.get()
+            if trace is None or not trace.sampled or trace.closed:
+                return await fn(*args, **kwargs)
+            span_id = _new_id(8)
+            parent_id = _parent_span.get()
+            token = _parent_span.set(span_id)
+            start_ns = time.time_ns()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _parent_span.reset(token)
+                _add_span(trace, name, start_ns, time.time_ns(), span_id, parent_id, kind=1)
+        return wrapper
+    return decorator
+
+
+# --- Ganchos de los almacenes ---
+def instrument_engine_tracing(engine) -> None:
+    """Eventos de ejecución de sentencias del engine → operaciones "mysql"."""
+    if not tracing_enabled():
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _trace.get() is not None:
+            conn.info.setdefault("trace_start", []).append(time.time_ns())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("trace_start")
+        if _trace.get() is not None and starts:
+            record("mysql", statement.lstrip().split(None, 1)[0].upper(), starts.pop(), time.time_ns())
+
+
+def traced_redis_class(base):
+    """Subclase del cliente Redis que anota cada comando y cada pipeline."""
+    from redis.asyncio.client import Pipeline
+
+    class TracedPipeline(Pipeline):
+        async def execute(self, raise_on_error: bool = True):
+            if _trace.get() is None:
+                return await super().execute(raise_on_error)
+            operation = f"PIPELINE[{len(self.command_stack)}]"
+            start_ns = time.time_ns()
+            try:
+                return await super().execute(raise_on_error)
+            finally:
+                record("redis", operation, start_ns, time.time_ns())
+
+    class TracedRedis(base):
+        async def execute_command(self, *args, **options):
+            if _trace.get() is None:
+                return await super().execute_command(*args, **options)
+            start_ns = time.time_ns()
+            try:
+                return await super().execute_command(*args, **options)
+            finally:
+                record("redis", str(args[0]).upper(), start_ns, time.time_ns())
+
+        def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None):
+            return TracedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+    return TracedRedis
+
+
+def make_mongo_trace_listener():
+    """CommandListener de pymongo → operaciones "mongo" (motor copia el contexto a su hilo)."""
+    from pymongo import monitoring
+
+    class _MongoTraceListener(monitoring.CommandListener):
+        def started(self, event):
+            pass
+
+        def succeeded(self, event):
+            self._record(event)
+
+        def failed(self, event):
+            self._record(event)
+
+        def _record(self, event):
+            if _trace.get() is None:
+                return
+            end_ns = time.time_ns()
+            record("mongo", event.command_name, end_ns - event.duration_micros * 1000, end_ns)
+
+    return _MongoTraceListener()
+
+
+# --- Middleware ---
+def _parse_traceparent(value: Optional[bytes]):
+    """W3C traceparent "00-<trace_id>-<span_id>-<flags>" → (trace_id, span_id, sampled)"""
+    if not value:
+        return None, None, False
+    parts = value.decode(errors="ignore").split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None, False
+    try:
+        return parts[1], parts[2], bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None, None, False
+
+
+def server_timing(trace: RequestTrace, total_ms: float) -> str:
+    entries = [
+        f'{store};dur={ms:.1f};desc="{int(count)} ops"'
+        for store, (ms, count) in trace.totals.items() if count
+    ]
+    entries.append(f"app;dur={total_ms:.1f}")
+    return ", ".join(entries)
+
+
+def _export(trace: RequestTrace) -> None:
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": _attributes({
+            "service.name": "sislab-backend", "host.name": HOSTNAME, "service.instance.id": WORKER_ID,
+        })},
+        "scopeSpans": [{"scope": {"name": "backend.services.tracing"}, "spans": trace.spans}],
+    }]}
+    with open(TRACE_FILE, "a") as fh:
+        fh.write(json.dumps(payload, separators=(",", ":")) + "\n")
+
+
+class TracingMiddleware:
+    """Middleware ASGI: abre la traza de la petición, añade Server-Timing y exporta si está muestreada"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Los streams SSE viven minutos: su traza nunca se cerraría a tiempo
+        if scope["type"] != "http" or is_stream(scope):
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        trace_id, remote_parent, remote_sampled = _parse_traceparent(headers.get(b"traceparent"))
+        sampled = remote_sampled or (TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE)
+        trace = RequestTrace(trace_id or _new_id(16), sampled)
+        root_id = _new_id(8)
+        trace_token = _trace.set(trace)
+        parent_token = _parent_span.set(root_id)
+        start_ns = time.time_ns()
+        status = {"code": None}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if SERVER_TIMING:
+                    total_ms = (time.time_ns() - start_ns) / 1e6
+                    message = {**message, "headers": [
+                        *message.get("headers", []),
+                        (b"server-timing", server_timing(trace, total_ms).encode()),
+                        (b"timing-allow-origin", b"*"),
+                    ]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            trace.closed = True
+            _parent_span.reset(parent_token)
+            _trace.reset(trace_token)
+            if trace.sampled:
+                route = getattr(scope.get("route"), "path", None) or scope["path"]
+                attrs = {"http.method": scope["method"], "http.route": route, "http.target": scope["path"],
+                         "http.status_code": status["code"] or 0}
+                for store, (ms, count) in trace.totals.items():
+                    attrs[f"sislab.{store}.ms"] = round(ms, 3)
+                    attrs[f"sislab.{store}.ops"] = int(count)
+                # kind 2 = SERVER; el span raíz va siempre aunque se haya alcanzado el tope
+                _add_span(trace, f"{scope['method']} {route}", start_ns, time.time_ns(), root_id,
+                          remote_parent, kind=2, attrs=attrs, force=True)
+                try:
+                    await asyncio.to_thread(_export, trace)
+                except Exception as e:
+                    log.warning("⚠️ [TRACE] No se pudo exportar la traza: %s", e)
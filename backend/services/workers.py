@@ -0,0 +1,157 @@
+"""
+Identidad y coordinación de los workers de uvicorn dentro de un contenedor
+(WEB_CONCURRENCY procesos, ver backend/Dockerfile).
+
+- Identidad: cada worker reserva la primera ranura libre (lock fcntl sobre
+  WORKER_STATE_DIR/slot-N.lock) y se identifica como "<hostname>:w<N>". La ranura
+  es estable: un worker que se reinicia recupera la misma y reutiliza su
+  contador de peticiones en vez de dejar claves huérfanas.
+- Líder: el worker que tiene WORKER_STATE_DIR/leader.lock hace el trabajo de
+  arranque (esquema, migración legacy, puesta al día) y corre las tareas que
+  deben ser únicas por contenedor (loop de sincronización, volcado write-behind).
+  Si el líder muere el kernel libera el lock y otro worker lo toma.
+- El trabajo de arranque se marca hecho para el arranque actual del contenedor
+  (startup.done, ligado al supervisor de uvicorn), así un líder que lo releva
+  no lo repite y los demás workers esperan a que termine antes de atender.
+Sin fcntl (p. ej. desarrollo en Windows) el proceso es siempre worker 0 y líder.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - sólo Linux/macOS tienen fcntl
+    fcntl = None
+
+WORKER_STATE_DIR = os.getenv("WORKER_STATE_DIR", "/tmp/sislab-workers")
+WORKER_LEADER_RETRY_S = float(os.getenv("WORKER_LEADER_RETRY_S", "2"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+HOSTNAME = socket.gethostname()
+
+# Sin get_logger: logs.py depende de la identidad del worker. Los avisos previos a
+# setup_logging() salen por el handler de último recurso de logging (stderr).
+log = logging.getLogger("sislab.workers")
+
+# Los descriptores se mantienen abiertos toda la vida del proceso: cerrarlos suelta el lock
+_slot_file = None
+_leader_file = None
+
+
+def _try_lock(path: str):
+    fh = open(path, "a+")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fh
+    except OSError:
+        fh.close()
+        return None
+
+
+def _claim_slot() -> int:
+    global _slot_file
+    if fcntl is None:
+        return 0
+    try:
+        os.makedirs(WORKER_STATE_DIR, exist_ok=True)
+        slot = 0
+        while True:
+            _slot_file = _try_lock(os.path.join(WORKER_STATE_DIR, f"slot-{slot}.lock"))
+            if _slot_file is not None:
+                return slot
+            slot += 1
+    except OSError as e:
+        log.warning("⚠️ [WORKERS] Sin ranura de worker (%s), se usa el pid", e)
+        return os.getpid()
+
+
+WORKER_SLOT = _claim_slot()
+WORKER_ID = f"{HOSTNAME}:w{WORKER_SLOT}"
+
+
+def try_become_leader() -> bool:
+    """Intenta tomar el liderazgo del contenedor (no bloquea). True si este worker es el líder."""
+    global _leader_file
+    if _leader_file is not None or fcntl is None:
+        return True
+    try:
+        os.makedirs(WORKER_STATE_DIR, exist_ok=True)
+        _leader_file = _try_lock(os.path.join(WORKER_STATE_DIR, "leader.lock"))
+    except OSError as e:
+        log.warning("⚠️ [WORKERS] No se pudo usar el lock de líder: %s", e)
+        return WORKER_SLOT == 0
+    return _leader_file is not None
+
+
+def is_leader() -> bool:
+    return _leader_file is not None or fcntl is None
+
+
+def _container_boot_id() -> str:
+    """Identifica el arranque actual: pid del supervisor de uvicorn (padre común de los workers) y su hora de inicio"""
+    ppid = os.getppid()
+    try:
+        with open(f"/proc/{ppid}/stat") as fh:
+            started = fh.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        started = ""
+    return f"{ppid}:{started}"
+
+
+def _startup_marker() -> str:
+    return os.path.join(WORKER_STATE_DIR, "startup.done")
+
+
+def startup_done() -> bool:
+    """True si otro worker ya hizo el trabajo de arranque en este arranque del contenedor"""
+    # Con un solo proceso no hay supervisor común ni relevo posible: siempre se arranca
+    if fcntl is None or WEB_CONCURRENCY <= 1:
+        return False
+    try:
+        with open(_startup_marker()) as fh:
+            return fh.read() == _container_boot_id()
+    except OSError:
+        return False
+
+
+def mark_startup_done() -> None:
+    if fcntl is None or WEB_CONCURRENCY <= 1:
+        return
+    try:
+        with open(_startup_marker(), "w") as fh:
+            fh.write(_container_boot_id())
+    except OSError as e:
+        log.warning("⚠️ [WORKERS] No se pudo marcar el arranque: %s", e)
+
+
+async def wait_for_startup(timeout: float) -> bool:
+    """Espera (como mucho `timeout` s) a que el líder termine el trabajo de arranque"""
+    deadline = time.monotonic() + timeout
+    while not startup_done():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.2)
+    return True
+
+
+def get_worker_info() -> dict:
+    return {
+        "worker": WORKER_ID,
+        "slot": WORKER_SLOT,
+        "pid": os.getpid(),
+        "leader": is_leader(),
+        "workers": WEB_CONCURRENCY,
+    }
+
+
+def release_locks() -> None:
+    """Suelta los locks al apagar para que otro worker tome el relevo sin esperar"""
+    global _leader_file, _slot_file
+    for fh in (_leader_file, _slot_file):
+        if fh is not None:
+            fh.close()
+    _leader_file = _slot_file = None
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: lectura masiva de items (ORM vs Core)
+
+Compara el coste por fila de leer la tabla completa de items:
+- orm:  db.query(ItemModel).all() + copia a dict con getattr (ruta anterior)
+- core: SELECT Core precompilado → dicts (fetch_all_items, ruta actual)
+Ambas rutas incluyen la codificación JSON de la respuesta (codec.json_dumps).
+
+Por defecto usa un SQLite temporal; con --mysql-url se mide contra MySQL real
+(la tabla items se vacía y se siembra, usar una base de pruebas).
+Uso:
+    python bench_item_reads.py --rows 1000,10000,50000 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de lectura masiva de items (ORM vs Core)")
+    parser.add_argument("--rows", default="1000,10000,50000",
+                        help="Tamaños de tabla separados por coma (default: 1000,10000,50000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por ruta (se reporta la mediana)")
+    parser.add_argument("--mysql-url", default=None,
+                        help="URL de MySQL de pruebas. Si se omite se usa un SQLite temporal")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+# La configuración de backend.database se lee al importar: hay que fijarla ANTES
+_tmp_dir = tempfile.mkdtemp(prefix="bench_item_reads_")
+os.environ["MYSQL_URL"] = ARGS.mysql_url or f"sqlite:///{os.path.join(_tmp_dir, 'items.db')}"
+
+from backend.database import Base, SessionLocal, mysql_engine  # noqa: E402
+from backend.models.inventory import ItemModel  # noqa: E402
+from backend.services.codec import json_dumps  # noqa: E402
+from backend.services.mysql_redis_sync import fetch_all_items  # noqa: E402
+
+
+def _seed(rows: int) -> None:
+    Base.metadata.create_all(bind=mysql_engine)
+    db = SessionLocal()
+    try:
+        db.query(ItemModel).delete()
+        db.bulk_insert_mappings(ItemModel, [
+            {"code": f"PC-{n:06d}", "type": "Computadora", "status": "Operativa",
+             "area": f"Sala {n % 9 + 1}", "acquisition_date": "2024-01-01"}
+            for n in range(rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def read_orm(db):
+    items = db.query(ItemModel).all()
+    return [
+        {
+            "id": i.id,
+            "code": i.code,
+            "type": i.type,
+            "status": i.status,
+            "area": i.area,
+            "acquisition_date": getattr(i, "acquisition_date", "") or "",
+        }
+        for i in items
+    ]
+
+
+def read_core(db):
+    return fetch_all_items(db)
+
+
+def _measure(reader, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            json_dumps({"source": "MySQL", "data": reader(db)})
+            timings.append(time.perf_counter() - t0)
+        finally:
+            db.close()
+    return statistics.median(timings)
+
+
+def main():
+    print(f"🧪 MySQL: {os.environ['MYSQL_URL']}")
+    print(f"\n{'filas':>8} | {'orm ms':>9} | {'core ms':>9} | {'orm µs/fila':>12} | {'core µs/fila':>12} | {'mejora':>7}")
+    print("-" * 74)
+    for rows in [int(r) for r in ARGS.rows.split(",") if r.strip()]:
+        _seed(rows)
+        # Calentamiento: conexión del pool y caché de sentencias compiladas
+        _measure(read_orm, 1)
+        _measure(read_core, 1)
+        orm = _measure(read_orm, ARGS.repeat)
+        core = _measure(read_core, ARGS.repeat)
+        print(f"{rows:>8} | {orm * 1000:>9.1f} | {core * 1000:>9.1f} | {orm * 1e6 / rows:>12.2f} | "
+              f"{core * 1e6 / rows:>12.2f} | {orm / core:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Recuperación tras caída de MySQL (time-to-consistency)
+
+Este script mide cuánto tarda el sistema en ponerse al día cuando MySQL vuelve:
+1. Siembra la tabla de items y la caché Redis
+2. Simula la caída de MySQL y encola un backlog de N operaciones (creates/updates/deletes)
+   usando las rutas de respaldo REALES de backend/routers/inventory.py
+3. "Levanta" MySQL (un sustituto local SQLite por defecto) y arranca mysql_redis_sync_loop
+4. Reporta throughput de vaciado, tiempo hasta que /sync/status muestra consistencia
+   y pico de memoria, para cada tamaño de backlog
+
+Requiere un Redis real (por defecto la base 15 de localhost para no pisar datos).
+Uso:
+    python bench_recovery.py --backlogs 100,1000,5000 --mix 60:30:10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de recuperación MySQL ↔ Redis")
+    parser.add_argument("--backlogs", default="100,1000,5000",
+                        help="Tamaños de backlog separados por coma (default: 100,1000,5000)")
+    parser.add_argument("--mix", default="60:30:10",
+                        help="Proporción creates:updates:deletes (default: 60:30:10)")
+    parser.add_argument("--seed-items", type=int, default=1000,
+                        help="Items existentes en MySQL antes de la caída (default: 1000)")
+    parser.add_argument("--mysql-url", default=None,
+                        help="URL de MySQL real. Si se omite se usa un SQLite temporal como sustituto")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/15"),
+                        help="URL de Redis (default: redis://localhost:6379/15)")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="Segundos máximos esperando consistencia por escenario")
+    parser.add_argument("--json", dest="json_path", default=None,
+                        help="Guardar resultados en un archivo JSON")
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+# La configuración de backend.database se lee al importar: hay que fijarla ANTES
+_tmp_dir = tempfile.mkdtemp(prefix="bench_recovery_")
+os.environ["MYSQL_URL"] = ARGS.mysql_url or f"sqlite:///{os.path.join(_tmp_dir, 'items.db')}"
+os.environ["REDIS_URL"] = ARGS.redis_url
+
+from fastapi import Request, Response  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from backend import main as backend_main  # noqa: E402
+from backend.database import Base, SessionLocal, mysql_engine, redis_client  # noqa: E402
+from backend.models.inventory import ItemModel  # noqa: E402
+from backend.routers import inventory  # noqa: E402
+from backend.schemas.inventory import ItemCreate  # noqa: E402
+from backend.services import mysql_redis_sync as sync  # noqa: E402
+from backend.services.item_changes import ITEM_CHANGES_STREAM  # noqa: E402
+
+SYNC_KEYS = [
+    sync.REDIS_ITEMS_CACHE,
+    sync.REDIS_ITEMS_HASH,
+    sync.REDIS_PENDING_ITEMS,
+    sync.REDIS_PENDING_UPDATES,
+    sync.REDIS_PENDING_DELETES,
+    sync.REDIS_SYNC_METADATA,
+    sync.REDIS_PENDING_OVERRIDES,
+    # Estado mantenido que lee /sync/status: un verify_ok del escenario anterior
+    # daría la consistencia por buena antes de verificar el nuevo vaciado
+    sync.REDIS_SYNC_STATE,
+    sync.REDIS_ITEMS_BODY,
+    ITEM_CHANGES_STREAM,
+]
+
+
+class SesionMySQLCaida:
+    """Sustituto de Session que falla como lo haría un MySQL caído."""
+
+    def _caido(self, *args, **kwargs):
+        raise OperationalError("SELECT 1", {}, ConnectionRefusedError("MySQL caído (simulado)"))
+
+    query = add = commit = refresh = delete = execute = get_bind = _caido
+
+    def close(self):
+        pass
+
+
+def _request_sin_if_match(method: str) -> Request:
+    """Petición mínima para las rutas: sin If-Match (escritura incondicional)"""
+    return Request({"type": "http", "method": method, "path": "/laboratories/items", "headers": []})
+
+
+def _random_item(prefix: str, n: int) -> ItemCreate:
+    return ItemCreate(
+        code=f"{prefix}-{n:06d}",
+        type=random.choice(["Computadora", "Proyector", "Impresora"]),
+        status=random.choice(["Operativa", "Mantenimiento", "Baja"]),
+        area=f"Sala {random.randint(1, 9)}",
+        acquisition_date="2024-01-01",
+    )
+
+
+def _reset_mysql(seed_items: int) -> None:
+    Base.metadata.create_all(bind=mysql_engine)
+    db = SessionLocal()
+    try:
+        db.query(ItemModel).delete()
+        db.add_all(ItemModel(**_random_item("SEED", n).model_dump()) for n in range(seed_items))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _reset_redis() -> None:
+    await redis_client.delete(*SYNC_KEYS)
+    await sync.sync_mysql_to_redis()
+
+
+async def _enqueue_backlog(size: int, mix) -> dict:
+    """Encola el backlog pasando por las rutas de respaldo reales de inventory.py."""
+    caida = SesionMySQLCaida()
+    total_weight = sum(mix)
+    n_updates = size * mix[1] // total_weight
+    n_deletes = size * mix[2] // total_weight
+    n_creates = size - n_updates - n_deletes
+
+    existing_ids = [d["id"] for d in await sync.get_items_from_redis() if isinstance(d.get("id"), int)]
+    random.shuffle(existing_ids)
+    delete_ids = existing_ids[:n_deletes]
+    update_pool = existing_ids[n_deletes:] or existing_ids
+
+    ops = ["create"] * n_creates + ["update"] * n_updates + ["delete"] * n_deletes
+    random.shuffle(ops)
+    for n, op in enumerate(ops):
+        if op == "create":
+            await inventory.create_global_item(_random_item("OFF", n), db=caida)
+        elif op == "update":
+            await inventory.update_global_item(
+                str(random.choice(update_pool)), _random_item("UPD", n),
+                _request_sin_if_match("PUT"), Response(), db=caida,
+            )
+        else:
+            await inventory.delete_global_item(str(delete_ids.pop()), _request_sin_if_match("DELETE"), db=caida)
+    return {"creates": n_creates, "updates": n_updates, "deletes": n_deletes}
+
+
+async def _wait_consistent(timeout: float) -> dict:
+    """Sondea el mismo estado que sirve /sync/status hasta que sea consistente y sin pendientes."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        status = await backend_main.sync_status()
+        pending = (status.get("pending_creates", 0) + status.get("pending_updates", 0)
+                   + status.get("pending_deletes", 0))
+        if status.get("is_consistent") and pending == 0:
+            return status
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"Sin consistencia tras {timeout}s")
+
+
+async def run_scenario(size: int, mix) -> dict:
+    _reset_mysql(ARGS.seed_items)
+    await _reset_redis()
+
+    enqueue_start = time.perf_counter()
+    counts = await _enqueue_backlog(size, mix)
+    enqueue_seconds = time.perf_counter() - enqueue_start
+
+    # Medimos el vaciado envolviendo la misma función que invoca el loop
+    drains = []
+    original_full_sync = backend_main.full_sync_on_mysql_recovery
+
+    async def timed_full_sync():
+        t0 = time.perf_counter()
+        result = await original_full_sync()
+        applied = result["deletes_synced"] + result["updates_synced"] + result["creates_synced"]
+        drains.append((time.perf_counter() - t0, applied))
+        return result
+
+    backend_main.full_sync_on_mysql_recovery = timed_full_sync
+    tracemalloc.start()
+    recovered_at = time.perf_counter()  # MySQL "vuelve" en este instante
+    # El loop se detiene entre ciclos: la consistencia puede verse antes de que
+    # termine el ciclo que vació el backlog (verify_ok se escribe dentro), y
+    # cancelarlo cortaría esa sincronización y perdería su medida
+    stop = asyncio.Event()
+    loop_task = asyncio.create_task(backend_main.mysql_redis_sync_loop(stop=stop))
+    try:
+        status = await _wait_consistent(ARGS.timeout)
+        consistent_seconds = time.perf_counter() - recovered_at
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        stop.set()
+        done, _ = await asyncio.wait({loop_task}, timeout=ARGS.timeout)
+        backend_main.full_sync_on_mysql_recovery = original_full_sync
+        if not done:
+            loop_task.cancel()
+            raise TimeoutError(f"El loop de sincronización no terminó su ciclo en {ARGS.timeout}s")
+    loop_task.result()
+
+    drain_seconds, applied = next(((s, a) for s, a in drains if a > 0), (0.0, 0))
+    return {
+        "backlog": size,
+        **counts,
+        "enqueue_s": round(enqueue_seconds, 3),
+        "drain_s": round(drain_seconds, 3),
+        "drain_ops_per_s": round(applied / drain_seconds, 1) if drain_seconds else 0.0,
+        "time_to_consistent_s": round(consistent_seconds, 3),
+        "peak_traced_mb": round(peak_bytes / 1e6, 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "cache_items": status.get("cache_items", 0),
+    }
+
+
+def _print_table(results) -> None:
+    columns = ["backlog", "creates", "updates", "deletes", "drain_s", "drain_ops_per_s",
+               "time_to_consistent_s", "peak_traced_mb", "max_rss_mb"]
+    print("\n" + " | ".join(f"{c:>20}" for c in columns))
+    print("-" * (23 * len(columns)))
+    for row in results:
+        print(" | ".join(f"{row[c]:>20}" for c in columns))
+
+
+async def main():
+    sizes = [int(s) for s in ARGS.backlogs.split(",") if s.strip()]
+    mix = [int(p) for p in ARGS.mix.split(":")]
+    if len(mix) != 3 or sum(mix) <= 0:
+        print("❌ --mix debe tener la forma creates:updates:deletes")
+        sys.exit(1)
+
+    if not await sync.check_redis_available():
+        print(f"❌ Redis no disponible en {ARGS.redis_url}")
+        sys.exit(1)
+
+    print(f"🧪 MySQL sustituto: {os.environ['MYSQL_URL']}")
+    print(f"🧪 Redis: {ARGS.redis_url}")
+    results = []
+    for size in sizes:
+        print(f"\n▶️  Escenario backlog={size} mix={ARGS.mix}")
+        results.append(await run_scenario(size, mix))
+        print(f"✅ {results[-1]}")
+
+    _print_table(results)
+    if ARGS.json_path:
+        with open(ARGS.json_path, "w") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\n💾 Resultados guardados en {ARGS.json_path}")
+
+    await redis_client.delete(*SYNC_KEYS)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
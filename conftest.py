@@ -0,0 +1,9 @@
+"""
+Configuración de pytest: pruebas unitarias de backend/services en tests/.
+
+No necesitan MySQL, Redis ni Mongo (Redis se sustituye por fakeredis donde
+hace falta): pip install pytest fakeredis && python -m pytest
+"""
+
+# Script de integración contra el clúster en marcha (python test_sync.py), no de pytest
+collect_ignore = ["test_sync.py"]
@@ -45,9 +45,11 @@ api.interceptors.response.use(
         // 2. Errores 503 (Service Unavailable)
         // 3. Errores 504 (Gateway Timeout)
         // 4. Errors de conexión
+        // 5. 409 de una escritura cuya original con la misma Idempotency-Key sigue en curso
         const shouldRetry = !error.response || 
                            error.response.status === 503 || 
                            error.response.status === 504 ||
+                           (error.response.status === 409 && config.headers['Idempotency-Key']) ||
                            error.code === 'ECONNABORTED' ||
                            error.message === 'Network Error';
         
@@ -65,6 +67,15 @@ api.interceptors.response.use(
     }
 );
 
+const WRITE_METHODS = ['post', 'put', 'patch', 'delete'];
+
+// crypto.randomUUID sólo existe en contextos seguros (https o localhost)
+const newIdempotencyKey = () => (
+    window.crypto && window.crypto.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`
+);
+
 /**
  * Interceptor de solicitud para agregar headers útiles
  */
@@ -75,6 +86,12 @@ api.interceptors.request.use(
         if (token) {
             config.headers.Authorization = `Bearer ${token}`;
         }
+
+        // Una clave por escritura; los reintentos reutilizan el mismo config y por tanto la clave,
+        // así el backend no aplica dos veces una escritura lenta
+        if (WRITE_METHODS.includes((config.method || 'get').toLowerCase()) && !config.headers['Idempotency-Key']) {
+            config.headers['Idempotency-Key'] = newIdempotencyKey();
+        }
         
         return config;
     },
@@ -0,0 +1,40 @@
+import { API_BASE_URL } from "./axios";
+
+/**
+ * Suscripción compartida al stream SSE /system/stream.
+ * Todos los componentes de la pestaña comparten UNA conexión EventSource;
+ * se abre con el primer suscriptor y se cierra con el último.
+ * El navegador reconecta solo si la conexión se cae.
+ */
+const EVENTS = ["status", "health"];
+const listeners = new Set();
+let source = null;
+
+const notify = (event, data) => {
+  listeners.forEach((listener) => listener(event, data));
+};
+
+const open = () => {
+  source = new EventSource(`${API_BASE_URL}/system/stream`);
+  EVENTS.forEach((event) => {
+    source.addEventListener(event, (e) => notify(event, JSON.parse(e.data)));
+  });
+  source.onopen = () => notify("open", null);
+  source.onerror = () => notify("error", null);
+};
+
+/**
+ * Registra un listener (event, data) => void. Eventos: "status", "health",
+ * "open" y "error". Devuelve la función para cancelar la suscripción.
+ */
+export function subscribeStatus(listener) {
+  listeners.add(listener);
+  if (!source) open();
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && source) {
+      source.close();
+      source = null;
+    }
+  };
+}
@@ -14,7 +14,7 @@ import CheckCircleIcon from "@mui/icons-material/CheckCircle";
 import ErrorIcon from "@mui/icons-material/Error";
 import WarningIcon from "@mui/icons-material/Warning";
 import SyncIcon from "@mui/icons-material/Sync";
-import api from "../api/axios";
+import { subscribeStatus } from "../api/statusStream";
 
 /**
  * Componente que monitorea la salud del sistema:
@@ -28,33 +28,19 @@ function SystemHealthMonitor() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  const fetchSystemStatus = async () => {
-    try {
-      setLoading(true);
-      setError(null);
-
-      // Obtener salud general del sistema
-      const healthRes = await api.get("/health");
-      setHealth(healthRes.data);
-
-      // Obtener estado de sincronización
-      const syncRes = await api.get("/sync/status");
-      setSyncStatus(syncRes.data);
-    } catch (err) {
-      setError(
-        `Error al conectar con el sistema: ${err.message}`
-      );
-      console.error(err);
-    } finally {
-      setLoading(false);
-    }
-  };
-
   useEffect(() => {
-    fetchSystemStatus();
-    // Actualizar cada 10 segundos
-    const interval = setInterval(fetchSystemStatus, 10000);
-    return () => clearInterval(interval);
+    // Salud y sincronización llegan por el stream SSE compartido (/system/stream)
+    return subscribeStatus((event, data) => {
+      if (event === "health") {
+        setHealth(data.health);
+        setSyncStatus(data.sync);
+        setError(null);
+        setLoading(false);
+      } else if (event === "error") {
+        setError("Error al conectar con el sistema: conexión con el stream perdida");
+        setLoading(false);
+      }
+    });
   }, []);
 
   const getStatusColor = (isAvailable) => {
@@ -230,6 +216,7 @@ function SystemHealthMonitor() {
             <Grid item xs={12} sm={4}>
               <Typography variant="caption" color="text.secondary">
                 Operaciones pendientes: <strong>{syncStatus.pending_creates + syncStatus.pending_updates + syncStatus.pending_deletes}</strong>
+                {syncStatus.oldest_pending_age_s != null && ` (hace ${syncStatus.oldest_pending_age_s}s)`}
               </Typography>
             </Grid>
             <Grid item xs={12} sm={4}>
@@ -11,6 +11,7 @@ import EqualizerIcon from '@mui/icons-material/Equalizer';
 import DeleteSweepIcon from '@mui/icons-material/DeleteSweep';
 import StorageOutlinedIcon from '@mui/icons-material/StorageOutlined';
 import api from "../api/axios";
+import { subscribeStatus } from "../api/statusStream";
 import SystemHealthMonitor from "../components/SystemHealthMonitor";
 
 function DashboardPage() {
@@ -28,24 +29,18 @@ function DashboardPage() {
   const [itemCount, setItemCount] = useState(0);
   const stopItemAttackRef = useRef(false);
 
-  // 1. POLLING DE ESTADO
-  const fetchStatus = async () => {
-    try {
-      const res = await api.get("/system/status");
-      setServers(res.data);
-      setError(null);
-    } catch (err) {
-      console.error(err);
-      setError("No hay conexión con el Balanceador");
-    } finally {
-      setLoading(false);
-    }
-  };
-
+  // 1. ESTADO EN VIVO (SSE: un snapshot del clúster empujado por el servidor)
   useEffect(() => {
-    fetchStatus();
-    const interval = setInterval(fetchStatus, 800); 
-    return () => clearInterval(interval);
+    return subscribeStatus((event, data) => {
+      if (event === "status") {
+        setServers(data);
+        setError(null);
+        setLoading(false);
+      } else if (event === "error") {
+        setError("No hay conexión con el Balanceador");
+        setLoading(false);
+      }
+    });
   }, []);
 
   // 2. MOTOR DE SIMULACIÓN
@@ -314,7 +309,7 @@ function DashboardPage() {
                                 <Chip 
                                     key={idx}
                                     icon={<StorageIcon />}
-                                    label={`${srv.port}: ${srv.status}`}
+                                    label={`${srv.port}: ${srv.status}${srv.workers?.length > 1 ? ` (${srv.workers.length} workers)` : ""}`}
                                     color={srv.status === "Online" ? "success" : "error"}
                                     variant="outlined"
                                 />
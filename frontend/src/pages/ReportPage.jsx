@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { 
     Container, Typography, TextField, Button, Paper, Table, TableBody, TableCell, 
     TableHead, TableRow, Chip, Box, Dialog, DialogTitle, DialogContent, DialogActions, 
@@ -8,7 +8,23 @@ import AddCircleIcon from '@mui/icons-material/AddCircle';
 import StorageIcon from '@mui/icons-material/Storage';
 import EditIcon from '@mui/icons-material/Edit'; // <--- AGREGADO
 import DeleteIcon from '@mui/icons-material/Delete'; // <--- AGREGADO
-import api from "../api/axios";
+import api, { API_BASE_URL } from "../api/axios";
+import { subscribeStatus } from "../api/statusStream";
+
+// Aplica un evento del feed /laboratories/items/changes a la lista local
+const applyChange = (items, change) => {
+  switch (change.op) {
+    case "create":
+    case "update":
+      return [...items.filter((i) => i.id !== change.id), change.item];
+    case "delete":
+      return items.filter((i) => i.id !== change.id);
+    case "resolve":
+      return items.map((i) => (i.id === change.temp_id ? { ...i, id: change.id } : i));
+    default:
+      return items;
+  }
+};
 
 function ReportPage() {
   const [items, setItems] = useState([]);
@@ -37,10 +53,32 @@ function ReportPage() {
     }
   };
 
+  const mysqlOnline = useRef(null);
+
   useEffect(() => {
     fetchItems();
-    const interval = setInterval(fetchItems, 5000); 
-    return () => clearInterval(interval);
+
+    // Cambios en vivo (SSE): el navegador reconecta solo y envía Last-Event-ID,
+    // así sólo recibe lo que se perdió en vez de volver a bajar la lista
+    const changes = new EventSource(`${API_BASE_URL}/laboratories/items/changes`);
+    changes.addEventListener("snapshot", (e) => setItems(JSON.parse(e.data).items || []));
+    changes.addEventListener("change", (e) => {
+      const change = JSON.parse(e.data);
+      setItems((current) => applyChange(current, change));
+    });
+
+    // El origen de los datos (MySQL / caché) cambia cuando MySQL cae o vuelve
+    const unsubscribe = subscribeStatus((event, data) => {
+      if (event !== "health") return;
+      const online = Boolean(data.health?.mysql);
+      if (mysqlOnline.current !== null && mysqlOnline.current !== online) fetchItems();
+      mysqlOnline.current = online;
+    });
+
+    return () => {
+      changes.close();
+      unsubscribe();
+    };
   }, []);
 
   // 2. AGREGAR (POST)
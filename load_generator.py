@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Generador de carga HTTP asíncrono (alternativa en Python a load_test.js)
+
+- Dispara una mezcla configurable de endpoints ("/", "/laboratories/items", CRUD de laboratorios)
+  a una tasa objetivo (lazo abierto) con muchas conexiones concurrentes.
+- Registra histogramas de latencia estilo HDR (p50/p95/p99/max). La latencia se mide desde el
+  instante PROGRAMADO de cada petición, así los atascos no esconden la cola (coordinated omission).
+- Cuenta qué backend atendió cada petición a partir del campo "servidor" de la respuesta.
+- Compara lado a lado las estrategias de NGINX: /demo/least, /demo/ip, /demo/uri, /demo/random, /demo/two.
+
+Uso:
+    python load_generator.py --rate 200 --duration 20 --concurrency 100 \\
+        --strategies least,ip,uri,random,two --mix root:70,items:25,labs:5
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import Counter, defaultdict
+
+import aiohttp
+
+API_BASE_URL = "http://localhost:8001"  # NGINX Load Balancer
+STRATEGIES = ["least", "ip", "uri", "random", "two"]
+ENDPOINTS = ["root", "items", "labs"]
+
+
+class LatencyHistogram:
+    """
+    Histograma log-lineal al estilo HDR: cada potencia de 2 (en microsegundos) se divide en
+    SUB_BUCKETS cubetas lineales, lo que da ~1% de error relativo con memoria fija.
+    """
+
+    SUB_BUCKETS = 128
+
+    def __init__(self):
+        self.counts = Counter()
+        self.total = 0
+        self.max_us = 0
+
+    def _index(self, value_us: int):
+        if value_us < self.SUB_BUCKETS:
+            return (0, value_us)
+        exponent = value_us.bit_length() - 7  # 2**7 == SUB_BUCKETS
+        return (exponent, value_us >> exponent)
+
+    @staticmethod
+    def _value(index) -> int:
+        exponent, sub = index
+        return ((sub + 1) << exponent) - 1 if exponent else sub
+
+    def record(self, seconds: float) -> None:
+        value_us = max(0, int(seconds * 1_000_000))
+        self.counts[self._index(value_us)] += 1
+        self.total += 1
+        self.max_us = max(self.max_us, value_us)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts.update(other.counts)
+        self.total += other.total
+        self.max_us = max(self.max_us, other.max_us)
+
+    def percentile(self, p: float) -> float:
+        """Devuelve el percentil p (0-100) en milisegundos."""
+        if not self.total:
+            return 0.0
+        target = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> dict:
+        return {
+            "count": self.total,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "max_ms": round(self.max_us / 1000, 2),
+        }
+
+
+class StrategyStats:
+    """Resultados acumulados de una estrategia de balanceo."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.histograms = defaultdict(LatencyHistogram)
+        self.backends = Counter()
+        self.errors = Counter()
+        self.elapsed = 0.0
+
+    def record(self, endpoint: str, latency: float, status: int, body) -> None:
+        self.histograms[endpoint].record(latency)
+        if status >= 400:
+            self.errors[str(status)] += 1
+        if isinstance(body, dict):
+            server = body.get("servidor") or body.get("servidor_atendiendo")
+            if server:
+                self.backends[server] += 1
+
+    def overall(self) -> LatencyHistogram:
+        total = LatencyHistogram()
+        for hist in self.histograms.values():
+            total.merge(hist)
+        return total
+
+    def to_dict(self) -> dict:
+        overall = self.overall()
+        return {
+            "strategy": self.name,
+            "achieved_rps": round(overall.total / self.elapsed, 1) if self.elapsed else 0.0,
+            "overall": overall.summary(),
+            "endpoints": {name: h.summary() for name, h in sorted(self.histograms.items())},
+            "backends": dict(self.backends.most_common()),
+            "errors": dict(self.errors),
+        }
+
+
+def parse_mix(raw: str):
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition(":")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Endpoint desconocido en --mix: {name} (válidos: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def build_schedule(mix: dict, total: int):
+    """Reparte las operaciones de forma determinista según los pesos (round-robin ponderado)."""
+    weight_sum = sum(mix.values())
+    credits = {name: 0.0 for name in mix}
+    schedule = []
+    for _ in range(total):
+        for name, weight in mix.items():
+            credits[name] += weight / weight_sum
+        chosen = max(credits, key=credits.get)
+        credits[chosen] -= 1
+        schedule.append(chosen)
+    return schedule
+
+
+class LoadGenerator:
+    def __init__(self, session, prefix: str, stats: StrategyStats, timeout: float):
+        self.session = session
+        self.prefix = prefix
+        self.stats = stats
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def _request(self, endpoint: str, method: str, path: str, scheduled: float, data=None):
+        url = f"{self.prefix}{path}"
+        try:
+            async with self.session.request(method, url, json=data, timeout=self.timeout) as resp:
+                try:
+                    body = await resp.json(content_type=None)
+                except (json.JSONDecodeError, aiohttp.ContentTypeError):
+                    body = None
+                self.stats.record(endpoint, time.perf_counter() - scheduled, resp.status, body)
+                return body
+        except asyncio.TimeoutError:
+            self.stats.record(endpoint, time.perf_counter() - scheduled, 599, None)
+            self.stats.errors["timeout"] += 1
+        except aiohttp.ClientError as e:
+            self.stats.record(endpoint, time.perf_counter() - scheduled, 599, None)
+            self.stats.errors[type(e).__name__] += 1
+        return None
+
+    async def run_op(self, endpoint: str, n: int, scheduled: float) -> None:
+        if endpoint == "root":
+            await self._request("GET /", "GET", "/", scheduled)
+        elif endpoint == "items":
+            await self._request("GET /laboratories/items", "GET", "/laboratories/items", scheduled)
+        else:
+            await self._lab_crud(n, scheduled)
+
+    async def _lab_crud(self, n: int, scheduled: float) -> None:
+        """Ciclo completo de un laboratorio: crear → leer → agregar máquina → eliminar."""
+        lab = await self._request("POST /laboratories/", "POST", "/laboratories/", scheduled, {
+            "name": f"LOAD-{n}", "location": "Bloque de carga", "description": "load_generator.py",
+        })
+        if not isinstance(lab, dict) or "id" not in lab:
+            return
+        lab_id = lab["id"]
+        await self._request("GET /laboratories/{id}", "GET", f"/laboratories/{lab_id}", time.perf_counter())
+        await self._request("PUT /laboratories/{id}/add-item", "PUT", f"/laboratories/{lab_id}/add-item",
+                            time.perf_counter(), {"code": f"PC-{n}", "type": "Computadora",
+                                                  "status": "Operativa", "area": "Sala 1"})
+        await self._request("DELETE /laboratories/{id}", "DELETE", f"/laboratories/{lab_id}", time.perf_counter())
+
+
+async def run_strategy(name: str, args, mix: dict) -> StrategyStats:
+    prefix = args.base_url.rstrip("/") + (f"/demo/{name}" if name != "default" else "")
+    stats = StrategyStats(name)
+    total_ops = int(args.rate * args.duration)
+    schedule = build_schedule(mix, total_ops)
+    interval = 1.0 / args.rate
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency, force_close=False)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        generator = LoadGenerator(session, prefix, stats, args.timeout)
+        in_flight = set()
+        start = time.perf_counter()
+        for n, endpoint in enumerate(schedule):
+            scheduled = start + n * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(generator.run_op(endpoint, n, scheduled))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            await asyncio.gather(*in_flight)
+        stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def print_comparison(results) -> None:
+    print(f"\n{'estrategia':>10} | {'rps':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'max ms':>8} | {'errores':>7} | backends")
+    print("-" * 110)
+    for stats in results:
+        row = stats.to_dict()
+        overall = row["overall"]
+        total = sum(stats.backends.values()) or 1
+        spread = ", ".join(f"{host}={count * 100 / total:.0f}%" for host, count in stats.backends.most_common())
+        print(f"{row['strategy']:>10} | {row['achieved_rps']:>8} | {overall['p50_ms']:>8} | "
+              f"{overall['p95_ms']:>8} | {overall['p99_ms']:>8} | {overall['max_ms']:>8} | "
+              f"{sum(stats.errors.values()):>7} | {spread or '-'}")
+
+    for stats in results:
+        print(f"\n[{stats.name}] por endpoint:")
+        for endpoint, hist in sorted(stats.histograms.items()):
+            s = hist.summary()
+            print(f"  {endpoint:<34} n={s['count']:<6} p50={s['p50_ms']:<8} p95={s['p95_ms']:<8} "
+                  f"p99={s['p99_ms']:<8} max={s['max_ms']}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generador de carga con percentiles por estrategia de NGINX")
+    parser.add_argument("--base-url", default=API_BASE_URL, help=f"URL del balanceador (default: {API_BASE_URL})")
+    parser.add_argument("--strategies", default="default",
+                        help=f"Estrategias a comparar: default o lista de {','.join(STRATEGIES)}")
+    parser.add_argument("--mix", default="root:70,items:25,labs:5",
+                        help="Mezcla endpoint:peso (endpoints: root, items, labs)")
+    parser.add_argument("--rate", type=float, default=100.0, help="Operaciones por segundo objetivo")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por estrategia")
+    parser.add_argument("--concurrency", type=int, default=100, help="Conexiones concurrentes máximas")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Timeout por petición en segundos")
+    parser.add_argument("--json", dest="json_path", default=None, help="Guardar resultados en JSON")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = [s for s in strategies if s != "default" and s not in STRATEGIES]
+    if unknown:
+        print(f"❌ Estrategias desconocidas: {', '.join(unknown)}")
+        sys.exit(1)
+
+    results = []
+    for name in strategies:
+        print(f"▶️  {name}: {args.rate:g} op/s durante {args.duration:g}s ({args.concurrency} conexiones)")
+        results.append(await run_strategy(name, args, mix))
+
+    print_comparison(results)
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump([r.to_dict() for r in results], fh, indent=2)
+        print(f"\n💾 Resultados guardados en {args.json_path}")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n⚠️  Prueba cancelada por el usuario")
+        sys.exit(1)
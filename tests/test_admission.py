@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from backend.services import admission
+from backend.services.admission import _RouteClass, route_class
+
+
+@pytest.fixture(autouse=True)
+def _short_deadline(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_TIMEOUT_MS", 200.0)
+
+
+def test_acquire_within_limit_and_release():
+    cls = _RouteClass("read", limit=2, queue_limit=2)
+
+    async def scenario():
+        assert await cls.acquire() is None
+        assert await cls.acquire() is None
+        assert cls.active == 2
+        cls.release()
+        cls.release()
+
+    asyncio.run(scenario())
+    assert cls.active == 0
+
+
+def test_release_hands_slot_to_first_waiter():
+    cls = _RouteClass("write", limit=1, queue_limit=2)
+    order = []
+
+    async def worker(name):
+        assert await cls.acquire() is None
+        order.append(name)
+        await asyncio.sleep(0.01)
+        cls.release()
+
+    async def scenario():
+        assert await cls.acquire() is None
+        waiters = [asyncio.ensure_future(worker(n)) for n in ("a", "b")]
+        await asyncio.sleep(0.01)
+        assert len(cls.waiters) == 2
+        cls.release()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario())
+    assert order == ["a", "b"]
+    assert cls.active == 0
+    assert cls.queued == 2
+
+
+def test_full_queue_is_shed():
+    cls = _RouteClass("read", limit=1, queue_limit=1)
+
+    async def scenario():
+        await cls.acquire()
+        queued = asyncio.ensure_future(cls.acquire())
+        await asyncio.sleep(0)
+        reason = await cls.acquire()
+        cls.release()
+        assert await queued is None
+        cls.release()
+        return reason
+
+    assert asyncio.run(scenario()) == "queue_full"
+    assert cls.active == 0
+
+
+def test_expected_wait_over_deadline_is_shed_without_queueing():
+    cls = _RouteClass("read", limit=1, queue_limit=10)
+    cls.service_ms = 500.0
+
+    async def scenario():
+        await cls.acquire()
+        reason = await cls.acquire()
+        cls.release()
+        return reason
+
+    assert asyncio.run(scenario()) == "deadline"
+    assert cls.queued == 0
+    assert cls.active == 0
+
+
+def test_queue_timeout_leaves_no_waiter_behind():
+    cls = _RouteClass("read", limit=1, queue_limit=10)
+
+    async def scenario():
+        await cls.acquire()
+        reason = await cls.acquire()
+        assert not cls.waiters
+        cls.release()
+        return reason
+
+    assert asyncio.run(scenario()) == "timeout"
+    assert cls.active == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    cls = _RouteClass("read", limit=1, queue_limit=10)
+
+    async def scenario():
+        await cls.acquire()
+        waiter = asyncio.ensure_future(cls.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        cls.release()
+
+    asyncio.run(scenario())
+    assert cls.active == 0
+    assert not cls.waiters
+
+
+def test_service_time_moving_average():
+    cls = _RouteClass("read", limit=1, queue_limit=1)
+    cls.observe(100.0)
+    assert cls.service_ms == 100.0
+    cls.observe(200.0)
+    assert cls.service_ms == pytest.approx(100.0 + admission._EWMA_ALPHA * 100.0)
+    assert cls.admitted == 2
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/laboratories/items", "read"),
+    ("HEAD", "/laboratories/", "read"),
+    ("POST", "/laboratories/items", "write"),
+    ("DELETE", "/laboratories/items/3", "write"),
+    ("GET", "/health", None),
+    ("GET", "/system/status", None),
+    ("POST", "/sync/force", None),
+    ("GET", "/laboratories/items/changes", None),
+])
+def test_route_class(method, path, expected):
+    assert route_class({"method": method, "path": path}) == expected
@@ -0,0 +1,54 @@
+import pytest
+
+from backend.services import codec
+
+ITEM = {"id": 7, "code": "LAB-7", "status": "ok", "tags": ["a", "ñ"], "price": 1.5, "extra": None}
+
+
+def test_json_default_is_legacy_untagged():
+    raw = codec.dumps(ITEM)
+    assert not raw.startswith(codec.MAGIC)
+    assert codec.loads(raw) == ITEM
+
+
+def test_loads_accepts_legacy_str_and_bytes():
+    assert codec.loads('{"a": 1}') == {"a": 1}
+    assert codec.loads(b'[1, 2]') == [1, 2]
+
+
+def test_msgpack_round_trip(monkeypatch):
+    pytest.importorskip("msgpack")
+    monkeypatch.setattr(codec, "REDIS_CODEC", "msgpack")
+    raw = codec.dumps(ITEM)
+    assert raw[:3] == codec.MAGIC + codec.VERSION + codec.FMT_MSGPACK
+    assert codec.loads(raw) == ITEM
+
+
+@pytest.mark.parametrize("redis_codec", ["json", "msgpack"])
+def test_zstd_round_trip(monkeypatch, redis_codec):
+    pytest.importorskip("zstandard")
+    if redis_codec == "msgpack":
+        pytest.importorskip("msgpack")
+    monkeypatch.setattr(codec, "REDIS_CODEC", redis_codec)
+    monkeypatch.setattr(codec, "REDIS_COMPRESS_MIN_BYTES", 1)
+    raw = codec.dumps([ITEM] * 50)
+    assert raw[:3] == codec.MAGIC + codec.VERSION + codec.FMT_ZSTD
+    assert codec.loads(raw) == [ITEM] * 50
+
+
+def test_below_compress_threshold_stays_uncompressed(monkeypatch):
+    monkeypatch.setattr(codec, "REDIS_COMPRESS_MIN_BYTES", 10_000)
+    assert codec.loads(codec.dumps(ITEM)) == ITEM
+    assert not codec.dumps(ITEM).startswith(codec.MAGIC)
+
+
+def test_unknown_version_or_format_raises():
+    with pytest.raises(ValueError):
+        codec.loads(codec.MAGIC + b"\x09" + codec.FMT_JSON + b"{}")
+    with pytest.raises(ValueError):
+        codec.loads(codec.MAGIC + codec.VERSION + b"?" + b"{}")
+
+
+def test_json_dumps_is_compact_utf8():
+    assert codec.json_loads(codec.json_dumps({"ñ": [1, 2]})) == {"ñ": [1, 2]}
+    assert b" " not in codec.json_dumps({"a": [1, 2]})
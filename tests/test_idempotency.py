@@ -0,0 +1,159 @@
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from backend.services import idempotency
+from backend.services.idempotency import IdempotencyMiddleware
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(idempotency, "redis_raw_client", client)
+    return client
+
+
+class _App:
+    """App ASGI mínima: cuenta ejecuciones y responde con el número de llamada"""
+
+    def __init__(self, status=200, delay=0.0):
+        self.calls = 0
+        self.status = status
+        self.delay = delay
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        call = self.calls
+        body = (await receive())["body"]
+        await asyncio.sleep(self.delay)
+        payload = json.dumps({"call": call, "echo": body.decode()}).encode()
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+
+
+async def _call(app, key=None, body=b'{"code":"A"}', method="POST", path="/laboratories/items", token=None):
+    headers = []
+    if key is not None:
+        headers.append((b"idempotency-key", key.encode()))
+    if token is not None:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"",
+             "headers": headers, "client": ("10.0.0.1", 5000)}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start["headers"]), json.loads(b"".join(m.get("body", b"") for m in sent[1:]))
+
+
+def test_replays_stored_response(redis):
+    app = _App()
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        first = await _call(middleware, "k1")
+        second = await _call(middleware, "k1")
+        return first, second
+
+    (s1, h1, b1), (s2, h2, b2) = asyncio.run(scenario())
+    assert app.calls == 1
+    assert (s1, b1) == (s2, b2) == (200, {"call": 1, "echo": '{"code":"A"}'})
+    assert b"idempotent-replayed" not in h1
+    assert h2[b"idempotent-replayed"] == b"true"
+
+
+def test_same_key_with_other_body_is_422(redis):
+    app = _App()
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        await _call(middleware, "k1")
+        return await _call(middleware, "k1", body=b'{"code":"Z"}')
+
+    status, _, _ = asyncio.run(scenario())
+    assert status == 422
+    assert app.calls == 1
+
+
+def test_concurrent_retry_waits_for_original(redis):
+    app = _App(delay=0.2)
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        return await asyncio.gather(_call(middleware, "k1"), _call(middleware, "k1"))
+
+    (s1, _, b1), (s2, h2, b2) = asyncio.run(scenario())
+    assert app.calls == 1
+    assert (s1, b1) == (s2, b2)
+    assert h2[b"idempotent-replayed"] == b"true"
+
+
+def test_server_errors_are_not_stored(redis):
+    app = _App(status=503)
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        await _call(middleware, "k1")
+        return await _call(middleware, "k1")
+
+    status, headers, _ = asyncio.run(scenario())
+    assert status == 503
+    assert app.calls == 2
+    assert b"idempotent-replayed" not in headers
+
+
+def test_keys_are_scoped_to_the_caller(redis):
+    app = _App()
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        a = await _call(middleware, "shared", token="alice")
+        b = await _call(middleware, "shared", token="bob")
+        return a, b
+
+    (_, _, b1), (_, h2, b2) = asyncio.run(scenario())
+    assert app.calls == 2
+    assert b1["call"] == 1 and b2["call"] == 2
+    assert b"idempotent-replayed" not in h2
+
+
+def test_reads_and_requests_without_key_pass_through(redis):
+    app = _App()
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        await _call(middleware, None)
+        await _call(middleware, None)
+        await _call(middleware, "k1", method="GET")
+        await _call(middleware, "k1", method="GET")
+
+    asyncio.run(scenario())
+    assert app.calls == 4
+
+
+def test_auth_writes_pass_through(redis):
+    app = _App()
+    middleware = IdempotencyMiddleware(app)
+
+    async def scenario():
+        first = await _call(middleware, "k1", path="/auth/login")
+        second = await _call(middleware, "k1", path="/auth/login")
+        keys = await redis.keys("idem:*")
+        return first, second, keys
+
+    (_, _, b1), (_, h2, b2), keys = asyncio.run(scenario())
+    assert app.calls == 2
+    assert b1["call"] == 1 and b2["call"] == 2
+    assert b"idempotent-replayed" not in h2
+    assert keys == []
@@ -0,0 +1,30 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from backend.routers.inventory import _if_match_version
+
+
+def _request(if_match=None) -> Request:
+    headers = [(b"if-match", if_match.encode())] if if_match is not None else []
+    return Request({"type": "http", "method": "PUT", "path": "/laboratories/items/1", "headers": headers})
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ("*", None),
+    ("3", 3),
+    ('"3"', 3),
+    ('W/"3"', 3),
+    (' "12" ', 12),
+])
+def test_if_match_version(value, expected):
+    assert _if_match_version(_request(value)) == expected
+
+
+@pytest.mark.parametrize("value", ['"abc"', "W/x", "1.5"])
+def test_if_match_not_a_version_is_400(value):
+    with pytest.raises(HTTPException) as exc:
+        _if_match_version(_request(value))
+    assert exc.value.status_code == 400
@@ -0,0 +1,79 @@
+import pytest
+
+from backend.services import load_report
+from backend.services.load_report import _host_vector, _percentile, _recommend, _weights
+
+
+def _host(p99=20.0, inf=1, rps=10.0, tp=0.1, db=0.1, lag=1.0):
+    return {"p99": p99, "inf": inf, "rps": rps, "tp": tp, "db": db, "lag": lag}
+
+
+@pytest.fixture(autouse=True)
+def _thresholds(monkeypatch):
+    monkeypatch.setattr(load_report, "LOAD_P99_SPREAD", 2.0)
+    monkeypatch.setattr(load_report, "LOAD_IMBALANCE", 1.5)
+    monkeypatch.setattr(load_report, "LOAD_BUSY_INFLIGHT", 4.0)
+    monkeypatch.setattr(load_report, "LOAD_MAX_WEIGHT", 10)
+
+
+def test_single_host_recommends_least_conn():
+    assert _recommend({"a": _host()})[0] == "least_conn"
+
+
+def test_p99_spread_recommends_least_conn():
+    hosts = {"a": _host(p99=20), "b": _host(p99=20), "c": _host(p99=90)}
+    assert _recommend(hosts)[0] == "least_conn"
+
+
+def test_idle_host_p99_is_ignored_for_spread():
+    hosts = {"a": _host(p99=20), "b": _host(p99=20), "c": _host(p99=500, rps=0)}
+    assert _recommend(hosts)[0] == "hash"
+
+
+def test_uneven_inflight_recommends_random_two():
+    hosts = {"a": _host(inf=1), "b": _host(inf=1), "c": _host(inf=4)}
+    assert _recommend(hosts)[0] == "random_two"
+
+
+def test_busy_cluster_recommends_random_two():
+    hosts = {"a": _host(inf=6), "b": _host(inf=6)}
+    assert _recommend(hosts)[0] == "random_two"
+
+
+def test_low_even_load_recommends_uri_hash():
+    hosts = {"a": _host(inf=1), "b": _host(inf=1), "c": _host(inf=1)}
+    assert _recommend(hosts)[0] == "hash"
+
+
+def test_weights_favor_the_fastest_host():
+    hosts = {"fast": _host(p99=10), "slow": _host(p99=40), "saturated": _host(p99=10, db=1.0)}
+    weights = _weights(hosts)
+    assert weights["fast"] == 10
+    assert weights["slow"] < weights["saturated"] < weights["fast"]
+
+
+def test_weights_are_at_least_one():
+    weights = _weights({"fast": _host(p99=1), "awful": _host(p99=100_000, tp=1.0, lag=500)})
+    assert weights == {"fast": 10, "awful": 1}
+
+
+def test_weights_empty():
+    assert _weights({}) == {}
+
+
+def test_host_vector_sums_additive_and_takes_worst():
+    workers = [
+        {"inf": 2, "rps": 5.0, "p99": 30.0, "lag": 2.0, "tp": 0.2, "db": 0.5, "dbw": 1, "shed": 0},
+        {"inf": 3, "rps": 7.5, "p99": 10.0, "lag": 8.0, "tp": 0.4, "db": 0.1, "dbw": 2, "shed": 4},
+    ]
+    assert _host_vector(workers) == {
+        "workers": 2, "inf": 5, "rps": 12.5, "p99": 30.0, "lag": 8.0,
+        "tp": 0.4, "db": 0.5, "dbw": 3, "shed": 4,
+    }
+
+
+def test_percentile():
+    values = [float(v) for v in range(1, 101)]
+    assert _percentile(values, 0.5) == 51.0
+    assert _percentile(values, 0.99) == 100.0
+    assert _percentile([], 0.99) == 0.0
@@ -0,0 +1,137 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from backend.services import singleflight
+from backend.services.singleflight import coalesce, forget
+
+
+@pytest.fixture(autouse=True)
+def _clean_state():
+    singleflight._inflight.clear()
+    singleflight._recent.clear()
+    yield
+    singleflight._inflight.clear()
+    singleflight._recent.clear()
+
+
+class _Loader:
+    def __init__(self, delay=0.05, value=b"body"):
+        self.calls = 0
+        self.delay = delay
+        self.value = value
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+def test_concurrent_calls_share_one_load():
+    load = _Loader()
+
+    async def scenario():
+        return await asyncio.gather(*[coalesce("items", load, cache_ms=0) for _ in range(20)])
+
+    assert asyncio.run(scenario()) == [b"body"] * 20
+    assert load.calls == 1
+    assert not singleflight._inflight
+
+
+def test_sequential_calls_reload_without_cache():
+    load = _Loader(delay=0)
+
+    async def scenario():
+        await coalesce("items", load, cache_ms=0)
+        await coalesce("items", load, cache_ms=0)
+
+    asyncio.run(scenario())
+    assert load.calls == 2
+
+
+def test_microcache_reuses_result_within_window():
+    load = _Loader(delay=0)
+
+    async def scenario():
+        await coalesce("items", load, cache_ms=1000)
+        await coalesce("items", load, cache_ms=1000)
+
+    asyncio.run(scenario())
+    assert load.calls == 1
+
+
+def test_forget_drops_namespace_tuples_and_inflight_loads():
+    load = _Loader()
+
+    async def scenario():
+        first = asyncio.ensure_future(coalesce(("items", "mysql"), load, cache_ms=1000))
+        await asyncio.sleep(0.01)
+        forget("items")
+        # Tras la escritura no se une a la carga anterior ni la deja en microcaché
+        await asyncio.gather(first, coalesce(("items", "mysql"), load, cache_ms=1000))
+        await coalesce(("items", "mysql"), load, cache_ms=1000)
+
+    asyncio.run(scenario())
+    assert load.calls == 2
+
+
+def test_forget_keeps_other_namespaces():
+    load = _Loader(delay=0)
+
+    async def scenario():
+        await coalesce(("labs", 1), load, cache_ms=1000)
+        forget("items")
+        await coalesce(("labs", 1), load, cache_ms=1000)
+
+    asyncio.run(scenario())
+    assert load.calls == 1
+
+
+def test_error_is_shared_and_not_cached():
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("MySQL caído")
+
+    async def scenario():
+        results = await asyncio.gather(*[coalesce("items", failing, cache_ms=1000) for _ in range(3)],
+                                       return_exceptions=True)
+        with pytest.raises(ValueError):
+            await coalesce("items", failing, cache_ms=1000)
+        return results
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_load():
+    load = _Loader()
+
+    async def scenario():
+        first = asyncio.ensure_future(coalesce("items", load, cache_ms=0))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(coalesce("items", load, cache_ms=0))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == b"body"
+    assert load.calls == 1
+
+
+def test_load_does_not_inherit_caller_context():
+    request_var = contextvars.ContextVar("request_var", default=None)
+
+    async def read_context():
+        return request_var.get()
+
+    async def scenario():
+        request_var.set("GET /laboratories/items")
+        return await coalesce("items", read_context, cache_ms=0)
+
+    assert asyncio.run(scenario()) is None